@@ -0,0 +1,371 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cache import ResultCache
+from ensemble import ENGINES, OUTCOMES, SERIES, QUANTILES, ensemble_config, run_replicate
+from logger import Logger
+from virus import Virus
+
+# Relative accuracy of the quantile sketches: every quantile estimate is
+# within this fraction of a value of the requested rank
+RELATIVE_ACCURACY = 0.01
+
+# Number of equal-width bins of the final-size histogram over [0, pop_size]
+FINAL_SIZE_BINS = 20
+
+# How the outcomes are named in the ensemble report
+OUTCOME_LABELS = {
+    'steps': 'Iterations',
+    'total_deaths': 'Total Deaths',
+    'saved_by_vaccination': 'Interactions Saved by Vaccination',
+    'total_infected': 'Total Infected',
+}
+
+# Replicates run and folded together per task. It does not depend on the
+# number of workers, so the aggregate of a seeded ensemble is the same
+# whatever the size of the pool.
+BATCH_SIZE = 32
+
+
+class StepStats(object):
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        """
+        Running statistics of one value at every step index, over any number
+        of runs. Memory grows with the number of steps, never with the
+        number of runs, and two `StepStats` merge into the statistics of all
+        their runs, so workers can aggregate apart and be combined later.
+        - The mean and variance are updated with Welford's algorithm and
+          merged with the pairwise formula of Chan et al.
+        - Quantiles come from a sketch of bucket counts. Up to n = 1 / a,
+          every integer has its own bucket, so small counters are exact.
+          Past n the buckets are logarithmic, as in DDSketch: x goes to the
+          bucket (n * g^(k-1), n * g^k] with g = (1 + a) / (1 - a), so any
+          quantile is known to a relative accuracy `a` from about
+          n + log(max value / n) / (2 * a) bucket counts.
+          Negative values are counted as 0, as `Logger.log_time_step` does.
+
+        Attributes:
+        - count: Number of values seen at every step index.
+        - mean: Running mean at every step index.
+        - m2: Running sum of squared differences from the mean.
+        - sketch: Bucket counts, one row per step index. Bucket i <= n
+          counts the values in (i - 1, i], bucket n + k those in
+          (n * g^(k-1), n * g^k].
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.linear = math.ceil(1 / relative_accuracy)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.sketch = np.zeros((0, 1), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.count)
+
+    def _grow(self, rows, buckets=0):
+        # Make room for `rows` step indexes and `buckets` sketch buckets
+        if rows > len(self.count):
+            extra = rows - len(self.count)
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(extra)])
+            self.m2 = np.concatenate([self.m2, np.zeros(extra)])
+        rows, buckets = max(rows, self.sketch.shape[0]), max(buckets, self.sketch.shape[1])
+        if (rows, buckets) != self.sketch.shape:
+            sketch = np.zeros((rows, buckets), dtype=np.int64)
+            sketch[:self.sketch.shape[0], :self.sketch.shape[1]] = self.sketch
+            self.sketch = sketch
+
+    def _buckets(self, values):
+        values = np.maximum(values, 0)
+        buckets = np.ceil(values).astype(np.int64)
+        large = values > self.linear
+        keys = np.ceil(np.log(values[large] / self.linear) / math.log(self.gamma))
+        buckets[large] = self.linear + np.maximum(keys, 1).astype(np.int64)
+        return buckets
+
+    def _value(self, buckets):
+        # Estimate of the values in each bucket
+        keys = np.maximum(buckets - self.linear, 0)
+        large = self.linear * 2 * self.gamma ** keys / (self.gamma + 1)
+        return np.where(buckets > self.linear, large, buckets).astype(np.float64)
+
+    def add(self, values, start=0):
+        """
+        Add one run's `values`, the first one at step index `start` and the
+        others at the following step indexes.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        rows = slice(start, start + len(values))
+        buckets = self._buckets(values)
+        self._grow(rows.stop, int(buckets.max()) + 1)
+        self.count[rows] += 1
+        delta = values - self.mean[rows]
+        self.mean[rows] += delta / self.count[rows]
+        self.m2[rows] += delta * (values - self.mean[rows])
+        self.sketch[np.arange(rows.start, rows.stop), buckets] += 1
+
+    def merge(self, other):
+        # Fold the runs of `other` into these statistics
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches of different relative accuracies')
+        self._grow(len(other), other.sketch.shape[1])
+        rows = slice(0, len(other))
+        count = self.count[rows] + other.count
+        total = np.maximum(count, 1)
+        delta = other.mean - self.mean[rows]
+        self.m2[rows] += other.m2 + delta ** 2 * self.count[rows] * other.count / total
+        self.mean[rows] += delta * other.count / total
+        self.count[rows] = count
+        self.sketch[:other.sketch.shape[0], :other.sketch.shape[1]] += other.sketch
+        return self
+
+    def cumulative(self):
+        """
+        Return the `StepStats` whose step index i holds the values of every
+        step index up to i.
+        """
+        stats = StepStats(self.relative_accuracy)
+        stats._grow(len(self))
+        count, mean, m2 = 0, 0.0, 0.0
+        for row, (n, row_mean, row_m2) in enumerate(zip(self.count.tolist(), self.mean.tolist(),
+                                                        self.m2.tolist())):
+            if n:
+                total = count + n
+                delta = row_mean - mean
+                m2 += row_m2 + delta ** 2 * count * n / total
+                mean += delta * n / total
+                count = total
+            stats.count[row], stats.mean[row], stats.m2[row] = count, mean, m2
+        stats.sketch = np.cumsum(self.sketch, axis=0)
+        return stats
+
+    def truncate(self, rows):
+        # Keep only the first `rows` step indexes
+        self._grow(rows)
+        self.count, self.mean, self.m2 = self.count[:rows], self.mean[:rows], self.m2[:rows]
+        self.sketch = self.sketch[:rows]
+        return self
+
+    def variance(self):
+        # Sample variance at every step index (0 with fewer than two values)
+        return np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), 0.0)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    def quantiles(self, quantiles=QUANTILES):
+        """
+        Return the array of estimated `quantiles` (one row per quantile, one
+        column per step index), from the value of rank q * (count - 1).
+        """
+        ranks = np.outer(quantiles, np.maximum(self.count - 1, 0))
+        cumulative = np.cumsum(self.sketch, axis=1)
+        buckets = (cumulative[None, :, :] <= ranks[:, :, None]).sum(axis=2)
+        return self._value(np.minimum(buckets, self.sketch.shape[1] - 1))
+
+
+class EnsembleAggregator(object):
+    def __init__(self, config, entropy=None, relative_accuracy=RELATIVE_ACCURACY, bins=FINAL_SIZE_BINS):
+        """
+        Streaming version of `EnsembleResult`: folds every run into running
+        statistics as it finishes, and then forgets it.
+
+        Per-step statistics follow `EnsembleResult.series`, where a run that
+        ended early counts with its final value at the later steps. Rather
+        than padding, each run adds its series to `live` and its final value
+        to `ended` at the step index where it ended; the statistics of step
+        i merge `live` at i with `ended` up to i.
+
+        Attributes:
+        - config: The simulation parameters every replicate was run with.
+        - entropy: Root seed the replicate streams were spawned from.
+        - replicates: Number of runs aggregated so far.
+        - outcomes: dict of outcome name -> `StepStats` with one step index.
+        - live, ended: dict of counter name -> `StepStats`.
+        - final_sizes: Histogram of the runs' total_infected, in `bins`
+          equal bins over [0, pop_size] (larger sizes count in the last one).
+        """
+        self.config = config
+        self.entropy = entropy
+        self.relative_accuracy = relative_accuracy
+        self.replicates = 0
+        self.outcomes = {name: StepStats(relative_accuracy) for name in OUTCOMES}
+        self.live = {name: StepStats(relative_accuracy) for name in SERIES}
+        self.ended = {name: StepStats(relative_accuracy) for name in SERIES}
+        self.final_sizes = np.zeros(bins, dtype=np.int64)
+
+    def add(self, run):
+        # Fold in the `RunResult` of one replicate
+        self.replicates += 1
+        for name in OUTCOMES:
+            self.outcomes[name].add([getattr(run, name)])
+        for name in SERIES:
+            series = run.series[name]
+            if len(series):
+                self.live[name].add(series)
+                self.ended[name].add(series[-1:], start=len(series))
+        bins = len(self.final_sizes)
+        pop_size = max(1, self.config['pop_size'])
+        self.final_sizes[min(bins - 1, run.total_infected * bins // pop_size)] += 1
+        return self
+
+    def merge(self, other):
+        # Fold in the runs aggregated by `other`
+        self.replicates += other.replicates
+        for name in OUTCOMES:
+            self.outcomes[name].merge(other.outcomes[name])
+        for name in SERIES:
+            self.live[name].merge(other.live[name])
+            self.ended[name].merge(other.ended[name])
+        self.final_sizes += other.final_sizes
+        return self
+
+    def series_stats(self, name):
+        # `StepStats` of counter `name` over the longest run's steps
+        stats = self.ended[name].cumulative()
+        return stats.merge(self.live[name]).truncate(len(self.live[name]))
+
+    def mean(self, name):
+        return float(self.outcomes[name].mean[0])
+
+    def std(self, name):
+        return float(self.outcomes[name].std()[0])
+
+    def quantiles(self, name, quantiles=QUANTILES):
+        return dict(zip(quantiles, self.outcomes[name].quantiles(quantiles)[:, 0].tolist()))
+
+    def series_mean(self, name):
+        return self.series_stats(name).mean
+
+    def series_std(self, name):
+        return self.series_stats(name).std()
+
+    def series_quantiles(self, name, quantiles=QUANTILES):
+        return self.series_stats(name).quantiles(quantiles)
+
+    def final_size_edges(self):
+        return np.linspace(0, self.config['pop_size'], len(self.final_sizes) + 1)
+
+    def summary(self):
+        summary = {
+            'config': self.config,
+            'entropy': self.entropy,
+            'replicates': self.replicates,
+        }
+        for name in OUTCOMES:
+            summary[name] = {
+                'mean': self.mean(name),
+                'std': self.std(name),
+                'quantiles': {str(q): v for q, v in self.quantiles(name).items()},
+            }
+        summary['series_mean'] = {name: self.series_mean(name).tolist() for name in SERIES}
+        summary['series_std'] = {name: self.series_std(name).tolist() for name in SERIES}
+        summary['final_sizes'] = {
+            'edges': self.final_size_edges().tolist(),
+            'counts': self.final_sizes.tolist(),
+        }
+        return summary
+
+    def log(self, logger):
+        # Write the ensemble report through `logger`
+        config = self.config
+        edges = self.final_size_edges().tolist()
+        logger.write_metadata(config['pop_size'], config['vacc_percentage'], config['virus_name'],
+                              config['mortality_rate'], config['repro_rate'], config['initial_infected'])
+        logger.log_ensemble_outcome(
+            self.replicates, config['pop_size'], self.mean('total_deaths'),
+            {OUTCOME_LABELS[name]: (self.mean(name), self.std(name), self.quantiles(name)) for name in OUTCOMES},
+            list(zip(edges[:-1], edges[1:], self.final_sizes.tolist()))
+        )
+
+
+def aggregate_replicates(config, seeds, cache=None, relative_accuracy=RELATIVE_ACCURACY,
+                         bins=FINAL_SIZE_BINS):
+    # Run a batch of replicates in turn, folding each one in as it finishes
+    aggregator = EnsembleAggregator(config, relative_accuracy=relative_accuracy, bins=bins)
+    for seed_sequence in seeds:
+        aggregator.add(run_replicate(config, seed_sequence, cache))
+    return aggregator
+
+
+def stream_ensemble(virus, pop_size, vacc_percentage, initial_infected=1, replicates=100,
+                    seed=None, workers=None, engine='vector', max_steps=None, cache=None,
+                    relative_accuracy=RELATIVE_ACCURACY, bins=FINAL_SIZE_BINS):
+    """
+    Same as `run_ensemble`, but returns an `EnsembleAggregator` and never
+    holds more than one run's series per worker.
+
+    The replicates run in batches of BATCH_SIZE, each folded into its own
+    aggregator and merged into the result in batch order, so a seeded
+    ensemble gives the same aggregate for any number of `workers`.
+    """
+    config = ensemble_config(virus, pop_size, vacc_percentage, initial_infected, engine, max_steps)
+    root = np.random.SeedSequence(seed)
+    seeds = root.spawn(replicates)
+    if seed is None:
+        # Fresh entropy every time: nothing to look up
+        cache = None
+
+    aggregator = EnsembleAggregator(config, root.entropy, relative_accuracy, bins)
+    batches = [seeds[start:start + BATCH_SIZE] for start in range(0, replicates, BATCH_SIZE)]
+    args = (cache, relative_accuracy, bins)
+    if workers == 1:
+        for batch in batches:
+            aggregator.merge(aggregate_replicates(config, batch, *args))
+        return aggregator
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(aggregate_replicates, config, batch, *args) for batch in batches]
+        for future in futures:
+            aggregator.merge(future.result())
+    return aggregator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate a large ensemble of replicate simulations.')
+    parser.add_argument('pop_size', type=int)
+    parser.add_argument('vacc_percentage', type=float)
+    parser.add_argument('virus_name')
+    parser.add_argument('mortality_rate', type=float)
+    parser.add_argument('repro_rate', type=float)
+    parser.add_argument('initial_infected', type=int, nargs='?', default=1)
+    parser.add_argument('--replicates', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='vector')
+    parser.add_argument('--log', help='Write the ensemble report to this file')
+    parser.add_argument('--output', help='Write the aggregated summary to this JSON file')
+    parser.add_argument('--cache', help='Directory of a result cache for seeded runs')
+    args = parser.parse_args(argv)
+
+    virus = Virus(args.virus_name, args.repro_rate, args.mortality_rate)
+    aggregator = stream_ensemble(
+        virus, args.pop_size, args.vacc_percentage, args.initial_infected,
+        replicates=args.replicates, seed=args.seed, workers=args.workers, engine=args.engine,
+        cache=ResultCache(args.cache) if args.cache else None
+    )
+
+    print(f"****Ensemble of {aggregator.replicates} runs**** (seed entropy {aggregator.entropy})")
+    for name in OUTCOMES:
+        quantiles = ', '.join(f'q{q}={v:g}' for q, v in aggregator.quantiles(name).items())
+        print(f"{name}: mean {aggregator.mean(name):g} sd {aggregator.std(name):g} | {quantiles}")
+
+    if args.log:
+        with Logger(args.log) as logger:
+            aggregator.log(logger)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(aggregator.summary(), file, indent=2)
+    return aggregator
+
+
+if __name__ == "__main__":
+    main()
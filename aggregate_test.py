@@ -0,0 +1,80 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from aggregate import StepStats, stream_ensemble, RELATIVE_ACCURACY
+from ensemble import run_ensemble, OUTCOMES, SERIES
+from logger import Logger
+from virus import Virus
+
+
+class TestStepStats(unittest.TestCase):
+    def test_matches_batch_statistics(self):
+        rng = np.random.default_rng(0)
+        data = rng.integers(0, 10 ** 6, (300, 20)).astype(float)
+        first, second = StepStats(), StepStats()
+        for row in data[:100]:
+            first.add(row)
+        for row in data[100:]:
+            second.add(row)
+        stats = first.merge(second)
+        self.assertEqual(stats.count.tolist(), [300] * 20)
+        self.assertTrue(np.allclose(stats.mean, data.mean(axis=0)))
+        self.assertTrue(np.allclose(stats.variance(), data.var(axis=0, ddof=1)))
+
+        expected = np.quantile(data, [0.05, 0.5, 0.95], axis=0, method='lower')
+        error = np.abs(stats.quantiles([0.05, 0.5, 0.95]) - expected) / expected
+        self.assertLessEqual(error.max(), RELATIVE_ACCURACY)
+
+    def test_small_integers_are_exact(self):
+        stats = StepStats()
+        for value in [0, 3, 3, 7, 12]:
+            stats.add([value])
+        self.assertEqual(stats.quantiles([0, 0.5, 1]).ravel().tolist(), [0, 3, 12])
+
+    def test_cumulative(self):
+        stats = StepStats()
+        stats.add([1, 2, 3])
+        stats.add([5], start=1)
+        cumulative = stats.cumulative()
+        self.assertEqual(cumulative.count.tolist(), [1, 3, 4])
+        self.assertTrue(np.allclose(cumulative.mean, [1, 8 / 3, 11 / 4]))
+        self.assertTrue(np.allclose(cumulative.variance()[-1], np.var([1, 2, 5, 3], ddof=1)))
+
+
+class TestStreamEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+
+    def test_matches_ensemble_result(self):
+        result = run_ensemble(self.virus, 500, 0.1, 5, replicates=40, seed=7, workers=1)
+        aggregator = stream_ensemble(self.virus, 500, 0.1, 5, replicates=40, seed=7, workers=1)
+        self.assertEqual(aggregator.replicates, 40)
+        for name in OUTCOMES:
+            self.assertAlmostEqual(aggregator.mean(name), result.mean(name))
+            self.assertAlmostEqual(aggregator.std(name), result.outcome(name).std(ddof=1))
+        for name in SERIES:
+            self.assertTrue(np.allclose(aggregator.series_mean(name), result.series_mean(name)))
+            self.assertTrue(np.allclose(aggregator.series_std(name), result.series[name].std(axis=0, ddof=1)))
+        self.assertEqual(int(aggregator.final_sizes.sum()), 40)
+
+    def test_pool_matches_serial_run(self):
+        serial = stream_ensemble(self.virus, 300, 0.1, 5, replicates=40, seed=3, workers=1)
+        pooled = stream_ensemble(self.virus, 300, 0.1, 5, replicates=40, seed=3, workers=2)
+        self.assertEqual(serial.summary(), pooled.summary())
+
+    def test_log(self):
+        aggregator = stream_ensemble(self.virus, 300, 0.1, 5, replicates=10, seed=4, workers=1)
+        with tempfile.TemporaryDirectory() as directory:
+            with Logger(os.path.join(directory, 'log.txt')) as logger:
+                aggregator.log(logger)
+            with open(logger.file_name) as file:
+                log = file.read()
+        self.assertIn('Population Size: 300', log)
+        self.assertIn('The ensemble has ended after 10 runs', log)
+        self.assertIn(f"Total Deaths: mean {aggregator.mean('total_deaths'):g}", log)
+        self.assertIn('Final Size Histogram:', log)
+
+
+if __name__ == '__main__':
+    unittest.main()
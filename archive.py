@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (e.g. on Windows): only one process may then
+    # ingest into an archive at a time
+    fcntl = None
+from logger import Logger
+
+# Size past which a chunk file is closed and a new one started
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Columns of the index, with their SQL types, that queries can filter on
+INDEX_COLUMNS = {
+    'id': 'INTEGER',
+    'virus_name': 'TEXT',
+    'repro_rate': 'REAL',
+    'mortality_rate': 'REAL',
+    'pop_size': 'INTEGER',
+    'vacc_percentage': 'REAL',
+    'initial_infected': 'INTEGER',
+    'date': 'TEXT',
+    'seed': 'TEXT',
+    'steps': 'INTEGER',
+    'total_deaths': 'INTEGER',
+    'saved_by_vaccination': 'INTEGER',
+    'source': 'TEXT',
+}
+
+# Comparisons a query condition can use
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+_METADATA = {
+    'virus_name': (r'^Virus: (.*)$', str),
+    'pop_size': (r'^Population Size: (\d+)$', int),
+    'vacc_percentage': (r'^Initial Vaccinated Population: (.*)%$', lambda value: round(float(value) / 100, 12)),
+    'initial_infected': (r'^Initial Infected Population: (\d+)$', int),
+    'mortality_rate': (r'^Mortality Rate: (.*)$', float),
+    'repro_rate': (r'^Reproductive Rate: (.*)$', float),
+    'date': (r'^Simulation Date: (.*)$', str),
+    'steps': (r'^The simulation has ended after (\d+) iterations$', int),
+    'saved_by_vaccination': (r'^Interactions Saved by Vaccination: (\d+)$', int),
+}
+
+_CONDITION = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*$')
+
+
+def parse_report(text):
+    """
+    Read the index fields of a `Logger` report: the metadata, the deaths
+    of the last step logged, and the rest of the outcome when the run
+    finished (None otherwise).
+    """
+    fields = {}
+    for name, (pattern, convert) in _METADATA.items():
+        match = re.search(pattern, text, re.MULTILINE)
+        fields[name] = convert(match.group(1)) if match else None
+    # The outcome repeats the deaths of the last step, so take the last one
+    deaths = re.findall(r'^Total Deaths: (\d+)$', text, re.MULTILINE)
+    fields['total_deaths'] = int(deaths[-1]) if deaths else None
+    return fields
+
+
+def parse_condition(condition):
+    # Turn 'vacc_percentage >= 0.3' into ('vacc_percentage', '>=', 0.3)
+    match = _CONDITION.match(condition)
+    if match is None:
+        raise ValueError(f'Cannot parse condition {condition!r}, expected e.g. "total_deaths > 100"')
+    column, operator, value = match.groups()
+    for convert in (int, float):
+        try:
+            return column, operator, convert(value)
+        except ValueError:
+            pass
+    return column, operator, value
+
+
+def template_report():
+    """
+    A report with the `Logger` layout, used as the preset dictionary every
+    report is compressed against, so the boilerplate of even a short report
+    costs next to nothing.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        logger = Logger(os.path.join(directory, 'template'), clock=lambda: datetime(2000, 1, 1))
+        logger.write_metadata(100000, 0.1, 'Sniffles', 0.12, 0.5, 10)
+        for step in range(1, 4):
+            logger.log_time_step(1000 * step, 10 * step, 100000 * step, step, 100000)
+        logger.log_simulation_outcome(3, 100000, 30, 1000)
+        with open(logger.file_name, 'rb') as file:
+            return file.read()
+
+
+class RunArchive(object):
+    def __init__(self, directory, chunk_bytes=CHUNK_BYTES):
+        """
+        Compressed, indexed store of `Logger` reports.
+
+        Every report is compressed on its own with zlib, against a preset
+        dictionary of the report layout, and appended to the current chunk
+        file of the archive directory; a new chunk is started once one
+        holds `chunk_bytes`. An SQLite index (`index.sqlite`) keeps the
+        metadata and outcome of every run (see INDEX_COLUMNS) next to where
+        its report is stored, so queries never touch the chunks and
+        `text()` decompresses only the report asked for.
+
+        Every ingested report is a new run, whatever its file name, so runs
+        that overwrote each other's log file are all kept; a report that was
+        already ingested (same text) is not stored twice.
+        The compression dictionaries are kept in the index, so a change to
+        the report layout never makes older runs unreadable.
+        """
+        self.directory = directory
+        self.chunk_bytes = chunk_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.sqlite'))
+        self.connection.row_factory = sqlite3.Row
+        columns = ', '.join(f'{name} {kind}' for name, kind in INDEX_COLUMNS.items() if name != 'id')
+        with self.connection:
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, {columns}, digest TEXT UNIQUE, '
+                'dictionary INTEGER, chunk INTEGER, offset INTEGER, length INTEGER, size INTEGER)'
+            )
+            self.connection.execute('CREATE TABLE IF NOT EXISTS dictionaries (id INTEGER PRIMARY KEY, data BLOB)')
+            for name in ('vacc_percentage', 'total_deaths', 'pop_size'):
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS runs_{name} ON runs ({name})')
+        self._dictionaries = {}
+        self._current = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    @contextlib.contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _dictionary(self, dictionary_id=None):
+        # The dictionary of `dictionary_id`, or (id, data) of the current one
+        if dictionary_id is None:
+            if self._current is None:
+                data = template_report()
+                row = self.connection.execute('SELECT id FROM dictionaries WHERE data = ?', (data,)).fetchone()
+                if row is None:
+                    with self.connection:
+                        row = [self.connection.execute('INSERT INTO dictionaries (data) VALUES (?)',
+                                                       (data,)).lastrowid]
+                self._current = (row[0], data)
+            return self._current
+        if dictionary_id not in self._dictionaries:
+            row = self.connection.execute('SELECT data FROM dictionaries WHERE id = ?', (dictionary_id,)).fetchone()
+            self._dictionaries[dictionary_id] = bytes(row[0])
+        return self._dictionaries[dictionary_id]
+
+    def chunk_path(self, chunk):
+        return os.path.join(self.directory, f'chunk-{chunk:06d}.z')
+
+    def ingest(self, report, seed=None, source=None):
+        """
+        Store a report, given as its text or as the path of a log file, and
+        return its run id. `seed` (e.g. `Simulation.seed_key`) is recorded
+        with it, as JSON.
+        """
+        if os.path.exists(report):
+            source = source or os.path.basename(report)
+            with open(report, 'r') as file:
+                report = file.read()
+        data = report.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        fields = parse_report(report)
+        fields['seed'] = json.dumps(seed) if seed is not None else None
+        fields['source'] = source
+
+        with self._lock():
+            row = self.connection.execute('SELECT id FROM runs WHERE digest = ?', (digest,)).fetchone()
+            if row is not None:
+                return row[0]
+            dictionary_id, dictionary = self._dictionary()
+            compressor = zlib.compressobj(9, zdict=dictionary)
+            record = compressor.compress(data) + compressor.flush()
+
+            row = self.connection.execute('SELECT MAX(chunk) FROM runs').fetchone()
+            chunk = row[0] or 1
+            path = self.chunk_path(chunk)
+            if os.path.exists(path) and os.path.getsize(path) + len(record) > self.chunk_bytes:
+                chunk += 1
+                path = self.chunk_path(chunk)
+            with open(path, 'ab') as file:
+                offset = file.tell()
+                file.write(record)
+                file.flush()
+                os.fsync(file.fileno())
+
+            names = [name for name in INDEX_COLUMNS if name != 'id']
+            with self.connection:
+                cursor = self.connection.execute(
+                    f'INSERT INTO runs ({", ".join(names)}, digest, dictionary, chunk, offset, length, size) '
+                    f'VALUES ({", ".join("?" * (len(names) + 6))})',
+                    [fields[name] for name in names] + [digest, dictionary_id, chunk, offset, len(record),
+                                                        len(data)]
+                )
+            return cursor.lastrowid
+
+    def ingest_simulation(self, sim):
+        # Store the report of a finished `Simulation` run, with its seed
+        sim.logger.flush()
+        return self.ingest(sim.logger.file_name, seed=sim.seed_key)
+
+    def query(self, *conditions, order_by='id', limit=None):
+        """
+        Return the index rows (as dicts) of the runs matching every
+        condition, each a (column, operator, value) tuple or a string like
+        'total_deaths > 100', e.g.:
+
+            archive.query('vacc_percentage >= 0.3', ('total_deaths', '>', 100))
+        """
+        clauses, values = [], []
+        for condition in conditions:
+            if isinstance(condition, str):
+                condition = parse_condition(condition)
+            column, operator, value = condition
+            if column not in INDEX_COLUMNS:
+                raise ValueError(f'Unknown column {column!r}, expected one of {sorted(INDEX_COLUMNS)}')
+            if operator not in OPERATORS:
+                raise ValueError(f'Unknown operator {operator!r}, expected one of {OPERATORS}')
+            clauses.append(f'{column} {operator} ?')
+            values.append(value)
+        if order_by not in INDEX_COLUMNS:
+            raise ValueError(f'Unknown column {order_by!r}, expected one of {sorted(INDEX_COLUMNS)}')
+        sql = f'SELECT {", ".join(INDEX_COLUMNS)} FROM runs'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {order_by}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            values.append(int(limit))
+        return [dict(row) for row in self.connection.execute(sql, values)]
+
+    def text(self, run_id):
+        # The original report of run `run_id`, byte for byte
+        row = self.connection.execute(
+            'SELECT dictionary, chunk, offset, length FROM runs WHERE id = ?', (run_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(run_id)
+        with open(self.chunk_path(row['chunk']), 'rb') as file:
+            file.seek(row['offset'])
+            record = file.read(row['length'])
+        decompressor = zlib.decompressobj(zdict=self._dictionary(row['dictionary']))
+        return (decompressor.decompress(record) + decompressor.flush()).decode()
+
+    def stats(self):
+        # (runs, bytes of the reports, bytes stored in the chunks)
+        row = self.connection.execute('SELECT COUNT(*), SUM(size), SUM(length) FROM runs').fetchone()
+        return row[0], row[1] or 0, row[2] or 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive and query simulation reports.')
+    parser.add_argument('archive', help='Archive directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='Store log files in the archive')
+    ingest.add_argument('paths', nargs='+')
+    ingest.add_argument('--seed', type=json.loads, default=None, help='Seed to record, as JSON')
+    ingest.add_argument('--remove', action='store_true', help='Delete every log file once stored')
+    query = commands.add_parser('query', help='List the runs matching every condition')
+    query.add_argument('conditions', nargs='*', help='e.g. "vacc_percentage >= 0.3" "total_deaths > 100"')
+    query.add_argument('--limit', type=int, default=None)
+    show = commands.add_parser('show', help='Print the report of a run')
+    show.add_argument('run_id', type=int)
+    args = parser.parse_args(argv)
+
+    with RunArchive(args.archive) as archive:
+        if args.command == 'ingest':
+            for path in args.paths:
+                run_id = archive.ingest(path, seed=args.seed)
+                if args.remove:
+                    os.remove(path)
+                print(f'{path}: run {run_id}')
+            runs, size, stored = archive.stats()
+            print(f'{runs} runs, {size} bytes of reports in {stored} bytes')
+        elif args.command == 'query':
+            columns = ('id', 'virus_name', 'pop_size', 'vacc_percentage', 'repro_rate', 'mortality_rate',
+                       'steps', 'total_deaths', 'seed')
+            print(' '.join(f'{name:>14}' for name in columns))
+            for row in archive.query(*args.conditions, limit=args.limit):
+                print(' '.join(f'{str(row[name]):>14}' for name in columns))
+        else:
+            print(archive.text(args.run_id))
+
+
+if __name__ == "__main__":
+    main()
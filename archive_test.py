@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+from archive import RunArchive, parse_condition, parse_report
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+class TestRunArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive = RunArchive(os.path.join(self.directory.name, 'archive'), chunk_bytes=300)
+        self.virus = Virus("Test", 0.05, 0.12)
+
+    def tearDown(self):
+        self.archive.close()
+        self.directory.cleanup()
+
+    def run_logged(self, sim):
+        # Every run writes the same log file, as by default
+        sim.logger.file_name = os.path.join(self.directory.name, 'log.txt')
+        sim.run(archive=self.archive)
+        with open(sim.logger.file_name) as file:
+            return file.read()
+
+    def test_runs_are_kept_and_rendered(self):
+        reports = [self.run_logged(VectorSimulation(self.virus, 1000, vacc, 5, seed=seed))
+                   for seed, vacc in enumerate((0.1, 0.3, 0.5))]
+        self.assertEqual(len(self.archive), 3)
+        for run_id, report in enumerate(reports, 1):
+            self.assertEqual(self.archive.text(run_id), report)
+        runs, size, stored = self.archive.stats()
+        self.assertLess(stored, size / 3)
+        # The small chunk size spreads the runs over several chunk files
+        self.assertGreater(len([name for name in os.listdir(self.archive.directory) if name.endswith('.z')]), 1)
+
+        # Reports already stored are not stored again
+        self.assertEqual(self.archive.ingest(reports[0]), 1)
+        self.assertEqual(len(self.archive), 3)
+
+    def test_query(self):
+        sims = [Simulation(self.virus, 500, vacc, 5, rng=seed) for seed, vacc in enumerate((0.1, 0.3, 0.5))]
+        for sim in sims:
+            self.run_logged(sim)
+        rows = self.archive.query('vacc_percentage >= 0.3')
+        self.assertEqual([row['vacc_percentage'] for row in rows], [0.3, 0.5])
+        self.assertEqual(rows[0]['total_deaths'], sims[1].total_deaths)
+        self.assertEqual(rows[0]['steps'], sims[1].num_steps)
+        self.assertEqual(rows[0]['seed'], '[1, []]')
+
+        deaths = sims[0].total_deaths
+        rows = self.archive.query(('total_deaths', '=', deaths), 'pop_size = 500', limit=1)
+        self.assertEqual(rows[0]['total_deaths'], deaths)
+        with self.assertRaises(ValueError):
+            self.archive.query('digest = 1')
+
+    def test_parse(self):
+        self.assertEqual(parse_condition('total_deaths>100'), ('total_deaths', '>', 100))
+        self.assertEqual(parse_condition(' virus_name = Sniffles '), ('virus_name', '=', 'Sniffles'))
+        with self.assertRaises(ValueError):
+            parse_condition('total_deaths ~ 3')
+
+        sim = Simulation(self.virus, 100, 0.3, 2, rng=4)
+        fields = parse_report(self.run_logged(sim))
+        self.assertEqual((fields['virus_name'], fields['pop_size'], fields['vacc_percentage']), ("Test", 100, 0.3))
+        self.assertEqual((fields['repro_rate'], fields['mortality_rate']), (0.05, 0.12))
+        self.assertEqual(fields['saved_by_vaccination'], sim.saved_by_vaccination)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import contextlib
+import io
+import os
+import tempfile
+from unittest import mock
+from benchmarks import suite
+
+
+def result(rate, peak_bytes=1000):
+    return {'seconds': 1 / rate, 'rate': rate, 'peak_bytes': peak_bytes}
+
+
+class TestBaselineCompare(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'baseline.json')
+        suite.save_baseline(self.path, {
+            'time_step/pop=1000/vacc=0.1': result(1000.0),
+            'interaction/vacc=0.1': result(500.0, peak_bytes=None),
+            'logger.buffered': result(200.0),
+        })
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compare(self):
+        baseline = suite.load_baseline(self.path)
+        results = {
+            # 30% slower than the baseline
+            'time_step/pop=1000/vacc=0.1': result(700.0),
+            # Slower, but within the threshold
+            'interaction/vacc=0.1': result(450.0, peak_bytes=None),
+            # Within the threshold, but using twice the memory
+            'logger.buffered': result(190.0, peak_bytes=2000),
+            # Not in the baseline
+            'create_population/pop=1000': result(1.0),
+        }
+        self.assertEqual(suite.compare(results, baseline, 0.2), [
+            ('time_step/pop=1000/vacc=0.1', 'rate', 1000.0, 700.0),
+            ('logger.buffered', 'peak_bytes', 1000, 2000),
+        ])
+        self.assertEqual(suite.compare(results, baseline, 0.5), [
+            ('logger.buffered', 'peak_bytes', 1000, 2000),
+        ])
+        # Faster runs are never regressions
+        self.assertEqual(suite.compare({'logger.buffered': result(400.0)}, baseline, 0.2), [])
+
+    def test_main_reports_regressions(self):
+        slower = {'time_step/pop=1000/vacc=0.1': result(500.0)}
+        output = io.StringIO()
+        with mock.patch.object(suite, 'run_suite', return_value=slower), contextlib.redirect_stdout(output):
+            self.assertEqual(suite.main(['--baseline', self.path]), 1)
+            self.assertEqual(suite.main(['--baseline', self.path, '--threshold', '0.6']), 0)
+        self.assertIn('REGRESSION time_step/pop=1000/vacc=0.1: rate 1,000 -> 500', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Memory benchmark for the population representations.
+
+Measures the bytes per agent allocated by `Simulation._create_population`
+for a list of `Person` objects and for the compact `Population` container,
+next to the old `__dict__`-based `Person` for reference. Both the memory
+still held once the population is built and the peak while building it
+are reported.
+
+Run from the repository root:
+
+    python -m benchmarks.memory [pop_size ...]
+"""
+import sys
+import tracemalloc
+from simulation import Simulation
+from virus import Virus
+
+
+class DictPerson(object):
+    # The original Person layout, with a per-instance __dict__
+    def __init__(self, _id, is_vaccinated, infection=None):
+        self._id = _id
+        self.is_alive = True
+        self.is_vaccinated = is_vaccinated
+        self.infection = infection
+
+
+def bytes_per_agent(build, pop_size):
+    # Returns (held, peak) bytes per agent
+    tracemalloc.start()
+    population = build()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del population
+    return held / pop_size, peak / pop_size
+
+
+def measure(pop_size, vacc_percentage=0.1, initial_infected=10):
+    virus = Virus("Sniffles", 0.5, 0.12)
+    objects = Simulation(virus, 1, vacc_percentage, 0)
+    objects.pop_size = pop_size
+    objects.initial_infected = initial_infected
+    compact = Simulation(virus, 1, vacc_percentage, 0, compact=True)
+    compact.pop_size = pop_size
+    compact.initial_infected = initial_infected
+
+    def dict_people():
+        return [DictPerson(i, False) for i in range(pop_size)]
+
+    return {
+        'dict Person': bytes_per_agent(dict_people, pop_size),
+        'slotted Person': bytes_per_agent(objects._create_population, pop_size),
+        'Population': bytes_per_agent(compact._create_population, pop_size),
+    }
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10 ** 4, 10 ** 5, 10 ** 6]
+    print('Bytes per agent, held / peak')
+    print(f"{'pop_size':>10} {'dict Person':>16} {'slotted Person':>16} {'Population':>14} {'peak reduction':>15}")
+    for pop_size in sizes:
+        result = measure(pop_size)
+        columns = ' '.join(
+            f"{f'{held:.1f} / {peak:.1f}':>{width}}"
+            for (held, peak), width in zip(result.values(), (16, 16, 14))
+        )
+        reduction = result['dict Person'][1] / result['Population'][1]
+        print(f"{pop_size:>10} {columns} {reduction:>14.0f}x")
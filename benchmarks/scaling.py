@@ -0,0 +1,53 @@
+"""
+Strong-scaling benchmark for `ShardedSimulation`.
+
+Runs the same population, seed and number of shards with 1, 2, 4 and 8
+worker processes, times the first steps of each run and reports the
+speedup and parallel efficiency over one worker. Since the shards, not the
+workers, own the random streams, every run must reach the same counters;
+the benchmark checks that too.
+
+Run from the repository root:
+
+    python -m benchmarks.scaling [pop_size] [steps] [workers ...]
+"""
+import os
+import sys
+import time
+from sharded import ShardedSimulation
+from virus import Virus
+
+NUM_SHARDS = 8
+
+
+def measure(pop_size, steps, workers, seed=0):
+    # Returns (seconds per step, counters after the timed steps)
+    virus = Virus("Sniffles", 0.5, 0.12)
+    with ShardedSimulation(virus, pop_size, 0.1, 10, seed=seed, workers=workers,
+                           num_shards=NUM_SHARDS) as sim:
+        start = time.perf_counter()
+        for _ in range(steps):
+            if not sim.step():
+                break
+        seconds = (time.perf_counter() - start) / sim.num_steps
+        counters = (sim.num_steps, sim.total_deaths, sim.total_infected, sim.saved_by_vaccination)
+    return seconds, counters
+
+
+if __name__ == "__main__":
+    pop_size = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 7
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    worker_counts = [int(arg) for arg in sys.argv[3:]] or [1, 2, 4, 8]
+
+    print(f"pop_size {pop_size}, {NUM_SHARDS} shards, {steps} steps, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'s/step':>10} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    expected = None
+    for workers in worker_counts:
+        seconds, counters = measure(pop_size, steps, workers)
+        if baseline is None:
+            baseline, expected = seconds, counters
+        elif counters != expected:
+            raise AssertionError(f'{workers} workers gave {counters}, expected {expected}')
+        speedup = baseline / seconds
+        print(f"{workers:>8} {seconds:>10.3f} {speedup:>8.2f} {speedup / workers:>10.0%}")
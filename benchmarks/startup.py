@@ -0,0 +1,69 @@
+"""
+Startup-time benchmark for the engines.
+
+Times the construction of a simulation, i.e. laying out the vaccinated and
+infected people and building the engine's indexes, across population
+sizes, together with the peak memory allocated while doing it. The object
+engine is measured with a list of `Person` objects (the default), with
+people created on first use (`lazy=True`) and with the compact container.
+Sizes past `--max-objects` are skipped for the object engines, whose live
+indexes still hold a Python int per person.
+
+Run from the repository root:
+
+    python -m benchmarks.startup [pop_size ...] [--max-objects N]
+"""
+import argparse
+import time
+import tracemalloc
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+ENGINES = {
+    'objects': lambda virus, pop_size: Simulation(virus, pop_size, 0.1, 10, rng=0),
+    'lazy': lambda virus, pop_size: Simulation(virus, pop_size, 0.1, 10, rng=0, lazy=True),
+    'compact': lambda virus, pop_size: Simulation(virus, pop_size, 0.1, 10, rng=0, compact=True),
+    'vector': lambda virus, pop_size: VectorSimulation(virus, pop_size, 0.1, 10, seed=0),
+}
+
+
+def measure(build, pop_size):
+    # Returns (seconds, peak bytes) to construct one simulation. Tracing
+    # allocations slows construction down, so the two are measured apart.
+    virus = Virus("Sniffles", 0.5, 0.12)
+    start = time.perf_counter()
+    sim = build(virus, pop_size)
+    seconds = time.perf_counter() - start
+    del sim
+    tracemalloc.start()
+    sim = build(virus, pop_size)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del sim
+    return seconds, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sizes', nargs='*', type=lambda arg: int(float(arg)),
+                        default=[10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7])
+    parser.add_argument('--max-objects', type=lambda arg: int(float(arg)), default=10 ** 7,
+                        help='Largest pop_size to build with the object engines')
+    args = parser.parse_args(argv)
+
+    print('Construction time (s) / peak memory (bytes per agent)')
+    print(f"{'pop_size':>10}" + ''.join(f" {name:>18}" for name in ENGINES))
+    for pop_size in args.sizes:
+        columns = []
+        for name, build in ENGINES.items():
+            if name != 'vector' and pop_size > args.max_objects:
+                columns.append(f" {'-':>18}")
+                continue
+            seconds, peak = measure(build, pop_size)
+            columns.append(f" {f'{seconds:.3f} / {peak / pop_size:.1f}':>18}")
+        print(f"{pop_size:>10}" + ''.join(columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-step cost benchmark for `Simulation` as the population grows.
+
+Every run starts with the same 10 infected people, so the number of
+contacts in the first step is fixed and any growth in its cost comes from
+work that scales with the population. The live indexes are compared with
+the full-population scans `time_step` and `_simulation_should_continue`
+used to make.
+
+Run from the repository root:
+
+    python -m benchmarks.step_cost [pop_size ...]
+"""
+import random
+import sys
+import time
+from simulation import Simulation
+from virus import Virus
+
+
+def full_scan(sim):
+    # What each step used to do on top of the interactions
+    healthy_population = [p for p in sim.population if p.is_alive and p.infection is None]
+    infected_population = [p for p in sim.population if p.is_alive and p.infection]
+    should_continue = any(p.is_alive and not p.is_vaccinated for p in sim.population)
+    return healthy_population, infected_population, should_continue
+
+
+def timed(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(pop_size):
+    random.seed(0)
+    virus = Virus("Sniffles", 0.5, 0.12)
+    sim = Simulation(virus, pop_size, 0.1, 10)
+    scan = timed(lambda: full_scan(sim))
+    should_continue = timed(sim._simulation_should_continue)
+    start = time.perf_counter()
+    sim.time_step()
+    step = time.perf_counter() - start
+    return scan, should_continue, step
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+    print(f"{'pop_size':>10} {'old scans (ms)':>15} {'should_continue (us)':>21} {'time_step (ms)':>15}")
+    for pop_size in sizes:
+        scan, should_continue, step = measure(pop_size)
+        print(f"{pop_size:>10} {scan * 1e3:>15.2f} {should_continue * 1e6:>21.2f} {step * 1e3:>15.2f}")
@@ -0,0 +1,247 @@
+"""
+Throughput benchmark suite for the simulation hot paths.
+
+Times `Simulation._create_population`, `time_step`, `interaction`,
+`_simulation_should_continue` and every `Logger` write path (unbuffered and
+buffered) for each population size and vaccination rate, and reports the
+throughput of each case along with its peak traced memory:
+- create_population, time_step: agents (agent-steps) per second.
+- interaction, should_continue, logger.*: calls per second.
+
+Results can be saved as a baseline and later runs checked against it: the
+suite exits with status 1 when a case's throughput drops, or its peak
+memory grows, by more than `--threshold` relative to the baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --save                # record a baseline
+    python -m benchmarks.suite                       # check against it
+    python -m benchmarks.suite --sizes 1e3 1e7 --engine vector
+    python -m benchmarks.suite --engine event
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from event_engine import EventSimulation
+from logger import Logger
+from person import Person
+from rng import RandomStream
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+DEFAULT_SIZES = (10 ** 3, 10 ** 4, 10 ** 5)
+DEFAULT_VACC = (0.1, 0.5, 0.9)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Infected people at the start of a timed step, per agent
+INFECTED_FRACTION = 0.001
+
+# Number of calls timed per measurement of the per-call cases
+CALLS = 10000
+
+
+def make_simulation(engine, pop_size, vacc_percentage, seed=0):
+    virus = Virus("Sniffles", 0.5, 0.12)
+    initial_infected = max(1, int(pop_size * INFECTED_FRACTION))
+    if engine == 'vector':
+        return VectorSimulation(virus, pop_size, vacc_percentage, initial_infected, seed=seed)
+    if engine == 'event':
+        return EventSimulation(virus, pop_size, vacc_percentage, initial_infected, rng=RandomStream(seed))
+    return Simulation(virus, pop_size, vacc_percentage, initial_infected,
+                      compact=(engine == 'compact'), rng=RandomStream(seed))
+
+
+def best_time(setup, function, repeat):
+    # Fastest of `repeat` runs of function(setup()), setup not timed
+    best = float('inf')
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(setup, function):
+    # Peak traced bytes allocated by one run of function(setup())
+    args = setup()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(setup, function, work, repeat, memory=True):
+    """
+    Time `function` and return its result record: `work` units are done
+    per call, so `rate` is units per second.
+    """
+    seconds = best_time(setup, function, repeat)
+    return {
+        'seconds': seconds,
+        'rate': work / seconds if seconds else float('inf'),
+        'peak_bytes': peak_memory(setup, function) if memory else None,
+    }
+
+
+def simulation_cases(engine, pop_size, vacc_percentage, repeat):
+    cases = {}
+
+    def fresh():
+        return (make_simulation(engine, pop_size, vacc_percentage),)
+
+    cases['create_population'] = measure(
+        fresh, lambda sim: sim._create_population(), pop_size, repeat)
+    cases['time_step'] = measure(fresh, lambda sim: sim.time_step(), pop_size, repeat)
+
+    sim = make_simulation(engine, pop_size, vacc_percentage)
+    cases['should_continue'] = measure(
+        lambda: (), lambda: [sim._simulation_should_continue() for _ in range(CALLS)],
+        CALLS, repeat, memory=False)
+    return cases
+
+
+def interaction_case(vacc_percentage, repeat):
+    # Contacts with a vaccinated person in `vacc_percentage` of the calls
+    sim = make_simulation('object', 100, vacc_percentage)
+    infected = Person(0, False, sim.virus)
+    num_vaccinated = int(CALLS * vacc_percentage)
+    targets = [Person(i, i < num_vaccinated) for i in range(CALLS)]
+
+    def interactions():
+        for person in targets:
+            sim.interaction(infected, person)
+        sim.newly_infected.clear()
+
+    return measure(lambda: (), interactions, CALLS, repeat, memory=False)
+
+
+def logger_cases(directory, repeat):
+    cases = {}
+    calls = {
+        'write_metadata': lambda logger: logger.write_metadata(1000, 0.1, 'Sniffles', 0.12, 0.5, 10),
+        'log_interactions': lambda logger: logger.log_interactions(1, 100000, 250),
+        'log_infection_survival': lambda logger: logger.log_infection_survival(1, 1000, 12),
+        'log_time_step': lambda logger: logger.log_time_step(100, 12, 100000, step=1, pop_size=1000),
+        'log_simulation_outcome': lambda logger: logger.log_simulation_outcome(50, 1000, 120, 4000),
+    }
+    for mode, buffer_size in (('unbuffered', None), ('buffered', 1 << 16)):
+        for name, call in calls.items():
+            path = os.path.join(directory, f'{mode}_{name}.txt')
+            count = CALLS // 10 if buffer_size is None else CALLS
+
+            def write(call=call, path=path, count=count, buffer_size=buffer_size):
+                with Logger(path, buffer_size=buffer_size) as logger:
+                    for _ in range(count):
+                        call(logger)
+
+            cases[f'logger.{mode}.{name}'] = measure(lambda: (), write, count, repeat, memory=False)
+    return cases
+
+
+def run_suite(sizes=DEFAULT_SIZES, vacc_percentages=DEFAULT_VACC, engine='object', repeat=3):
+    """
+    Run every case and return a dict of case name -> result record
+    (`seconds`, `rate`, `peak_bytes`).
+    """
+    results = {}
+    for pop_size in sizes:
+        for vacc_percentage in vacc_percentages:
+            cases = simulation_cases(engine, pop_size, vacc_percentage, repeat)
+            for name, result in cases.items():
+                results[f'{name}[{engine},pop={pop_size},vacc={vacc_percentage}]'] = result
+    for vacc_percentage in vacc_percentages:
+        results[f'interaction[vacc={vacc_percentage}]'] = interaction_case(vacc_percentage, repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        results.update(logger_cases(directory, repeat))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare `results` with the `baseline` results.
+    Returns the list of (case, metric, baseline value, new value) for every
+    case slower, or using more peak memory, than the baseline by more than
+    `threshold` (a fraction). Cases missing from either side are ignored.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result['rate'] < old['rate'] * (1 - threshold):
+            regressions.append((name, 'rate', old['rate'], result['rate']))
+        if (result['peak_bytes'] is not None and old.get('peak_bytes')
+                and result['peak_bytes'] > old['peak_bytes'] * (1 + threshold)):
+            regressions.append((name, 'peak_bytes', old['peak_bytes'], result['peak_bytes']))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, 'r') as file:
+        return json.load(file)['results']
+
+
+def save_baseline(path, results):
+    baseline = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'w') as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+
+
+def print_results(results):
+    print(f"{'case':<60} {'per second':>14} {'peak (MB)':>10}")
+    for name, result in results.items():
+        peak = '' if result['peak_bytes'] is None else f"{result['peak_bytes'] / 1e6:.2f}"
+        print(f"{name:<60} {result['rate']:>14,.0f} {peak:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the simulation hot paths.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES,
+                        help='Population sizes, e.g. 1e3 1e5')
+    parser.add_argument('--vacc', type=float, nargs='+', default=DEFAULT_VACC,
+                        help='Vaccination percentages')
+    parser.add_argument('--engine', choices=('object', 'compact', 'vector', 'event'), default='object')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='Store this run as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed fractional regression against the baseline')
+    args = parser.parse_args(argv)
+
+    results = run_suite([int(size) for size in args.sizes], args.vacc, args.engine, args.repeat)
+    print_results(results)
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save to create one")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name}: {metric} {old:,.0f} -> {new:,.0f}")
+    if regressions:
+        return 1
+    print(f"No regressions past {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (e.g. on Windows): eviction is then not serialized
+    # across processes, which can only make it evict a little too much
+    fcntl = None
+
+# Tag mixed into every cache key. Bump it whenever a change to the engines
+# changes the outcome of a seeded run, so stale results are never served.
+CODE_VERSION = 2
+
+
+class ResultCache(object):
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        """
+        Persistent on-disk cache of run outcomes and per-step series.
+
+        Every entry is a JSON file named after its key, the SHA-256 of the
+        canonical JSON of the run's parameters (see `Simulation.cache_params`)
+        plus CODE_VERSION. Entries are written to a temporary file and
+        renamed into place, so a reader never sees half an entry and any
+        number of processes can share the directory. Reading an entry
+        touches its modification time, and once the entries take more than
+        `max_bytes` the least recently used ones are evicted, under an
+        exclusive lock on the directory's `.lock` file.
+
+        Attributes:
+        - hits, misses: Lookups answered and missed by this instance.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Pickled to pool workers without this process's counts
+        return {'directory': self.directory, 'max_bytes': self.max_bytes, 'hits': 0, 'misses': 0}
+
+    def key(self, params):
+        text = json.dumps(dict(params, code_version=CODE_VERSION), sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        # Return the entry stored under `key`, or None
+        path = self.path(key)
+        try:
+            with open(path, 'r') as file:
+                entry = json.load(file)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted meanwhile, or unreadable: run it again
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self.path(key)
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(entry, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def entries(self):
+        # (modification time, size, path) of every entry
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def __len__(self):
+        return len(self.entries())
+
+    def evict(self):
+        # Remove the least recently used entries until they fit in max_bytes
+        with self._lock():
+            entries = sorted(self.entries())
+            size = sum(entry[1] for entry in entries)
+            for mtime, entry_size, path in entries:
+                if size <= self.max_bytes:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                size -= entry_size
+
+    def clear(self):
+        with self._lock():
+            for mtime, size, path in self.entries():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,107 @@
+import unittest
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import cache
+from cache import ResultCache
+from ensemble import run_ensemble
+from logger import Logger
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+def fill(directory, worker):
+    # Write entries from another process, reading each one back
+    results = ResultCache(directory, max_bytes=4000)
+    for i in range(20):
+        key = results.key({'worker': worker, 'i': i})
+        results.put(key, {'value': [worker, i] * 10})
+        entry = results.get(key)
+        if entry is not None and entry['value'][:2] != [worker, i]:
+            return False
+    return True
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.directory.name, 'cache'))
+        self.virus = Virus("Test", 0.05, 0.12)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_put_get(self):
+        key = self.cache.key({'pop_size': 10, 'repro_rate': 0.5})
+        self.assertEqual(key, self.cache.key({'repro_rate': 0.5, 'pop_size': 10}))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {'counters': {'total_deaths': 3}})
+        self.assertEqual(self.cache.get(key), {'counters': {'total_deaths': 3}})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        # A new code version never sees the old results
+        version = cache.CODE_VERSION
+        cache.CODE_VERSION = version + 1
+        try:
+            self.assertNotEqual(self.cache.key({'pop_size': 10, 'repro_rate': 0.5}), key)
+        finally:
+            cache.CODE_VERSION = version
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 300
+        keys = [self.cache.key({'i': i}) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, {'value': 'x' * 80})
+            os.utime(self.cache.path(key), ns=(i * 10 ** 9, i * 10 ** 9))
+        # Reading the oldest entry makes the second one least recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.put(self.cache.key({'i': 3}), {'value': 'x' * 80})
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertEqual(len(self.cache), 3)
+
+    def test_concurrent_processes(self):
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(fill, [self.cache.directory] * 3, range(3)))
+        self.assertTrue(all(results))
+        sizes = [size for mtime, size, path in self.cache.entries()]
+        self.assertLessEqual(sum(sizes), 4000)
+        self.assertFalse([name for name in os.listdir(self.cache.directory) if name.endswith('.tmp')])
+
+    def run_logged(self, sim, name):
+        sim.logger = Logger(os.path.join(self.directory.name, name), clock=lambda: datetime(2020, 1, 1))
+        sim.run(cache=self.cache)
+        with open(sim.logger.file_name) as file:
+            return file.read()
+
+    def test_simulation_run(self):
+        for engine in (lambda: Simulation(self.virus, 500, 0.1, 5, rng=3),
+                       lambda: VectorSimulation(self.virus, 500, 0.1, 5, seed=3)):
+            first = engine()
+            log = self.run_logged(first, 'first.txt')
+            second = engine()
+            self.assertEqual(self.run_logged(second, 'second.txt'), log)
+            for name in ('num_steps', 'total_deaths', 'total_infected', 'saved_by_vaccination'):
+                self.assertEqual(getattr(second, name), getattr(first, name))
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(len(self.cache), 2)
+
+        # Unseeded runs are never cached
+        self.run_logged(Simulation(self.virus, 500, 0.1, 5), 'unseeded.txt')
+        self.assertEqual(len(self.cache), 2)
+
+    def test_ensemble(self):
+        first = run_ensemble(self.virus, 300, 0.1, 5, replicates=3, seed=2, workers=1, cache=self.cache)
+        second = run_ensemble(self.virus, 300, 0.1, 5, replicates=3, seed=2, workers=1, cache=self.cache)
+        self.assertEqual(self.cache.hits, 3)
+        self.assertEqual(first.outcome('total_deaths').tolist(), second.outcome('total_deaths').tolist())
+        self.assertEqual(first.series['total_deaths'].tolist(), second.series['total_deaths'].tolist())
+
+        run_ensemble(self.virus, 300, 0.1, 5, replicates=3, seed=2, workers=1, cache=self.cache, max_steps=2)
+        self.assertEqual(len(self.cache), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+import os
+import numpy as np
+from event_engine import EventSimulation
+from multi_strain import MultiStrainSimulation
+from sharded import ShardedSimulation
+from simulation import Simulation
+from strata import Group, Strata, StratifiedSimulation
+from vector_simulation import VectorSimulation
+from virus import Virus, StrainRegistry
+
+
+class Checkpointer(object):
+    def __init__(self, path, every=100):
+        """
+        Save a snapshot of a running simulation to `path` every `every`
+        steps. Pass it as the `checkpoint` of `Simulation.run` and continue
+        an interrupted run with `resume(path)`.
+
+        A snapshot is one compressed .npz file holding the simulation's
+        engine and parameters, its state arrays (see `Simulation.get_state`),
+        its counters, `num_steps`, the state of its random source, and the
+        size of the log at the time.
+        It is written to a temporary file and then renamed over the old one,
+        so a crash while saving leaves the previous snapshot intact.
+        """
+        self.path = path
+        self.every = every
+
+    def after_step(self, sim, should_continue):
+        # Called by the run loop once a step has been logged
+        if should_continue and sim.num_steps % self.every == 0:
+            save_checkpoint(self.path, sim, should_continue)
+
+
+def save_checkpoint(path, sim, should_continue=True):
+    """
+    Write a snapshot of `sim`, taken between two steps, to `path`.
+    The log is flushed first, so that the snapshot records how much of it
+    belongs to the steps taken so far.
+    """
+    sim.logger.flush()
+    log_size = os.path.getsize(sim.logger.file_name) if os.path.exists(sim.logger.file_name) else 0
+    config = {
+        'engine': sim.engine,
+        'virus_name': sim.virus.name,
+        'repro_rate': sim.virus.repro_rate,
+        'mortality_rate': sim.virus.mortality_rate,
+        'pop_size': sim.pop_size,
+        'vacc_percentage': sim.vacc_percentage,
+        'initial_infected': sim.initial_infected,
+        **sim.checkpoint_params(),
+        'log_file': sim.logger.file_name,
+        'log_size': log_size,
+        'should_continue': should_continue,
+    }
+    arrays = dict(sim.get_state())
+    arrays['config'] = np.frombuffer(json.dumps(config).encode(), dtype=np.uint8)
+
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        np.savez_compressed(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def _build_simulation(config, graph, workers, log_buffer_size, log_clock):
+    # A fresh simulation of the engine and parameters of a snapshot. Every
+    # engine is seeded with a throwaway stream: the saved random state
+    # replaces it.
+    virus = Virus(config['virus_name'], config['repro_rate'], config['mortality_rate'])
+    args = (virus, config['pop_size'], config['vacc_percentage'], config['initial_infected'])
+    kwargs = dict(log_buffer_size=log_buffer_size, log_clock=log_clock)
+    engine = config['engine']
+    if engine == 'object':
+        return Simulation(*args, compact=config['compact'], lazy=config.get('lazy', False),
+                          sampling=config['sampling'], graph=graph, rng=0, **kwargs)
+    if engine == 'vector':
+        return VectorSimulation(*args, sampling=config['sampling'], graph=graph, seed=0, **kwargs)
+    if engine == 'event':
+        return EventSimulation(*args, compact=config['compact'], rng=0, **kwargs)
+    if engine == 'sharded':
+        return ShardedSimulation(*args, seed=0, workers=workers, num_shards=config['num_shards'], **kwargs)
+    if engine == 'multi_strain':
+        strains = StrainRegistry([Virus(*strain) for strain in config['strains']], config['cross_immunity'])
+        return MultiStrainSimulation(strains, *args[1:], seed=0, **kwargs)
+    if engine == 'stratified':
+        strata = Strata([Group(*group) for group in config['groups']])
+        return StratifiedSimulation(*args, strata=strata, seed=0, **kwargs)
+    raise ValueError(f'Cannot resume a snapshot of the {engine!r} engine')
+
+
+def load_checkpoint(path, graph=None, log_buffer_size=None, log_clock=None, workers=None):
+    """
+    Rebuild the simulation saved in the snapshot at `path`, on the engine
+    it was running on.
+    A contact `graph` is not part of the snapshot and has to be passed
+    again; `workers` is the number of processes a sharded run continues
+    on (see `ShardedSimulation`). Returns (simulation, config), where
+    `config` holds the simulation parameters along with `log_size` and
+    `should_continue`.
+    """
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    config = json.loads(state.pop('config').tobytes().decode())
+
+    sim = _build_simulation(config, graph, workers, log_buffer_size, log_clock)
+    sim.set_state(state)
+    sim.logger.file_name = config['log_file']
+    return sim, config
+
+
+def resume(path, every=100, graph=None, log_buffer_size=None, log_clock=None, workers=None):
+    """
+    Continue the run saved in the snapshot at `path` until it ends, saving
+    new snapshots to `path` every `every` steps.
+    The log is cut back to its size at the time of the snapshot, dropping
+    any steps logged after it, and appended to from there, so the finished
+    log and counters are the same as for an uninterrupted run.
+    Returns the finished simulation.
+    """
+    sim, config = load_checkpoint(path, graph, log_buffer_size, log_clock, workers)
+    with open(config['log_file'], 'r+b') as file:
+        file.truncate(config['log_size'])
+    print(f"****Resume Simulation****\n Virus: {sim.virus.name} | Step: {sim.num_steps}")
+    sim.continue_run(config['should_continue'], Checkpointer(path, every))
+    return sim
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python checkpoint.py <checkpoint.npz> [every]")
+        sys.exit(1)
+    resume(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,146 @@
+import unittest
+import os
+import random
+import tempfile
+from datetime import datetime
+from checkpoint import Checkpointer, resume, load_checkpoint
+from event_engine import EventSimulation
+from multi_strain import MultiStrainSimulation
+from rng import RandomStream, NumpyRandom
+from sharded import ShardedSimulation
+from simulation import Simulation, STATE_COUNTERS
+from strata import Group, Strata, StratifiedSimulation
+from vector_simulation import VectorSimulation
+from virus import Virus, StrainRegistry
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CrashingCheckpointer(Checkpointer):
+    # Saves snapshots as usual, then dies a few steps after one
+    def __init__(self, path, every, crash_at):
+        super().__init__(path, every)
+        self.crash_at = crash_at
+
+    def after_step(self, sim, should_continue):
+        super().after_step(sim, should_continue)
+        if sim.num_steps == self.crash_at:
+            raise Interrupted()
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.02, 0.1)
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = lambda: datetime(2020, 1, 1)
+        self.path = os.path.join(self.directory.name, 'run.npz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def log_path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def run_both_ways(self, make_simulation, **resume_kwargs):
+        # Returns the (log, counters) of an uninterrupted and a resumed run
+        whole = make_simulation()
+        whole.logger.file_name = self.log_path('whole.txt')
+        whole.run()
+
+        interrupted = make_simulation()
+        interrupted.logger.file_name = self.log_path('resumed.txt')
+        with self.assertRaises(Interrupted):
+            interrupted.run(checkpoint=CrashingCheckpointer(self.path, every=3, crash_at=5))
+        resumed = resume(self.path, every=3, log_clock=self.clock, **resume_kwargs)
+
+        results = []
+        for sim in (whole, resumed):
+            with open(sim.logger.file_name) as file:
+                results.append((file.read(), [getattr(sim, name) for name in STATE_COUNTERS]))
+        return results
+
+    def test_resumed_run_matches_uninterrupted(self):
+        engines = {
+            'object': lambda: Simulation(self.virus, 400, 0.1, 5, rng=RandomStream(3), log_clock=self.clock),
+            'compact': lambda: Simulation(self.virus, 400, 0.1, 5, compact=True, rng=NumpyRandom(3),
+                                          log_clock=self.clock),
+            'aggregate': lambda: Simulation(self.virus, 400, 0.1, 5, rng=3, sampling='aggregate',
+                                            log_clock=self.clock),
+            'vector': lambda: VectorSimulation(self.virus, 400, 0.1, 5, seed=3, log_clock=self.clock,
+                                               log_buffer_size=1 << 10),
+            'event': lambda: EventSimulation(self.virus, 400, 0.1, 5, rng=3, log_clock=self.clock),
+            'event_compact': lambda: EventSimulation(self.virus, 400, 0.1, 5, compact=True, rng=NumpyRandom(3),
+                                                     log_clock=self.clock),
+            'multi_strain': lambda: MultiStrainSimulation(
+                StrainRegistry([self.virus, Virus("Other", 0.03, 0.2)], [[1.0, 0.5], [0.2, 1.0]]),
+                400, 0.1, [3, 2], seed=3, log_clock=self.clock),
+            'stratified': lambda: StratifiedSimulation(
+                self.virus, 400, 0.1, 5, strata=Strata([Group('young', 0.4, contacts=150), Group('old', 0.6, 3.0)]),
+                seed=3, log_clock=self.clock),
+        }
+        for name, make_simulation in engines.items():
+            (whole_log, whole_counters), (resumed_log, resumed_counters) = self.run_both_ways(make_simulation)
+            self.assertGreater(whole_counters[STATE_COUNTERS.index('num_steps')], 5, name)
+            self.assertEqual(resumed_counters, whole_counters, name)
+            self.assertEqual(resumed_log, whole_log, name)
+
+    def test_sharded_run_resumes_on_other_workers(self):
+        def make_simulation():
+            return ShardedSimulation(self.virus, 2000, 0.1, 5, seed=3, workers=2, num_shards=3,
+                                     log_clock=self.clock)
+
+        for workers in (0, 1):
+            (whole_log, whole_counters), (resumed_log, resumed_counters) = self.run_both_ways(
+                make_simulation, workers=workers)
+            self.assertGreater(whole_counters[STATE_COUNTERS.index('num_steps')], 5)
+            self.assertEqual(resumed_counters, whole_counters)
+            self.assertEqual(resumed_log, whole_log)
+        self.assertEqual(load_checkpoint(self.path, workers=0)[1]['engine'], 'sharded')
+
+    def test_multi_strain_counters_are_restored(self):
+        sim = MultiStrainSimulation([self.virus, Virus("Other", 0.03, 0.2)], 400, 0.1, [3, 2], seed=4)
+        sim.logger.file_name = self.log_path('log.txt')
+        sim.step()
+        sim.step()
+        Checkpointer(self.path, every=2).after_step(sim, True)
+
+        loaded, config = load_checkpoint(self.path)
+        self.assertIsInstance(loaded, MultiStrainSimulation)
+        self.assertEqual(config['initial_infected'], [3, 2])
+        self.assertEqual(loaded.strains.name, "Test+Other")
+        self.assertEqual(loaded.strains.cross_immunity, sim.strains.cross_immunity)
+        self.assertEqual(loaded.strain_deaths.tolist(), sim.strain_deaths.tolist())
+        self.assertEqual(loaded.strain.tolist(), sim.strain.tolist())
+        self.assertEqual(loaded.immunity.tolist(), sim.immunity.tolist())
+
+    def test_global_random_state_is_restored(self):
+        def make_simulation():
+            random.seed(9)
+            return Simulation(self.virus, 300, 0.1, 5, log_clock=self.clock)
+
+        (whole_log, whole_counters), (resumed_log, resumed_counters) = self.run_both_ways(make_simulation)
+        self.assertEqual(resumed_counters, whole_counters)
+        self.assertEqual(resumed_log, whole_log)
+
+    def test_snapshot_contents(self):
+        sim = Simulation(self.virus, 200, 0.2, 5, rng=1)
+        sim.logger.file_name = self.log_path('log.txt')
+        sim.step()
+        sim.step()
+        Checkpointer(self.path, every=2).after_step(sim, True)
+
+        loaded, config = load_checkpoint(self.path)
+        self.assertEqual(loaded.num_steps, 2)
+        self.assertEqual(loaded.susceptible.ids, sim.susceptible.ids)
+        self.assertEqual(loaded.immune.ids, sim.immune.ids)
+        self.assertEqual(loaded.infected, sim.infected)
+        self.assertEqual(len(loaded.dead_population), sim.total_deaths)
+        self.assertEqual(loaded.rng.random(), sim.rng.random())
+        self.assertTrue(config['should_continue'])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cache import ResultCache
+from event_engine import EventSimulation
+from simulation import Simulation, STEP_SERIES
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+# Simulation engines a replicate can run on
+ENGINES = {
+    'object': Simulation,
+    'vector': VectorSimulation,
+    'event': EventSimulation,
+}
+
+# Outcomes reported for every replicate
+OUTCOMES = ('steps', 'total_deaths', 'saved_by_vaccination', 'total_infected')
+
+# Counters recorded after every step of a replicate
+SERIES = STEP_SERIES
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class RunResult(object):
+    # Outcome of a single replicate run.
+    def __init__(self, steps, total_deaths, saved_by_vaccination, total_infected, series):
+        self.steps = steps
+        self.total_deaths = total_deaths
+        self.saved_by_vaccination = saved_by_vaccination
+        self.total_infected = total_infected
+        self.series = series  # dict of counter name -> list of per-step values
+
+
+class EnsembleResult(object):
+    def __init__(self, config, entropy, runs):
+        """
+        Aggregated outcome of an ensemble of replicate runs.
+
+        Attributes:
+        - config: The simulation parameters every replicate was run with.
+        - entropy: Root seed the replicate streams were spawned from.
+        - runs: The `RunResult` of every replicate, in replicate order.
+        - series: dict of counter name -> array of shape (replicates, steps).
+          Runs that ended early are padded with their final value.
+        """
+        self.config = config
+        self.entropy = entropy
+        self.runs = runs
+        max_steps = max(run.steps for run in runs)
+        self.series = {
+            name: np.array([_pad(run.series[name], max_steps) for run in runs])
+            for name in SERIES
+        }
+
+    def outcome(self, name):
+        return np.array([getattr(run, name) for run in self.runs])
+
+    def mean(self, name):
+        return float(self.outcome(name).mean())
+
+    def quantiles(self, name, quantiles=QUANTILES):
+        return dict(zip(quantiles, np.quantile(self.outcome(name), quantiles).tolist()))
+
+    def series_mean(self, name):
+        return self.series[name].mean(axis=0)
+
+    def series_quantiles(self, name, quantiles=QUANTILES):
+        return np.quantile(self.series[name], quantiles, axis=0)
+
+    def summary(self):
+        summary = {
+            'config': self.config,
+            'entropy': self.entropy,
+            'replicates': len(self.runs),
+        }
+        for name in OUTCOMES:
+            summary[name] = {
+                'mean': self.mean(name),
+                'quantiles': {str(q): v for q, v in self.quantiles(name).items()},
+            }
+        summary['series_mean'] = {name: self.series_mean(name).tolist() for name in SERIES}
+        return summary
+
+
+def _pad(values, length):
+    # A run cut off before its first step has no series: pad it with zeros
+    if not len(values):
+        return [0] * length
+    return list(values) + [values[-1]] * (length - len(values))
+
+
+def ensemble_config(virus, pop_size, vacc_percentage, initial_infected, engine, max_steps):
+    # The parameters every replicate of an ensemble is run with
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {sorted(ENGINES)}')
+    return {
+        'virus_name': virus.name,
+        'repro_rate': virus.repro_rate,
+        'mortality_rate': virus.mortality_rate,
+        'pop_size': pop_size,
+        'vacc_percentage': vacc_percentage,
+        'initial_infected': initial_infected,
+        'engine': engine,
+        'max_steps': max_steps,
+    }
+
+
+def make_simulation(config, seed_sequence):
+    """
+    Build the simulation for one replicate from `config`, seeded from its
+    own `seed_sequence` so that every replicate draws an independent stream.
+    """
+    virus = Virus(config['virus_name'], config['repro_rate'], config['mortality_rate'])
+    args = (virus, config['pop_size'], config['vacc_percentage'], config['initial_infected'])
+    if config['engine'] == 'vector':
+        return VectorSimulation(*args, seed=seed_sequence)
+    return ENGINES[config['engine']](*args, rng=seed_sequence)
+
+
+def run_replicate(config, seed_sequence, cache=None):
+    """
+    Run one replicate to completion without logging and return its outcome.
+    The run is cut off after `config['max_steps']` steps when that is set.
+    With a `cache` (see cache.py) a replicate that was run before is read
+    back instead; it shares its entry with a `Simulation.run` of the same
+    parameters and seed.
+    """
+    sim = make_simulation(config, seed_sequence)
+    max_steps = config.get('max_steps')
+    key = cache.key(sim.cache_params(max_steps)) if cache is not None else None
+    entry = cache.get(key) if key is not None else None
+    if entry is not None:
+        counters = entry['counters']
+        return RunResult(counters['num_steps'], counters['total_deaths'], counters['saved_by_vaccination'],
+                         counters['total_infected'], entry['series'])
+
+    series = {name: [] for name in SERIES}
+    if max_steps is None or max_steps > 0:
+        for snapshot in sim.iter_steps():
+            for name in SERIES:
+                series[name].append(getattr(snapshot, name))
+            if max_steps is not None and snapshot.step >= max_steps:
+                break
+    if key is not None:
+        cache.put(key, sim.cache_entry(series))
+    return RunResult(sim.num_steps, sim.total_deaths, sim.saved_by_vaccination, sim.total_infected, series)
+
+
+def run_ensemble(virus, pop_size, vacc_percentage, initial_infected=1, replicates=100,
+                 seed=None, workers=None, engine='vector', max_steps=None, cache=None):
+    """
+    Run `replicates` independent simulations of the same configuration and
+    aggregate their outcomes.
+    - Every replicate gets its own RNG stream spawned from `seed`, so the
+      ensemble is reproducible regardless of how the runs are scheduled.
+    - `workers` is the size of the process pool (default: one per CPU core);
+      with `workers=1` the replicates run in this process.
+    - `max_steps` caps the length of every replicate.
+    - `cache` is an optional `ResultCache`; with a `seed`, replicates run
+      before are read from it instead of being simulated again.
+    """
+    config = ensemble_config(virus, pop_size, vacc_percentage, initial_infected, engine, max_steps)
+    root = np.random.SeedSequence(seed)
+    seeds = root.spawn(replicates)
+    if seed is None:
+        # Fresh entropy every time: nothing to look up
+        cache = None
+
+    if workers == 1:
+        runs = [run_replicate(config, s, cache) for s in seeds]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, replicates // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            runs = list(executor.map(run_replicate, [config] * replicates, seeds, [cache] * replicates,
+                                     chunksize=chunksize))
+    return EnsembleResult(config, root.entropy, runs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run an ensemble of replicate simulations.')
+    parser.add_argument('pop_size', type=int)
+    parser.add_argument('vacc_percentage', type=float)
+    parser.add_argument('virus_name')
+    parser.add_argument('mortality_rate', type=float)
+    parser.add_argument('repro_rate', type=float)
+    parser.add_argument('initial_infected', type=int, nargs='?', default=1)
+    parser.add_argument('--replicates', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='vector')
+    parser.add_argument('--output', help='Write the aggregated result to this JSON file')
+    parser.add_argument('--cache', help='Directory of a result cache for seeded runs')
+    args = parser.parse_args(argv)
+
+    virus = Virus(args.virus_name, args.repro_rate, args.mortality_rate)
+    result = run_ensemble(
+        virus, args.pop_size, args.vacc_percentage, args.initial_infected,
+        replicates=args.replicates, seed=args.seed, workers=args.workers, engine=args.engine,
+        cache=ResultCache(args.cache) if args.cache else None
+    )
+
+    summary = result.summary()
+    print(f"****Ensemble of {summary['replicates']} runs**** (seed entropy {summary['entropy']})")
+    for name in OUTCOMES:
+        quantiles = ', '.join(f'q{q}={v:g}' for q, v in summary[name]['quantiles'].items())
+        print(f"{name}: mean {summary[name]['mean']:g} | {quantiles}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(summary, file, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import unittest
+import random
+import numpy as np
+from ensemble import run_ensemble, SERIES
+from virus import Virus
+
+
+class TestEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.5, 0.12)
+
+    def test_replicates_are_reproducible(self):
+        first = run_ensemble(self.virus, 500, 0.1, 5, replicates=4, seed=3, workers=1)
+        second = run_ensemble(self.virus, 500, 0.1, 5, replicates=4, seed=3, workers=1)
+        self.assertEqual(first.outcome('total_deaths').tolist(), second.outcome('total_deaths').tolist())
+
+        # Each replicate draws from its own stream
+        self.assertGreater(len(set(first.outcome('saved_by_vaccination').tolist())), 1)
+
+    def test_pool_matches_serial_run(self):
+        serial = run_ensemble(self.virus, 500, 0.1, 5, replicates=4, seed=11, workers=1)
+        pooled = run_ensemble(self.virus, 500, 0.1, 5, replicates=4, seed=11, workers=2)
+        self.assertEqual(serial.outcome('total_deaths').tolist(), pooled.outcome('total_deaths').tolist())
+        self.assertEqual(serial.outcome('steps').tolist(), pooled.outcome('steps').tolist())
+
+    def test_aggregated_series(self):
+        result = run_ensemble(self.virus, 200, 0.2, 2, replicates=5, seed=5, workers=1, engine='object')
+        max_steps = result.outcome('steps').max()
+        for name in SERIES:
+            self.assertEqual(result.series[name].shape, (5, max_steps))
+
+        # Padded series end on each run's final counters
+        final_deaths = result.series['total_deaths'][:, -1]
+        self.assertTrue(np.array_equal(final_deaths, result.outcome('total_deaths')))
+        self.assertAlmostEqual(result.mean('total_deaths'), final_deaths.mean())
+
+        quantiles = result.quantiles('total_deaths')
+        self.assertLessEqual(quantiles[0.05], quantiles[0.95])
+
+    def test_high_vaccination_ends(self):
+        # The epidemic dies out while unvaccinated people are still alive
+        result = run_ensemble(self.virus, 300, 0.99, 3, replicates=3, seed=2, workers=1)
+        self.assertTrue((result.outcome('steps') < 10).all())
+
+        capped = run_ensemble(self.virus, 500, 0.1, 5, replicates=2, seed=2, workers=1, max_steps=1)
+        self.assertEqual(capped.outcome('steps').tolist(), [1, 1])
+
+        # Runs cut off before their first step have empty series
+        empty = run_ensemble(self.virus, 500, 0.1, 5, replicates=2, seed=2, workers=1, max_steps=0)
+        self.assertEqual(empty.outcome('steps').tolist(), [0, 0])
+        self.assertEqual(empty.series['total_deaths'].shape, (2, 0))
+
+    def test_caller_random_state_is_kept(self):
+        random.seed(123)
+        expected = random.random()
+        random.seed(123)
+        run_ensemble(self.virus, 100, 0.1, 2, replicates=2, seed=1, workers=1, engine='object')
+        self.assertEqual(random.random(), expected)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            run_ensemble(self.virus, 100, 0.1, 1, replicates=1, engine='gpu')
+
+
+if __name__ == '__main__':
+    unittest.main()
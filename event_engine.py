@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import numpy as np
+from sampling import binomial
+from simulation import Simulation
+from virus import Virus
+
+# Time from infection until a person becomes infectious, and how long they
+# then stay infectious, in steps. Together they give the mean time between
+# an infection and the ones it causes of one step, as in the stepped engines.
+LATENT_PERIOD = 0.5
+INFECTIOUS_PERIOD = 1.0
+
+# Contacts an infected person makes over their infectious period, as in
+# the stepped engines
+CONTACTS = 100
+
+# Kinds of scheduled events
+ONSET = 0
+TRANSMISSION = 1
+RESOLUTION = 2
+
+
+class EventSimulation(Simulation):
+    engine = 'event'
+
+    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1, compact=False,
+                 log_buffer_size=None, series_writer=None, rng=None, log_clock=None, profiler=None):
+        """
+        Event-driven, continuous-time version of `Simulation`.
+
+        Instead of resolving every infected person once per step, the engine
+        keeps a priority queue of timed events and only does work when one
+        fires:
+        - A person infected at time t becomes infectious at t + 0.5
+          (LATENT_PERIOD) and stays so for one step (INFECTIOUS_PERIOD),
+          over which they make 100 contacts at uniformly random times. Only
+          the contacts that would transmit to a susceptible person are
+          scheduled: their number is binomial with the virus's `repro_rate`,
+          so an infection costs about `100 * repro_rate` + 2 events instead
+          of 100 interactions.
+        - At the onset of infectiousness, the other contacts are counted
+          at once: how many hit a vaccinated person is binomial with the
+          share of vaccinated or immune people among the healthy, just as
+          the stepped engines draw a whole step's contacts from the
+          population at the start of the step.
+        - A transmission event picks a uniformly random healthy person, as
+          a stepped contact does: a susceptible one is infected on the spot,
+          a vaccinated or immune one counts as saved by vaccination.
+        - At the end of the infectious period a resolution event decides,
+          with the virus's `mortality_rate` (see
+          `Person.did_survive_infection`), whether the person dies or
+          becomes immune.
+
+        `time_step()` fires the events of the next unit window of time, so
+        `run()`, `iter_steps()` and the `Logger` output work in steps just as
+        for `Simulation`. The first infected people are infectious from
+        time 0 and resolved at the end of the first step, as in `Simulation`.
+
+        Attributes (in addition to those of `Simulation`):
+        - time: Time of the last fired event.
+        - events: Heap of pending (time, sequence, kind, person id) events.
+        - infected: Set of the ids of the currently infected people.
+        """
+        self.time = 0.0
+        self.events = []
+        self._sequence = itertools.count()
+        self._contacts = {}
+        super().__init__(virus, pop_size, vacc_percentage, initial_infected, compact=compact,
+                         log_buffer_size=log_buffer_size, series_writer=series_writer,
+                         rng=rng, log_clock=log_clock, profiler=profiler)
+
+    def _index_population(self):
+        super()._index_population()
+        initial = self.infected
+        self.infected = set()
+        for _id in initial:
+            self._schedule_infection(_id, -LATENT_PERIOD)
+
+    def _schedule_infection(self, _id, time):
+        # Schedule the events of a new infection
+        self.infected.add(_id)
+        onset = time + LATENT_PERIOD
+        transmissions = binomial(CONTACTS, self.virus.repro_rate, self.rng.random)
+        self._contacts[_id] = CONTACTS - transmissions
+        self._push(onset, ONSET, _id)
+        for _ in range(transmissions):
+            self._push(onset + self.rng.random() * INFECTIOUS_PERIOD, TRANSMISSION, _id)
+        self._push(onset + INFECTIOUS_PERIOD, RESOLUTION, _id)
+
+    def _push(self, time, kind, _id):
+        heapq.heappush(self.events, (time, next(self._sequence), kind, _id))
+
+    def time_step(self):
+        """
+        Fire every event up to the end of the next step window, in order.
+        """
+        end = self.num_steps + 1
+        self.new_infections = 0
+        events = self.events
+        while events and events[0][0] <= end:
+            time, _, kind, _id = heapq.heappop(events)
+            self.time = time
+            if kind == TRANSMISSION:
+                self._transmission(time)
+            elif kind == ONSET:
+                self._onset(_id)
+            else:
+                self._resolution(_id)
+
+    def _onset(self, _id):
+        # Count the contacts that cannot transmit
+        contacts = self._contacts.pop(_id)
+        num_healthy = len(self.susceptible) + len(self.immune)
+        if num_healthy:
+            self.total_interactions += contacts
+            self.saved_by_vaccination += binomial(contacts, len(self.immune) / num_healthy, self.rng.random)
+
+    def _transmission(self, time):
+        num_susceptible = len(self.susceptible)
+        num_healthy = num_susceptible + len(self.immune)
+        if not num_healthy:
+            return
+        self.total_interactions += 1
+        position = self.rng.randrange(num_healthy)
+        if position >= num_susceptible:
+            self.saved_by_vaccination += 1
+            return
+        _id = self.susceptible[position]
+        self.population[_id].infection = self.virus
+        self.susceptible.discard(_id)
+        self.infected_and_alive += 1
+        self.total_infected += 1
+        self.new_infections += 1
+        self._schedule_infection(_id, time)
+
+    def _resolution(self, _id):
+        self.infected.discard(_id)
+        self.infected_and_alive -= 1
+        if self.population[_id].did_survive_infection(self.rng):
+            self.immune.add(_id)
+        else:
+            self.total_deaths += 1
+            self.death_interactions += 1
+
+    def get_state(self):
+        """
+        Same as `Simulation.get_state`, plus the clock and what is scheduled:
+        - time: Time of the last fired event.
+        - next_event: Sequence number the next scheduled event gets.
+        - event_times, event_sequence, event_kinds, event_ids: The fields of
+          the pending events, in heap order.
+        - contact_ids, contact_counts: The contacts still to be counted at
+          the onset of the people who are not infectious yet.
+        """
+        state = super().get_state()
+        sequence = next(self._sequence)
+        self._sequence = itertools.count(sequence)
+        times, order, kinds, ids = zip(*self.events) if self.events else ((), (), (), ())
+        state.update({
+            'time': np.array(self.time, dtype=np.float64),
+            'next_event': np.array(sequence, dtype=np.int64),
+            'event_times': np.array(times, dtype=np.float64),
+            'event_sequence': np.array(order, dtype=np.int64),
+            'event_kinds': np.array(kinds, dtype=np.int8),
+            'event_ids': np.array(ids, dtype=np.int64),
+            'contact_ids': np.fromiter(self._contacts.keys(), dtype=np.int64, count=len(self._contacts)),
+            'contact_counts': np.fromiter(self._contacts.values(), dtype=np.int64, count=len(self._contacts)),
+        })
+        return state
+
+    def set_state(self, state):
+        # Restore a state returned by `get_state`
+        super().set_state(state)
+        self.infected = set(self.infected)
+        self.time = float(state['time'])
+        self._sequence = itertools.count(int(state['next_event']))
+        # The events were saved in heap order, so the list is still a heap
+        self.events = list(zip(state['event_times'].tolist(), state['event_sequence'].tolist(),
+                               state['event_kinds'].tolist(), state['event_ids'].tolist()))
+        self._contacts = dict(zip(state['contact_ids'].tolist(), state['contact_counts'].tolist()))
+
+
+if __name__ == "__main__":
+    # Virus details
+    virus = Virus("Sniffles", 0.5, 0.12)
+
+    # Create and run the simulation
+    sim = EventSimulation(virus, 100000, 0.1, 10)
+    sim.run()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from ensemble import run_ensemble
+from event_engine import EventSimulation
+from logger import Logger
+from simulation import Simulation
+from virus import Virus
+
+
+class TestEventSimulation(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+
+    def test_counters_match_population(self):
+        for compact in (False, True):
+            sim = EventSimulation(self.virus, 1000, 0.2, 10, compact=compact, rng=1)
+            new_infections = 0
+            for snapshot in sim.iter_steps():
+                new_infections += snapshot.new_infections
+                self.assertEqual(len(sim.susceptible) + len(sim.immune) + len(sim.infected) + sim.total_deaths,
+                                 sim.pop_size)
+                self.assertEqual(sim.num_dead, sim.total_deaths)
+                self.assertLessEqual(sim.time, snapshot.step)
+            self.assertEqual(sim.total_infected, 10 + new_infections)
+            self.assertEqual(sim.infected, set())
+            self.assertEqual(sim.events, [])
+
+    def test_first_infected_resolve_in_first_step(self):
+        sim = EventSimulation(Virus("Test", 0.0, 0.5), 100, 0.1, 10, rng=2)
+        self.assertFalse(sim.step())
+        self.assertEqual(sim.num_steps, 1)
+        self.assertEqual(sim.total_deaths + len(sim.immune), 100 - len(sim.susceptible))
+        self.assertEqual(sim.total_interactions, 1000)
+
+    def test_matches_stepped_engine(self):
+        # Mean outcomes agree with the stepped engine's
+        event, stepped = [], []
+        for seed in range(40):
+            for sim, outcomes in ((EventSimulation(self.virus, 1000, 0.3, 10, rng=seed), event),
+                                  (Simulation(self.virus, 1000, 0.3, 10, rng=seed, sampling='aggregate'), stepped)):
+                while sim.step():
+                    pass
+                outcomes.append((sim.total_infected, sim.total_deaths, sim.saved_by_vaccination))
+        event, stepped = np.mean(event, axis=0), np.mean(stepped, axis=0)
+        self.assertTrue(np.allclose(event, stepped, rtol=0.1), (event, stepped))
+
+    def test_run_logs_steps(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sim = EventSimulation(self.virus, 500, 0.1, 5, rng=3)
+            sim.logger = Logger(os.path.join(directory, 'log.txt'))
+            sim.run()
+            with open(sim.logger.file_name) as file:
+                log = file.read()
+        self.assertIn(f'STEP NUMBER {sim.num_steps} ', log)
+        self.assertIn(f'Total Deaths: {sim.total_deaths}', log)
+
+    def test_ensemble_engine(self):
+        first = run_ensemble(self.virus, 300, 0.1, 5, replicates=3, seed=4, workers=1, engine='event')
+        second = run_ensemble(self.virus, 300, 0.1, 5, replicates=3, seed=4, workers=1, engine='event')
+        self.assertEqual(first.outcome('total_infected').tolist(), second.outcome('total_infected').tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import csv
+import time
+from collections import defaultdict
+
+# Simulation counters reported with every step, as (column, attribute, delta)
+STEP_COUNTERS = (
+    ('interactions', 'total_interactions', True),
+    ('deaths', 'total_deaths', True),
+    ('saved_by_vaccination', 'saved_by_vaccination', True),
+    ('new_infections', 'new_infections', False),
+    ('infected', 'infected_and_alive', False),
+)
+
+
+class _NullPhase(object):
+    # Context manager that does nothing, shared by every NullProfiler phase
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler(object):
+    """
+    Profiler that records nothing. It is the default `Simulation.profiler`,
+    so an uninstrumented run only pays for a few no-op calls per step.
+    """
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def begin_step(self, sim):
+        pass
+
+    def end_step(self, sim):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _Phase(object):
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._stack.append(self.name)
+        self.start = self.profiler.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = self.profiler.clock() - self.start
+        self.profiler._record(tuple(self.profiler._stack), elapsed)
+        self.profiler._stack.pop()
+        return False
+
+
+class Profiler(object):
+    enabled = True
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Time the phases of a simulation run, step by step.
+
+        The simulation wraps each phase of its work (`time_step`,
+        `interactions`, `log`, ...) in `phase(name)`; phases nest, and every
+        phase is recorded under its full path, e.g.
+        ('step', 'time_step', 'interactions').
+
+        Attributes:
+        - totals: dict of phase path -> total seconds over the whole run.
+        - calls: dict of phase path -> number of times the phase ran.
+        - steps: One row per step: the step number, its total time, the
+          seconds spent in each phase path (joined with '/') and the
+          simulation's counters for the step (see STEP_COUNTERS).
+        """
+        self.clock = clock
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.steps = []
+        self._stack = []
+        self._row = None
+        self._step_start = None
+        self._counters_start = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def _record(self, path, elapsed):
+        self.totals[path] += elapsed
+        self.calls[path] += 1
+        if self._row is not None:
+            key = '/'.join(path[1:])
+            self._row[key] = self._row.get(key, 0.0) + elapsed
+
+    def begin_step(self, sim):
+        self._row = {'step': sim.num_steps + 1}
+        self._counters_start = {attribute: getattr(sim, attribute) for _, attribute, _ in STEP_COUNTERS}
+        self._stack.append('step')
+        self._step_start = self.clock()
+
+    def end_step(self, sim):
+        elapsed = self.clock() - self._step_start
+        self._stack.pop()
+        self.totals[('step',)] += elapsed
+        self.calls[('step',)] += 1
+        row = self._row
+        row['total'] = elapsed
+        for column, attribute, delta in STEP_COUNTERS:
+            value = getattr(sim, attribute)
+            row[column] = value - self._counters_start[attribute] if delta else value
+        self.steps.append(row)
+        self._row = None
+
+    def columns(self):
+        # Column names of the step table, in first-seen order
+        columns = ['step', 'total']
+        for row in self.steps:
+            for column in row:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def write_table(self, path):
+        # Write the per-step table as CSV
+        columns = self.columns()
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns, restval=0)
+            writer.writeheader()
+            writer.writerows(self.steps)
+
+    def folded(self):
+        """
+        Return the run as folded stacks, one "run;step;time_step 1234" line
+        per phase path with its self time in microseconds (its total minus
+        its children's). This is the input format of flamegraph.pl and
+        speedscope.
+        """
+        self_time = dict(self.totals)
+        for path, total in self.totals.items():
+            parent = path[:-1]
+            if parent in self_time:
+                self_time[parent] -= total
+        lines = []
+        for path in sorted(self_time):
+            microseconds = int(round(max(0.0, self_time[path]) * 1e6))
+            if microseconds:
+                lines.append(f"{';'.join(('run',) + path)} {microseconds}")
+        return lines
+
+    def write_folded(self, path):
+        with open(path, 'w') as file:
+            file.write('\n'.join(self.folded()) + '\n')
+
+    def summary(self):
+        # Text table of the total time per phase path, slowest first
+        total = sum(seconds for path, seconds in self.totals.items() if len(path) == 1) or 1.0
+        lines = [f"{'phase':<40} {'calls':>8} {'seconds':>10} {'share':>7}"]
+        for path, seconds in sorted(self.totals.items(), key=lambda item: -item[1]):
+            lines.append(f"{'/'.join(path):<40} {self.calls[path]:>8} {seconds:>10.4f} {seconds / total:>7.1%}")
+        return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    from simulation import Simulation
+    from virus import Virus
+
+    profiler = Profiler()
+    sim = Simulation(Virus("Sniffles", 0.5, 0.12), 10000, 0.1, 10, rng=1, profiler=profiler)
+    sim.run()
+    print(profiler.summary())
+    print('\n'.join(profiler.folded()))
@@ -0,0 +1,86 @@
+import unittest
+import csv
+import itertools
+import os
+import tempfile
+from instrumentation import Profiler, NULL_PROFILER
+from logger import Logger
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_profiled(self, sim):
+        sim.logger = Logger(os.path.join(self.directory.name, 'log.txt'))
+        sim.run()
+        return sim
+
+    def test_folded_self_times(self):
+        # Each clock reading advances one second
+        ticks = itertools.count()
+        profiler = Profiler(clock=lambda: float(next(ticks)))
+        with profiler.phase('outer'):
+            with profiler.phase('inner'):
+                pass
+            with profiler.phase('inner'):
+                pass
+        self.assertEqual(profiler.totals[('outer',)], 5.0)
+        self.assertEqual(profiler.totals[('outer', 'inner')], 2.0)
+        self.assertEqual(profiler.calls[('outer', 'inner')], 2)
+        self.assertEqual(profiler.folded(), ['run;outer 3000000', 'run;outer;inner 2000000'])
+
+    def test_step_table(self):
+        profiler = Profiler()
+        sim = self.run_profiled(Simulation(self.virus, 500, 0.1, 5, rng=1, profiler=profiler))
+
+        self.assertEqual([row['step'] for row in profiler.steps], list(range(1, sim.num_steps + 1)))
+        self.assertEqual(sum(row['interactions'] for row in profiler.steps), sim.total_interactions)
+        self.assertEqual(sum(row['deaths'] for row in profiler.steps), sim.total_deaths)
+        for row in profiler.steps:
+            self.assertGreaterEqual(row['total'], row['time_step'])
+            self.assertGreaterEqual(row['time_step'], row['time_step/interactions'])
+            self.assertIn('log', row)
+
+        path = os.path.join(self.directory.name, 'steps.csv')
+        profiler.write_table(path)
+        with open(path) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), sim.num_steps)
+        self.assertIn('time_step/infect_newly_infected', rows[0])
+
+        path = os.path.join(self.directory.name, 'run.folded')
+        profiler.write_folded(path)
+        with open(path) as file:
+            stacks = [line.rsplit(' ', 1)[0] for line in file.read().splitlines()]
+        self.assertIn('run;step;time_step;interactions', stacks)
+        self.assertIn('run;write_metadata', stacks)
+
+    def test_vector_phases(self):
+        profiler = Profiler()
+        self.run_profiled(VectorSimulation(self.virus, 500, 0.1, 5, seed=1, profiler=profiler))
+        for phase in ('healthy_population', 'interactions', 'survival', 'infect_newly_infected'):
+            self.assertIn(('step', 'time_step', phase), profiler.totals)
+
+    def test_observers(self):
+        sim = Simulation(self.virus, 500, 0.1, 5, rng=1)
+        self.assertIs(sim.profiler, NULL_PROFILER)
+        seen = []
+        observer = sim.add_observer(lambda sim: seen.append((sim.num_steps, sim.total_deaths)))
+        self.run_profiled(sim)
+        self.assertEqual([step for step, deaths in seen], list(range(1, sim.num_steps + 1)))
+        self.assertEqual(seen[-1][1], sim.total_deaths)
+
+        sim.remove_observer(observer)
+        self.assertEqual(sim.observers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,69 @@
 from datetime import datetime
 
 class Logger(object):
-    def __init__(self, file_name):
+    def __init__(self, file_name, buffer_size=None, clock=datetime.now):
+        """
+        Write the simulation report to `file_name`.
+
+        By default every log call opens the file, appends its text and closes
+        it again. With `buffer_size` set (in characters), the logger instead
+        keeps one handle open and collects the text in memory, writing it out
+        whenever more than `buffer_size` characters are pending and when it is
+        flushed or closed. The text written is the same in both modes.
+
+        `clock` returns the datetime stamped into the metadata. Pass a fixed
+        one to make the reports of seeded runs byte-for-byte reproducible.
+
+        The logger can be used as a context manager, which closes it (and so
+        flushes any pending text) on exit, including on an exception.
+        """
         self.file_name = file_name
+        self.buffer_size = buffer_size
+        self.clock = clock
+        self._file = None
+        self._pending = []
+        self._pending_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write(self, text, mode='a'):
+        if self.buffer_size is None:
+            with open(self.file_name, mode) as file:
+                file.write(text)
+            return
+
+        if mode == 'w':
+            # Start the report over: drop the old handle and truncate
+            self.close()
+            self._file = open(self.file_name, 'w')
+        elif self._file is None:
+            self._file = open(self.file_name, 'a')
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size > self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        if self._pending:
+            self._file.write(''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self._file = None
 
     # The methods below are just suggestions. You can rearrange these or 
     # rewrite them to better suit your code style. 
@@ -22,7 +83,7 @@ class Logger(object):
 
     def write_metadata(self, pop_size, vacc_percentage, virus_name, mortality_rate,
                        repro_rate, initial_infected):
-        current_date = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
+        current_date = self.clock().strftime("%m/%d/%Y %H:%M:%S")
 
         meta_data = (
             f'- - - - - - - {virus_name} Simulation - - - - - - - \n\n'
@@ -36,8 +97,7 @@ class Logger(object):
             f' - - - - - - - - - - - - - - - - - - - - - - - - - -\n\n'
         )
 
-        with open(self.file_name, 'w') as file:
-            file.write(meta_data)
+        self._write(meta_data, 'w')
 
     def log_interactions(self, step_number, number_of_interactions, number_of_new_infections):
         interactions = (
@@ -46,8 +106,7 @@ class Logger(object):
             f'New Infections: {number_of_new_infections}\n\n'
         )
 
-        with open(self.file_name, 'a') as file:
-            file.write(interactions)
+        self._write(interactions)
 
 
     def log_infection_survival(self, step_number, population_count, number_of_new_fatalities):
@@ -57,13 +116,13 @@ class Logger(object):
             f'New Fatalities: {number_of_new_fatalities}\n\n'
         )
 
-        with open(self.file_name, 'a') as file:
-            file.write(survival)
+        self._write(survival)
 
 
-    def log_time_step(self, infected_and_alive, total_deaths, total_interactions, step, pop_size):
+    def log_time_step(self, infected_and_alive, total_deaths, total_interactions, step, pop_size, groups=None):
         '''
             infected_and_alive can never be negative because at the end of the simulation those people with either be vaccinated/immune or dead
+            groups optionally lists the (name, size, infected, total infected, deaths) of every group of a stratified population
         '''
         adjusted_infected_and_alive = max(0, infected_and_alive)
         time_step = (
@@ -73,12 +132,16 @@ class Logger(object):
             f'Total Deaths: {total_deaths}\n'
             f'Total Interactions: {total_interactions}\n\n'
         )
+        if groups:
+            time_step += ''.join(
+                f'  {name}: Infected {infected}, Total Deaths {deaths}\n'
+                for name, size, infected, total_infected, deaths in groups
+            ) + '\n'
 
-        with open(self.file_name, 'a') as file:
-            file.write(time_step)
+        self._write(time_step)
         
 
-    def log_simulation_outcome(self, simulation_time_step, pop_size, total_deaths, saved_by_vax):
+    def log_simulation_outcome(self, simulation_time_step, pop_size, total_deaths, saved_by_vax=0, groups=None):
         simulation_end_reason = ''
         if pop_size == total_deaths:
             simulation_end_reason = 'Entire population is dead'
@@ -97,6 +160,33 @@ class Logger(object):
             f'Interactions Saved by Vaccination: {saved_by_vax}\n'
             f'Calculated Mortality Rate: {total_deaths / pop_size}'
         )
+        if groups:
+            summary += '\n**************************************************\n' + ''.join(
+                f'{name}: Population {size}, Total Infected {total_infected}, Total Deaths {deaths}, '
+                f'Calculated Mortality Rate {deaths / size if size else 0}\n'
+                for name, size, infected, total_infected, deaths in groups
+            )
 
-        with open(self.file_name, 'a') as file:
-            file.write(summary)
\ No newline at end of file
+        self._write(summary)
+
+    def log_ensemble_outcome(self, replicates, pop_size, mean_deaths, outcomes, final_sizes=()):
+        '''
+            outcomes maps a label to the (mean, standard deviation, {quantile: value}) of that outcome over the runs,
+            final_sizes lists the (low, high, runs) bins of the final epidemic size histogram
+        '''
+        lines = [
+            f'- - - - - - - - ENSEMBLE OUTCOME - - - - - - - -\n\n'
+            f'The ensemble has ended after {replicates} runs\n'
+            f'**************************************************\n'
+            f'Initial Population: {pop_size}\n'
+        ]
+        for label, (mean, std, quantiles) in outcomes.items():
+            spread = ', '.join(f'q{q}={value:g}' for q, value in quantiles.items())
+            lines.append(f'{label}: mean {mean:g}, sd {std:g} | {spread}\n')
+        lines.append(f'Calculated Mortality Rate: {mean_deaths / pop_size}\n')
+        if final_sizes:
+            lines.append('**************************************************\nFinal Size Histogram:\n')
+            for low, high, runs in final_sizes:
+                lines.append(f'{low:g} - {high:g}: {runs}\n')
+
+        self._write(''.join(lines))
@@ -108,5 +108,49 @@ class TestLogger(unittest.TestCase):
         self.assertIn(f'Surviving Population: {pop_size - total_deaths}', content)
         self.assertIn(f'Calculated Mortality Rate: {total_deaths / pop_size}', content)
 
+    def write_report(self, logger):
+        logger.write_metadata(100, 0.2, "Flu", 0.05, 2.5, 5)
+        for step in range(1, 4):
+            logger.log_interactions(step, 50 * step, 10)
+            logger.log_infection_survival(step, 100, 2)
+            logger.log_time_step(20, 2 * step, 50 * step, step, 100)
+        logger.log_simulation_outcome(3, 100, 6, 40)
+
+    def read_without_date(self, file_name):
+        with open(file_name, 'r') as file:
+            return [line for line in file.readlines() if not line.startswith('Simulation Date')]
+
+    def test_buffered_output_is_identical(self):
+        # The buffered logger writes exactly the same report
+        buffered_file = 'test_buffered_log.txt'
+        self.addCleanup(os.remove, buffered_file)
+        self.write_report(self.logger)
+        with Logger(buffered_file, buffer_size=64) as buffered:
+            self.write_report(buffered)
+
+        self.assertEqual(self.read_without_date(self.test_file), self.read_without_date(buffered_file))
+
+    def test_buffered_writes_are_batched(self):
+        # Nothing reaches the file until the buffer fills up or is flushed
+        logger = Logger(self.test_file, buffer_size=10000)
+        logger.write_metadata(100, 0.2, "Flu", 0.05, 2.5, 5)
+        logger.log_time_step(20, 2, 50, 1, 100)
+        self.assertEqual(os.path.getsize(self.test_file), 0)
+
+        logger.flush()
+        size = os.path.getsize(self.test_file)
+        self.assertGreater(size, 0)
+        logger.close()
+        self.assertEqual(os.path.getsize(self.test_file), size)
+
+    def test_buffered_flushes_on_exception(self):
+        with self.assertRaises(RuntimeError):
+            with Logger(self.test_file, buffer_size=10000) as logger:
+                logger.log_time_step(20, 2, 50, 1, 100)
+                raise RuntimeError('step failed')
+
+        with open(self.test_file, 'r') as file:
+            self.assertIn('Infected: 20', file.read())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,235 @@
+import numpy as np
+from population import ALIVE, VACCINATED, INFECTED
+from vector_simulation import VectorSimulation, CONTACT_CHUNK
+from virus import Virus, StrainRegistry
+
+# Strain index of a person who is not infected
+NO_STRAIN = -1
+
+# Per-strain counters, saved with the state
+STRAIN_COUNTERS = ('strain_total_infected', 'strain_new_infections', 'strain_deaths', 'strain_saved')
+
+
+def susceptibility_table(registry):
+    """
+    Return the array whose row `code` holds, for every strain, the chance
+    that a person with the immunity code `code` (see
+    `MultiStrainSimulation.immunity`) is not protected against it: 0 for
+    the vaccinated, otherwise the product of (1 - cross_immunity[r][s])
+    over every strain r they recovered from.
+    """
+    count = len(registry)
+    cross_immunity = np.array(registry.cross_immunity)
+    table = np.ones((1 << (count + 1), count))
+    for code in range(1 << count):
+        for strain in range(count):
+            if code & (1 << strain):
+                table[code] *= 1 - cross_immunity[strain]
+    table[1 << count:] = 0
+    return table
+
+
+class MultiStrainSimulation(VectorSimulation):
+    engine = 'multi_strain'
+
+    def __init__(self, strains, pop_size, vacc_percentage, initial_infected=1, cross_immunity=None,
+                 seed=None, log_buffer_size=None, series_writer=None, rng=None, log_clock=None,
+                 profiler=None):
+        """
+        Version of `VectorSimulation` where several strains circulate at once.
+
+        `strains` is a `StrainRegistry`, or a list of `Virus` strains with an
+        optional `cross_immunity` matrix (see `StrainRegistry`).
+        `initial_infected` is either the number of people infected with the
+        first strain or a list with one count per strain; like in
+        `VectorSimulation` the first people of the population start out
+        infected, strain after strain.
+
+        The infection of every person is kept as a strain index instead of
+        a `Virus` reference, and their immunity as a small integer code.
+        Each step scans the population for its healthy people once for all
+        the strains, then draws every infected person's contacts, strain by
+        strain, from that one healthy population:
+        - A contact with a vaccinated person, or with someone fully
+          protected against the contact's strain, counts as saved by
+          vaccination, as recovered people do in the single-strain engines.
+        - Any other contact transmits with the strain's `repro_rate`, times
+          what is left of the target's protection against that strain.
+        - A person reached by several strains in the same step catches one
+          of them at random.
+        - The infected die with their strain's `mortality_rate`, otherwise
+          they recover, which adds their strain to their immunities.
+        With a single strain this is the same model as `VectorSimulation`.
+
+        The usual counters add up all the strains, so `run()` and the
+        `Logger` work unchanged, with the registry standing in for the virus.
+
+        Attributes (in addition to those of `VectorSimulation`):
+        - strains: The `StrainRegistry`.
+        - strain: int8 array of the strain index of every person, or
+          NO_STRAIN when they are not infected.
+        - immunity: Array of the immunity code of every person: bit i is
+          set once they recovered from strain i, and bit `len(strains)` when
+          they are vaccinated. Its rows in `susceptibility` and
+          `transmission` give their chance of catching each strain.
+        - strain_total_infected, strain_new_infections, strain_deaths,
+          strain_saved: Per-strain arrays of the matching counters.
+        """
+        if not isinstance(strains, StrainRegistry):
+            strains = StrainRegistry(strains, cross_immunity)
+        elif cross_immunity is not None:
+            raise ValueError('Pass cross_immunity to the StrainRegistry')
+        self.strains = strains
+        count = len(strains)
+        if isinstance(initial_infected, (int, np.integer)):
+            initial_infected = [initial_infected] + [0] * (count - 1)
+        if len(initial_infected) != count:
+            raise ValueError(f'Expected an initial infected count for each of the {count} strains')
+        self.initial_strains = [int(number) for number in initial_infected]
+        self.repro_rates = np.array(strains.repro_rate, dtype=np.float64)
+        self.mortality_rates = np.array(strains.mortality_rate, dtype=np.float64)
+        self.susceptibility = susceptibility_table(strains)
+        # Chance that a contact with a given immunity code transmits each strain
+        self.transmission = self.susceptibility * self.repro_rates
+        self.protected = self.susceptibility == 0
+
+        self.strain_total_infected = np.array(self.initial_strains, dtype=np.int64)
+        self.strain_new_infections = np.zeros(count, dtype=np.int64)
+        self.strain_deaths = np.zeros(count, dtype=np.int64)
+        self.strain_saved = np.zeros(count, dtype=np.int64)
+        super().__init__(strains, pop_size, vacc_percentage, sum(self.initial_strains), seed=seed,
+                         log_buffer_size=log_buffer_size, series_writer=series_writer, rng=rng,
+                         log_clock=log_clock, profiler=profiler)
+
+    def _create_population(self):
+        population = super()._create_population()
+        self.strain = np.full(self.pop_size, NO_STRAIN, dtype=np.int8)
+        count = len(self.strains)
+        self.immunity = ((self.state & VACCINATED) != 0).astype(np.uint8 if count < 8 else np.uint16)
+        self.immunity <<= count
+        start = 0
+        for index, number in enumerate(self.initial_strains):
+            self.strain[start:start + number] = index
+            start += number
+        return population
+
+    def cache_params(self, max_steps=None):
+        params = super().cache_params(max_steps)
+        if params is not None:
+            params['initial_infected'] = self.initial_strains
+            params['cross_immunity'] = self.strains.cross_immunity
+        return params
+
+    def strain_infected(self):
+        # Number of people currently infected with each strain
+        return np.bincount(self.strain[self.infected], minlength=len(self.strains))
+
+    def time_step(self):
+        """
+        Simulate one step in time for every strain at once.
+        """
+        infected_population = self.infected
+        sources = self.strain[infected_population].astype(np.intp)
+
+        newly_infected = []
+        with self.profiler.phase('healthy_population'):
+            healthy_population = np.flatnonzero((self.state & (ALIVE | INFECTED)) == ALIVE)
+        if len(healthy_population):
+            self.total_interactions += 100 * len(infected_population)
+            with self.profiler.phase('interactions'):
+                for strain, number in enumerate(np.bincount(sources, minlength=len(self.strains)).tolist()):
+                    num_contacts = 100 * number
+                    while num_contacts > 0:
+                        batch = min(num_contacts, CONTACT_CHUNK)
+                        newly_infected.append(self._draw_strain_contacts(healthy_population, strain, batch))
+                        num_contacts -= batch
+
+        # Resolve whether the infected people survive their infection
+        with self.profiler.phase('survival'):
+            died = self.rng.random(len(infected_population)) < self.mortality_rates[sources]
+            newly_dead = int(np.count_nonzero(died))
+            survivors = infected_population[~died]
+            self.state[infected_population[died]] = 0
+            self.state[survivors] = ALIVE
+            self.immunity[survivors] |= (1 << sources[~died]).astype(self.immunity.dtype)
+            self.strain[infected_population] = NO_STRAIN
+            self.strain_deaths += np.bincount(sources[died], minlength=len(self.strains))
+        self.infected_and_alive -= len(infected_population)
+        self.total_deaths += newly_dead
+        self.death_interactions += newly_dead
+
+        with self.profiler.phase('infect_newly_infected'):
+            self._infect_with_strains(newly_infected)
+
+    def _draw_strain_contacts(self, healthy_population, strain, num_contacts):
+        """
+        Draw `num_contacts` contacts of people infected with `strain` with
+        random healthy people.
+        Returns (people infected, their strains).
+        """
+        targets = healthy_population[self.rng.integers(0, len(healthy_population), num_contacts)]
+        codes = self.immunity[targets]
+        saved = int(np.count_nonzero(self.protected[codes, strain]))
+        self.saved_by_vaccination += saved
+        self.strain_saved[strain] += saved
+        targets = targets[self.rng.random(num_contacts) < self.transmission[codes, strain]]
+        return targets, np.full(len(targets), strain, dtype=np.intp)
+
+    def _infect_with_strains(self, newly_infected):
+        """
+        Infect the people reached during the step, each with one of the
+        strains that reached them, picked at random.
+        """
+        count = len(self.strains)
+        if newly_infected:
+            targets = np.concatenate([targets for targets, strains in newly_infected])
+            strains = np.concatenate([strains for targets, strains in newly_infected])
+            order = self.rng.permutation(len(targets))
+            targets, first = np.unique(targets[order], return_index=True)
+            strains = strains[order][first]
+        else:
+            targets = np.zeros(0, dtype=np.int64)
+            strains = np.zeros(0, dtype=np.intp)
+
+        self.state[targets] |= INFECTED
+        self.strain[targets] = strains
+        self.strain_new_infections = np.bincount(strains, minlength=count)
+        self.strain_total_infected += self.strain_new_infections
+        self.new_infections = len(targets)
+        self.infected_and_alive += len(targets)
+        self.total_infected += len(targets)
+        self.infected = targets
+        self.newly_infected = set()
+
+    def checkpoint_params(self):
+        params = super().checkpoint_params()
+        params['strains'] = [[strain.name, strain.repro_rate, strain.mortality_rate] for strain in self.strains]
+        params['cross_immunity'] = self.strains.cross_immunity
+        params['initial_infected'] = self.initial_strains
+        return params
+
+    def get_state(self):
+        state = super().get_state()
+        state['strain'] = self.strain.copy()
+        state['immunity'] = self.immunity.copy()
+        state['strain_counters'] = np.array([getattr(self, name) for name in STRAIN_COUNTERS])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.strain = state['strain'].copy()
+        self.immunity = state['immunity'].copy()
+        for name, values in zip(STRAIN_COUNTERS, state['strain_counters']):
+            setattr(self, name, values.copy())
+
+
+if __name__ == "__main__":
+    # Two strains, where recovering from either half protects against the other
+    strains = StrainRegistry(
+        [Virus("Sniffles", 0.5, 0.12), Virus("Sneezles", 0.3, 0.05)],
+        cross_immunity=[[1.0, 0.5], [0.5, 1.0]]
+    )
+    sim = MultiStrainSimulation(strains, 1000000, 0.1, [10, 10], seed=1)
+    sim.run()
+    for strain, infected, deaths in zip(strains, sim.strain_total_infected, sim.strain_deaths):
+        print(f"{strain.name}: {infected} infected, {deaths} deaths")
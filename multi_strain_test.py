@@ -0,0 +1,99 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from sampling_test import ks_statistic, ks_critical
+from logger import Logger
+from multi_strain import MultiStrainSimulation, NO_STRAIN, susceptibility_table
+from population import ALIVE, INFECTED
+from vector_simulation import VectorSimulation
+from virus import Virus, StrainRegistry
+
+
+class TestStrainRegistry(unittest.TestCase):
+    def test_registry(self):
+        registry = StrainRegistry([Virus("A", 0.5, 0.1), Virus("B", 0.3, 0.2)])
+        self.assertEqual(registry.index("B"), 1)
+        self.assertEqual(registry.name, "A+B")
+        self.assertEqual(registry.mortality_rate, (0.1, 0.2))
+        self.assertEqual(registry.cross_immunity, [[1.0, 0.0], [0.0, 1.0]])
+        registry.set_cross_immunity("A", "B", 0.25)
+        self.assertEqual(registry.cross_immunity[0][1], 0.25)
+
+        with self.assertRaises(ValueError):
+            StrainRegistry([Virus("A", 0.5, 0.1), Virus("A", 0.3, 0.2)])
+        with self.assertRaises(ValueError):
+            StrainRegistry([Virus("A", 0.5, 0.1)], cross_immunity=[[2.0]])
+        with self.assertRaises(ValueError):
+            StrainRegistry([Virus(str(i), 0.5, 0.1) for i in range(StrainRegistry.MAX_STRAINS + 1)])
+
+    def test_susceptibility_table(self):
+        registry = StrainRegistry([Virus("A", 0.5, 0.1), Virus("B", 0.3, 0.2)],
+                                  cross_immunity=[[1.0, 0.5], [0.25, 1.0]])
+        table = susceptibility_table(registry)
+        self.assertEqual(table[0].tolist(), [1.0, 1.0])
+        self.assertEqual(table[0b01].tolist(), [0.0, 0.5])
+        self.assertEqual(table[0b10].tolist(), [0.75, 0.0])
+        self.assertEqual(table[0b11].tolist(), [0.0, 0.0])
+        # Vaccinated people
+        self.assertEqual(table[0b100:].tolist(), [[0.0, 0.0]] * 4)
+
+
+class TestMultiStrainSimulation(unittest.TestCase):
+    def setUp(self):
+        self.strains = [Virus("A", 0.05, 0.12), Virus("B", 0.04, 0.05)]
+
+    def test_single_strain_matches_vector_engine(self):
+        multi, single = [], []
+        for seed in range(100):
+            for sim, outcomes in ((MultiStrainSimulation([self.strains[0]], 1000, 0.2, 10, seed=seed), multi),
+                                  (VectorSimulation(self.strains[0], 1000, 0.2, 10, seed=seed), single)):
+                while sim.step():
+                    pass
+                outcomes.append((sim.total_infected, sim.total_deaths, sim.saved_by_vaccination))
+        multi, single = np.array(multi), np.array(single)
+        for column in range(3):
+            self.assertLess(ks_statistic(multi[:, column], single[:, column]), ks_critical(100, 100))
+
+    def test_counters_match_population(self):
+        sim = MultiStrainSimulation(self.strains, 2000, 0.1, [5, 5], seed=1)
+        self.assertEqual(sim.strain_infected().tolist(), [5, 5])
+        for snapshot in sim.iter_steps():
+            infected = (sim.state & INFECTED) != 0
+            self.assertTrue(np.array_equal(infected, sim.strain != NO_STRAIN))
+            self.assertEqual(int(sim.strain_infected().sum()), snapshot.new_infections)
+            self.assertEqual(int(sim.strain_new_infections.sum()), snapshot.new_infections)
+            self.assertEqual(int(sim.strain_total_infected.sum()), snapshot.total_infected)
+            self.assertEqual(int(sim.strain_deaths.sum()), snapshot.total_deaths)
+            self.assertEqual(int(sim.strain_saved.sum()), snapshot.saved_by_vaccination)
+            self.assertEqual(int(np.count_nonzero((sim.state & ALIVE) == 0)), snapshot.total_deaths)
+
+    def test_cross_immunity(self):
+        # Without cross-immunity people can catch both strains in turn
+        sim = MultiStrainSimulation([Virus("A", 0.05, 0.0), Virus("B", 0.05, 0.0)], 1000, 0.0, [10, 10], seed=2)
+        while sim.step():
+            pass
+        self.assertTrue(np.any(sim.immunity == 0b11))
+        self.assertGreater(sim.total_infected, 1000)
+
+        # Full cross-immunity: nobody is infected twice
+        sim = MultiStrainSimulation([Virus("A", 0.05, 0.0), Virus("B", 0.05, 0.0)], 1000, 0.0, [10, 10],
+                                    cross_immunity=[[1, 1], [1, 1]], seed=2)
+        while sim.step():
+            pass
+        self.assertFalse(np.any(sim.immunity == 0b11))
+        self.assertLessEqual(sim.total_infected, 1000)
+
+    def test_run_logs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sim = MultiStrainSimulation(self.strains, 500, 0.1, [3, 2], seed=3)
+            sim.logger = Logger(os.path.join(directory, 'log.txt'))
+            sim.run()
+            with open(sim.logger.file_name) as file:
+                log = file.read()
+        self.assertIn('Virus: A+B', log)
+        self.assertIn(f'Total Deaths: {sim.total_deaths}', log)
+
+
+if __name__ == '__main__':
+    unittest.main()
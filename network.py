@@ -0,0 +1,210 @@
+import itertools
+import os
+import numpy as np
+from rng import as_generator
+
+# Node ids are stored as int32, which halves the size of the neighbor array
+NODE_DTYPE = np.int32
+
+# Lines of an edge list parsed at a time by `load_edge_list`
+EDGE_LIST_CHUNK = 1 << 20
+
+
+class ContactGraph(object):
+    def __init__(self, offsets, neighbors):
+        """
+        Contact graph stored in compressed sparse row (CSR) form.
+
+        Attributes:
+        - offsets: int64 array of length num_nodes + 1. The neighbors of
+          node i are neighbors[offsets[i]:offsets[i + 1]].
+        - neighbors: int32 array holding every node's neighbors back to back.
+          An undirected edge is stored once in each direction.
+
+        At 4 bytes per stored neighbor, a graph with 10^8 undirected edges
+        takes 800 MB, and `save`/`load` can memory-map it from disk.
+        """
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_nodes(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.neighbors.nbytes
+
+    def degree(self, nodes=None):
+        # Degree of every node, or of the given `nodes`
+        if nodes is None:
+            return np.diff(self.offsets)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return self.offsets[nodes + 1] - self.offsets[nodes]
+
+    def neighbors_of(self, node):
+        return self.neighbors[self.offsets[node]:self.offsets[node + 1]]
+
+    def gather(self, nodes):
+        """
+        Return the neighbors of all the `nodes`, concatenated in order.
+        Costs O(len(nodes) + the sum of their degrees).
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts = self.offsets[nodes]
+        counts = self.offsets[nodes + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=self.neighbors.dtype)
+        # Shift each row's start to where the row begins in the output
+        row_starts = np.cumsum(counts) - counts
+        positions = np.repeat(starts - row_starts, counts) + np.arange(total)
+        return self.neighbors[positions]
+
+    def save(self, path):
+        # One .npy file per array, so that `load` can memory-map them
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'neighbors.npy'), self.neighbors)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        return cls(
+            np.load(os.path.join(path, 'offsets.npy'), mmap_mode=mode),
+            np.load(os.path.join(path, 'neighbors.npy'), mmap_mode=mode),
+        )
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets, directed=False, simple=False):
+        """
+        Build a graph on `num_nodes` nodes from the edge arrays
+        `sources` -> `targets`. Self-loops are dropped.
+        - directed: Keep each edge in one direction only. By default edges
+          are undirected and stored in both directions.
+        - simple: Also drop repeated edges. This sorts all the edges, so it
+          needs several times the memory of the graph itself.
+        """
+        sources = np.asarray(sources, dtype=NODE_DTYPE)
+        targets = np.asarray(targets, dtype=NODE_DTYPE)
+        if len(sources) != len(targets):
+            raise ValueError('sources and targets must have the same length')
+        if len(sources) and (min(sources.min(), targets.min()) < 0
+                             or max(sources.max(), targets.max()) >= num_nodes):
+            raise ValueError(f'edge endpoints must be in range({num_nodes})')
+
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+        if not directed:
+            sources, targets = np.concatenate((sources, targets)), np.concatenate((targets, sources))
+
+        if simple:
+            keys = np.unique(sources.astype(np.int64) * num_nodes + targets)
+            sources = (keys // num_nodes).astype(NODE_DTYPE)
+            targets = (keys % num_nodes).astype(NODE_DTYPE)
+            order = None
+        else:
+            order = np.argsort(sources)
+
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+        neighbors = targets if order is None else targets[order]
+        return cls(offsets, neighbors)
+
+
+def erdos_renyi(num_nodes, mean_degree, rng=None):
+    """
+    Random graph with num_nodes * mean_degree / 2 edges between uniformly
+    random pairs of nodes (the G(n, m) model, repeated edges allowed).
+    """
+    rng = as_generator(rng)
+    num_edges = int(round(num_nodes * mean_degree / 2))
+    sources = rng.integers(0, num_nodes, num_edges, dtype=NODE_DTYPE)
+    targets = rng.integers(0, num_nodes, num_edges, dtype=NODE_DTYPE)
+    return ContactGraph.from_edges(num_nodes, sources, targets)
+
+
+def small_world(num_nodes, degree, rewire, rng=None):
+    """
+    Watts-Strogatz small-world graph: a ring where every node is joined to
+    its `degree` nearest neighbors, with each edge's far end moved to a
+    uniformly random node with probability `rewire`.
+    """
+    rng = as_generator(rng)
+    half = degree // 2
+    sources = np.repeat(np.arange(num_nodes, dtype=NODE_DTYPE), half)
+    steps = np.tile(np.arange(1, half + 1, dtype=NODE_DTYPE), num_nodes)
+    targets = ((sources.astype(np.int64) + steps) % num_nodes).astype(NODE_DTYPE)
+    rewired = rng.random(len(targets)) < rewire
+    targets[rewired] = rng.integers(0, num_nodes, int(rewired.sum()), dtype=NODE_DTYPE)
+    return ContactGraph.from_edges(num_nodes, sources, targets)
+
+
+def scale_free(num_nodes, exponent=2.5, min_degree=2, max_degree=None, rng=None):
+    """
+    Scale-free graph from the configuration model: every node draws a degree
+    from a power law P(k) ~ k^-exponent with k >= min_degree (capped at
+    `max_degree`, by default sqrt(num_nodes)), and the edge ends ("stubs")
+    are paired up at random.
+    """
+    rng = as_generator(rng)
+    if max_degree is None:
+        max_degree = max(min_degree, int(np.sqrt(num_nodes)))
+    # Inverse transform sampling of a discretized Pareto distribution
+    uniform = rng.random(num_nodes)
+    degrees = np.floor(min_degree * (1 - uniform) ** (-1 / (exponent - 1))).astype(np.int64)
+    np.minimum(degrees, max_degree, out=degrees)
+    stubs = np.repeat(np.arange(num_nodes, dtype=NODE_DTYPE), degrees)
+    rng.shuffle(stubs)
+    half = len(stubs) // 2
+    return ContactGraph.from_edges(num_nodes, stubs[:half], stubs[half:2 * half])
+
+
+def load_edge_list(path, num_nodes=None, directed=False, simple=False):
+    """
+    Load a graph from a text file with one whitespace-separated
+    "source target" pair of node ids per line; lines starting with '#' are
+    comments. `num_nodes` defaults to the largest id + 1. The file is
+    parsed in chunks of EDGE_LIST_CHUNK lines into int32 arrays.
+    """
+    sources, targets = [], []
+    with open(path, 'r') as file:
+        lines = (line for line in file if line.strip() and not line.lstrip().startswith('#'))
+        while True:
+            chunk = list(itertools.islice(lines, EDGE_LIST_CHUNK))
+            if not chunk:
+                break
+            edges = np.loadtxt(chunk, dtype=np.int64, usecols=(0, 1), ndmin=2)
+            sources.append(edges[:, 0].astype(NODE_DTYPE))
+            targets.append(edges[:, 1].astype(NODE_DTYPE))
+
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=NODE_DTYPE)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=NODE_DTYPE)
+    if num_nodes is None:
+        num_nodes = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+    return ContactGraph.from_edges(num_nodes, sources, targets, directed=directed, simple=simple)
+
+
+# Graph generators by name, for command lines and configs
+GENERATORS = {
+    'erdos_renyi': erdos_renyi,
+    'small_world': small_world,
+    'scale_free': scale_free,
+}
+
+
+if __name__ == "__main__":
+    graph = ContactGraph.from_edges(4, [0, 1, 2], [1, 2, 0])
+    assert graph.neighbors_of(0).tolist() == [1, 2]
+    assert graph.degree().tolist() == [2, 2, 2, 0]
+    assert sorted(graph.gather([0, 3, 1]).tolist()) == [0, 1, 2, 2]
+
+    for name, graph in (('erdos_renyi', erdos_renyi(10 ** 5, 10, rng=1)),
+                        ('small_world', small_world(10 ** 5, 10, 0.1, rng=1)),
+                        ('scale_free', scale_free(10 ** 5, rng=1))):
+        degrees = graph.degree()
+        print(f"{name}: mean degree {degrees.mean():.2f}, max degree {degrees.max()}, "
+              f"{graph.nbytes / len(graph.neighbors):.2f} bytes per stored edge")
@@ -0,0 +1,123 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from network import ContactGraph, erdos_renyi, small_world, scale_free, load_edge_list
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+def line_graph(num_nodes):
+    nodes = np.arange(num_nodes - 1)
+    return ContactGraph.from_edges(num_nodes, nodes, nodes + 1)
+
+
+class TestContactGraph(unittest.TestCase):
+    def test_csr_layout(self):
+        graph = ContactGraph.from_edges(5, [0, 0, 1, 3, 2], [1, 2, 2, 3, 0])
+        # The self-loop 3-3 is dropped, each edge is stored both ways
+        self.assertEqual(graph.offsets.tolist(), [0, 3, 5, 8, 8, 8])
+        self.assertEqual(sorted(graph.neighbors_of(0).tolist()), [1, 2, 2])
+        self.assertEqual(graph.neighbors.dtype, np.int32)
+        self.assertEqual(sorted(graph.gather([4, 1, 3]).tolist()), [0, 2])
+
+        simple = ContactGraph.from_edges(5, [0, 0, 1, 3, 2], [1, 2, 2, 3, 0], simple=True)
+        self.assertEqual(simple.neighbors_of(0).tolist(), [1, 2])
+
+        directed = ContactGraph.from_edges(3, [0, 1], [1, 2], directed=True)
+        self.assertEqual(directed.degree().tolist(), [1, 1, 0])
+
+        with self.assertRaises(ValueError):
+            ContactGraph.from_edges(3, [0], [3])
+
+    def test_generators(self):
+        for graph in (erdos_renyi(2000, 8, rng=1), small_world(2000, 8, 0.1, rng=1)):
+            self.assertEqual(len(graph), 2000)
+            self.assertAlmostEqual(graph.degree().mean(), 8, delta=0.1)
+
+        graph = scale_free(20000, exponent=2.5, min_degree=2, rng=1)
+        degrees = graph.degree()
+        # A heavy tail: some hubs are far above the mean degree
+        self.assertGreater(degrees.max(), 10 * degrees.mean())
+
+        # The generators are reproducible from a seed
+        self.assertTrue(np.array_equal(erdos_renyi(500, 4, rng=3).neighbors, erdos_renyi(500, 4, rng=3).neighbors))
+
+    def test_edge_list_and_storage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'edges.txt')
+            with open(path, 'w') as file:
+                file.write('# household contacts\n0 1\n1 2\n\n4 2 0.5\n')
+            graph = load_edge_list(path)
+            self.assertEqual(len(graph), 5)
+            self.assertEqual(sorted(graph.neighbors_of(2).tolist()), [1, 4])
+
+            graph.save(os.path.join(directory, 'graph'))
+            loaded = ContactGraph.load(os.path.join(directory, 'graph'))
+            self.assertIsInstance(loaded.neighbors, np.memmap)
+            self.assertTrue(np.array_equal(loaded.gather([2]), graph.gather([2])))
+            del loaded
+
+
+class TestNetworkSimulation(unittest.TestCase):
+    def setUp(self):
+        # Always transmits, never kills
+        self.virus = Virus("Test", 1.0, 0.0)
+
+    def engines(self, graph, pop_size, vacc_percentage=0.0, **kwargs):
+        yield Simulation(self.virus, pop_size, vacc_percentage, 1, rng=1, graph=graph, **kwargs)
+        yield VectorSimulation(self.virus, pop_size, vacc_percentage, 1, seed=1, graph=graph, **kwargs)
+
+    def test_infection_follows_edges(self):
+        for sampling in ('contact', 'aggregate'):
+            for sim in self.engines(line_graph(10), 10, sampling=sampling):
+                for step in range(1, 4):
+                    sim.step()
+                    # Only the next node along the line is reachable
+                    self.assertEqual(sorted(int(_id) for _id in sim.infected), [step])
+                    # After the first step the recovered previous node is
+                    # an immune neighbor, and still a contact
+                    self.assertEqual(sim.total_interactions, 2 * step - 1)
+                    self.assertEqual(sim.saved_by_vaccination, step - 1)
+
+    def test_isolated_people_are_never_infected(self):
+        graph = ContactGraph.from_edges(20, [0, 0], [1, 2])
+        for sim in self.engines(graph, 20):
+            while sim.step():
+                pass
+            self.assertEqual(sim.total_infected, 3)
+            # 0 meets 1 and 2, who then both meet the recovered 0
+            self.assertEqual(sim.total_interactions, 4)
+
+    def test_vaccinated_neighbors(self):
+        # Everybody but the first person is vaccinated
+        star = ContactGraph.from_edges(50, np.zeros(49, dtype=int), np.arange(1, 50))
+        for sim in self.engines(star, 50, vacc_percentage=1.0):
+            sim.step()
+            self.assertEqual(sim.saved_by_vaccination, 49)
+            self.assertEqual(sim.new_infections, 0)
+
+    def test_hub_in_aggregate_sampling(self):
+        # The infected hub of a star meets every other node once, so its
+        # new infections are Binomial(9999, 0.1) in both sampling modes
+        virus = Virus("Test", 0.1, 0.0)
+        star = ContactGraph.from_edges(10000, np.zeros(9999, dtype=int), np.arange(1, 10000))
+        infections = {}
+        for sampling in ('contact', 'aggregate'):
+            infections[sampling] = []
+            for seed in range(5):
+                sim = Simulation(virus, 10000, 0.0, 1, rng=seed, graph=star, sampling=sampling)
+                sim.step()
+                self.assertEqual(sim.total_interactions, 9999)
+                infections[sampling].append(sim.new_infections)
+            self.assertAlmostEqual(np.mean(infections[sampling]), 999.9, delta=60)
+        self.assertAlmostEqual(np.mean(infections['aggregate']), np.mean(infections['contact']), delta=80)
+
+    def test_graph_size_must_match(self):
+        with self.assertRaises(ValueError):
+            Simulation(self.virus, 11, 0.0, 1, graph=line_graph(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from surrogate import CONTACTS, mean_field_step
+from virus import Virus
+
+# A run is cut short as a major outbreak once the chance that all its
+# current infections still die out is below this
+TOLERANCE = 1e-3
+
+# Normal quantile of the two-sided 95% confidence interval
+Z_95 = 1.959963984540054
+
+def extinction_probability(repro_rate, susceptible_share, contacts=CONTACTS):
+    """
+    Chance that the infection chain started by one infected person dies
+    out, while the susceptible are not yet depleted: the smallest root of
+    q = (1 - r * (1 - q))^contacts with r = repro_rate * susceptible_share,
+    the generating function of the binomial number of people they infect.
+    """
+    r = repro_rate * susceptible_share
+    if contacts * r <= 1:
+        # Subcritical: every chain dies out
+        return 1.0
+    q = 0.0
+    for _ in range(10000):
+        previous, q = q, (1 - r * (1 - q)) ** contacts
+        if abs(q - previous) < 1e-12:
+            break
+    return q
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    # Wilson score confidence interval of a binomial proportion
+    if trials == 0:
+        return (0.0, 1.0)
+    share = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (share + z ** 2 / (2 * trials)) / denominator
+    spread = z * math.sqrt(share * (1 - share) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return (max(0.0, center - spread), min(1.0, center + spread))
+
+
+class OutbreakRun(object):
+    # Outcome of one outbreak-mode run.
+    def __init__(self, ended, steps, total_infected, total_deaths, saved_by_vaccination,
+                 final_size, final_deaths):
+        """
+        Attributes:
+        - ended: 'extinct' when nobody was infected any more, 'major' when
+          the run was cut short as a major outbreak.
+        - steps, total_infected, total_deaths, saved_by_vaccination: The
+          counters when the run ended.
+        - final_size, final_deaths: Total infected and deaths at the end of
+          the epidemic: the counters themselves for an extinct run, the
+          mean-field estimate from where a major outbreak was cut short.
+        """
+        self.ended = ended
+        self.steps = steps
+        self.total_infected = total_infected
+        self.total_deaths = total_deaths
+        self.saved_by_vaccination = saved_by_vaccination
+        self.final_size = final_size
+        self.final_deaths = final_deaths
+
+    @property
+    def major(self):
+        return self.ended == 'major'
+
+
+def mean_field_tail(virus, susceptible, immune, infected, contacts=CONTACTS):
+    """
+    Follow the expected course of the epidemic from `infected` people in a
+    healthy population of `susceptible` and `immune` (vaccinated or
+    recovered) people until it dies out.
+    Returns the expected (infections, deaths) still to come, counting the
+    deaths of the currently infected.
+    """
+    infections = deaths = 0.0
+    susceptible, immune, infected = float(susceptible), float(immune), float(infected)
+    while infected >= 0.5:
+        new, died, saved, interactions = mean_field_step(susceptible, immune, infected, virus.repro_rate,
+                                                         virus.mortality_rate, contacts)
+        new = float(new)
+        deaths += float(died)
+        immune += infected - float(died)
+        susceptible -= new
+        infections += new
+        infected = new
+    return infections, deaths + infected * virus.mortality_rate
+
+
+def run_outbreak(virus, pop_size, vacc_percentage, initial_infected=1, rng=None, tolerance=TOLERANCE):
+    """
+    Run one epidemic in outbreak mode, which only tells a chain of
+    infections that dies out from a major outbreak, as cheaply as possible.
+
+    The model is `Simulation` with aggregate sampling, reduced to counts:
+    the susceptible are interchangeable, so nobody is laid out and no
+    population is scanned. Each step the contacts of all the infected hit
+    the immune with a binomial count, the others transmit with a binomial
+    count, and only the transmissions are drawn, to find how many distinct
+    susceptible people they reach. The work of a run is thus proportional
+    to the number of people it infects, whatever `pop_size`.
+
+    The run ends early:
+    - as 'extinct' once nobody is infected;
+    - as 'major' once the chance that every current infection still dies
+      out, `extinction_probability` to the power of the infected, falls
+      below `tolerance`. Its final size is then estimated with
+      `mean_field_tail`.
+    `rng` is a NumPy generator or anything `np.random.default_rng` accepts.
+    Returns an `OutbreakRun`.
+    """
+    rng = np.random.default_rng(rng)
+    infected = min(initial_infected, pop_size)
+    immune = min(int(pop_size * vacc_percentage), pop_size - infected)
+    susceptible = pop_size - infected - immune
+    q = extinction_probability(virus.repro_rate, susceptible / max(1, susceptible + immune))
+    # Infected count past which the outbreak is taken as major
+    threshold = math.log(tolerance) / math.log(q) if 0 < q < 1 else (0 if q == 0 else math.inf)
+
+    steps = total_deaths = saved_by_vaccination = 0
+    total_infected = infected
+    while infected:
+        if infected >= threshold:
+            infections, deaths = mean_field_tail(virus, susceptible, immune, infected)
+            return OutbreakRun('major', steps, total_infected, total_deaths, saved_by_vaccination,
+                               total_infected + infections, total_deaths + deaths)
+        healthy = susceptible + immune
+        new = 0
+        if healthy:
+            contacts = CONTACTS * infected
+            protected = int(rng.binomial(contacts, immune / healthy))
+            saved_by_vaccination += protected
+            transmitted = int(rng.binomial(contacts - protected, virus.repro_rate))
+            if transmitted:
+                new = len(np.unique(rng.integers(0, susceptible, transmitted)))
+        died = int(rng.binomial(infected, virus.mortality_rate))
+        total_deaths += died
+        immune += infected - died
+        susceptible -= new
+        total_infected += new
+        infected = new
+        steps += 1
+    return OutbreakRun('extinct', steps, total_infected, total_deaths, saved_by_vaccination,
+                       total_infected, total_deaths)
+
+
+class OutbreakEstimate(object):
+    def __init__(self, config, entropy, runs):
+        """
+        Chance of a major outbreak, estimated from outbreak-mode runs.
+
+        Attributes:
+        - config: The parameters every run used.
+        - entropy: Root seed the run streams were spawned from.
+        - runs: Number of runs.
+        - majors: Number of runs that became a major outbreak.
+        - probability: majors / runs.
+        - interval: 95% Wilson confidence interval of `probability`.
+        - major_size, minor_size: Mean final size of the major outbreaks and
+          of the chains that died out (None without such runs).
+        - major_deaths, minor_deaths: Same for the deaths.
+        """
+        self.config = config
+        self.entropy = entropy
+        self.runs = len(runs)
+        majors = [run for run in runs if run.major]
+        minors = [run for run in runs if not run.major]
+        self.majors = len(majors)
+        self.probability = self.majors / self.runs if self.runs else 0.0
+        self.interval = wilson_interval(self.majors, self.runs)
+        self.major_size = _mean([run.final_size for run in majors])
+        self.minor_size = _mean([run.final_size for run in minors])
+        self.major_deaths = _mean([run.final_deaths for run in majors])
+        self.minor_deaths = _mean([run.final_deaths for run in minors])
+
+    def summary(self):
+        return {
+            'config': self.config,
+            'entropy': self.entropy,
+            'runs': self.runs,
+            'majors': self.majors,
+            'probability': self.probability,
+            'interval': list(self.interval),
+            'major_size': self.major_size,
+            'minor_size': self.minor_size,
+            'major_deaths': self.major_deaths,
+            'minor_deaths': self.minor_deaths,
+        }
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def _run_batch(config, seeds):
+    virus = Virus(config['virus_name'], config['repro_rate'], config['mortality_rate'])
+    return [
+        run_outbreak(virus, config['pop_size'], config['vacc_percentage'], config['initial_infected'],
+                     rng=seed_sequence, tolerance=config['tolerance'])
+        for seed_sequence in seeds
+    ]
+
+
+def estimate_outbreak_probability(virus, pop_size, vacc_percentage, initial_infected=1, runs=10000,
+                                  seed=None, workers=1, tolerance=TOLERANCE):
+    """
+    Estimate the chance of a major outbreak from `runs` outbreak-mode runs,
+    each on its own stream spawned from `seed` like the replicates of
+    `run_ensemble`. With `workers` other than 1 the runs are shared out
+    over a process pool (default: one worker per CPU core).
+    Returns an `OutbreakEstimate`.
+    """
+    config = {
+        'virus_name': virus.name,
+        'repro_rate': virus.repro_rate,
+        'mortality_rate': virus.mortality_rate,
+        'pop_size': pop_size,
+        'vacc_percentage': vacc_percentage,
+        'initial_infected': initial_infected,
+        'tolerance': tolerance,
+    }
+    root = np.random.SeedSequence(seed)
+    seeds = root.spawn(runs)
+    if workers == 1:
+        results = _run_batch(config, seeds)
+    else:
+        workers = workers or os.cpu_count() or 1
+        size = max(1, math.ceil(runs / (4 * workers)))
+        batches = [seeds[start:start + size] for start in range(0, runs, size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [run for batch in executor.map(_run_batch, [config] * len(batches), batches)
+                       for run in batch]
+    return OutbreakEstimate(config, root.entropy, results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate the chance of a major outbreak.')
+    parser.add_argument('pop_size', type=int)
+    parser.add_argument('vacc_percentage', type=float)
+    parser.add_argument('virus_name')
+    parser.add_argument('mortality_rate', type=float)
+    parser.add_argument('repro_rate', type=float)
+    parser.add_argument('initial_infected', type=int, nargs='?', default=1)
+    parser.add_argument('--runs', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    virus = Virus(args.virus_name, args.repro_rate, args.mortality_rate)
+    estimate = estimate_outbreak_probability(
+        virus, args.pop_size, args.vacc_percentage, args.initial_infected,
+        runs=args.runs, seed=args.seed, workers=args.workers, tolerance=args.tolerance
+    )
+    low, high = estimate.interval
+    print(f"****{estimate.runs} outbreak runs**** (seed entropy {estimate.entropy})")
+    print(f"P(major outbreak): {estimate.probability:.4f} (95% CI {low:.4f} - {high:.4f})")
+    if estimate.major_size is not None:
+        print(f"Major outbreaks: final size {estimate.major_size:.1f}, deaths {estimate.major_deaths:.1f}")
+    if estimate.minor_size is not None:
+        print(f"Minor outbreaks: final size {estimate.minor_size:.1f}, deaths {estimate.minor_deaths:.1f}")
+    return estimate
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from ensemble import run_ensemble
+from outbreak import (estimate_outbreak_probability, extinction_probability, run_outbreak,
+                      wilson_interval)
+from virus import Virus
+
+
+class TestOutbreak(unittest.TestCase):
+    def setUp(self):
+        # About 1.5 people infected per infection
+        self.virus = Virus("Test", 0.0167, 0.12)
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(50, 100)
+        self.assertAlmostEqual(low, 0.4038, places=4)
+        self.assertAlmostEqual(high, 0.5962, places=4)
+        self.assertEqual(wilson_interval(0, 10)[0], 0.0)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+    def test_extinction_probability(self):
+        self.assertEqual(extinction_probability(0.005, 1.0), 1.0)
+        q = extinction_probability(0.0167, 0.9)
+        self.assertAlmostEqual(q, (1 - 0.0167 * 0.9 * (1 - q)) ** 100)
+        self.assertLess(q, 1)
+
+    def test_cost_does_not_grow_with_population(self):
+        # Nobody is laid out, so a huge population is no slower
+        run = run_outbreak(Virus("Test", 0.001, 0.5), 10 ** 12, 0.5, 10, rng=1)
+        self.assertEqual(run.ended, 'extinct')
+        self.assertEqual(run.final_size, run.total_infected)
+
+    def test_major_outbreak_is_cut_short(self):
+        run = run_outbreak(Virus("Test", 0.5, 0.12), 10 ** 6, 0.1, 50, rng=2)
+        self.assertEqual(run.ended, 'major')
+        self.assertEqual(run.steps, 0)
+        self.assertGreater(run.final_size, 0.8 * 10 ** 6)
+
+    def test_matches_full_runs(self):
+        estimate = estimate_outbreak_probability(self.virus, 20000, 0.1, 1, runs=4000, seed=3)
+        q = extinction_probability(0.0167, 0.9)
+        low, high = estimate.interval
+        self.assertLess(low, 1 - q)
+        self.assertGreater(high, 1 - q)
+        self.assertEqual(estimate.runs, 4000)
+
+        # Final size of the major outbreaks matches full runs of the engine
+        result = run_ensemble(self.virus, 20000, 0.1, 1, replicates=60, seed=4, workers=1)
+        sizes = result.outcome('total_infected')
+        majors = sizes[sizes > 1000]
+        self.assertTrue(np.isclose(estimate.major_size, majors.mean(), rtol=0.05))
+
+    def test_reproducible(self):
+        first = estimate_outbreak_probability(self.virus, 10000, 0.1, 2, runs=200, seed=5)
+        second = estimate_outbreak_probability(self.virus, 10000, 0.1, 2, runs=200, seed=5, workers=2)
+        self.assertEqual(first.summary(), second.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
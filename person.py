@@ -5,6 +5,8 @@ from virus import Virus
 
 class Person(object):
     # Define a person. 
+    __slots__ = ('_id', 'is_alive', 'is_vaccinated', 'infection')
+
     def __init__(self, _id, is_vaccinated, infection = None):
         self._id = _id  # int
         # TODO Define the other attributes of a person here
@@ -12,7 +14,7 @@ class Person(object):
         self.is_vaccinated = is_vaccinated  
         self.infection = infection 
 
-    def did_survive_infection(self):
+    def did_survive_infection(self, rng=random):
         # This method checks if a person survived an infection. 
         # TODO Only called if infection attribute is not None.
         # Check generate a random number between 0.0 - 1.0
@@ -21,8 +23,9 @@ class Person(object):
         # Otherwise they have survived infection and they are now vaccinated. 
         # Set their properties to show this
         # TODO: The method Should return a Boolean showing if they survived.
+        # `rng` is the random source to draw from (see rng.py).
        if self.infection != None:
-        chance_of_survival = random.random()
+        chance_of_survival = rng.random()
         if chance_of_survival < self.infection.mortality_rate:
             # Died from infection
             self.is_alive = False
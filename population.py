@@ -0,0 +1,250 @@
+import operator
+import random
+import numpy as np
+from person import Person
+from virus import Virus
+
+# Each person's state is packed into one byte of bit flags.
+ALIVE = 1
+VACCINATED = 2
+INFECTED = 4
+
+# Number of people sampled at a time by `sample_indices`.
+SAMPLE_BLOCK = 1 << 16
+
+
+def sample_indices(rng, size, count):
+    """
+    Draw a uniform sample of `count` indices out of range(size) without
+    replacement, using the NumPy generator `rng`.
+    The sample is produced one block of SAMPLE_BLOCK indices at a time:
+    the count per block is drawn from a multivariate hypergeometric, so
+    memory stays bounded by the block size instead of growing with `size`.
+    Yields an index array per block.
+    """
+    starts = np.arange(0, size, SAMPLE_BLOCK)
+    sizes = np.minimum(SAMPLE_BLOCK, size - starts)
+    counts = rng.multivariate_hypergeometric(sizes, count) if len(sizes) else sizes
+    for start, block_size, block_count in zip(starts, sizes, counts):
+        if block_count:
+            yield start + rng.choice(block_size, block_count, replace=False)
+
+
+def _index_array(indices):
+    if isinstance(indices, np.ndarray):
+        return indices
+    return np.fromiter(indices, dtype=np.int64)
+
+
+class Population(object):
+    # Compact struct-of-arrays container for a whole population.
+    def __init__(self, size, virus=None, flags=None):
+        """
+        Store the state of `size` people as one byte of flags per person.
+        Everybody starts alive, unvaccinated and uninfected.
+
+        Attributes:
+        - flags: bytearray of ALIVE/VACCINATED/INFECTED bits, one per person.
+          A writable buffer of `size` bytes (e.g. shared memory) can be
+          passed in to hold them instead.
+        - virus: The virus an infected person is carrying.
+        """
+        if flags is None:
+            self.flags = bytearray([ALIVE]) * size
+        else:
+            self.flags = flags
+            self.array()[:] = ALIVE
+        self.virus = virus
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __getitem__(self, _id):
+        if isinstance(_id, slice):
+            return [self._person(i) for i in range(*_id.indices(len(self.flags)))]
+        _id = operator.index(_id)
+        if _id < 0:
+            _id += len(self.flags)
+        if not 0 <= _id < len(self.flags):
+            raise IndexError('population index out of range')
+        return self._person(_id)
+
+    def __iter__(self):
+        for _id in range(len(self.flags)):
+            yield self._person(_id)
+
+    def _person(self, _id):
+        return PersonView(self, _id)
+
+    @property
+    def nbytes(self):
+        return len(self.flags)
+
+    def array(self):
+        # NumPy view sharing memory with `flags`
+        return np.frombuffer(self.flags, dtype=np.uint8)
+
+    def vaccinate(self, indices):
+        self.array()[_index_array(indices)] |= VACCINATED
+
+    def vaccinate_sample(self, rng, count):
+        """
+        Vaccinate `count` people picked uniformly at random with the NumPy
+        generator `rng`, writing straight into the flags.
+        """
+        flags = self.array()
+        for block in sample_indices(rng, len(self.flags), count):
+            flags[block] |= VACCINATED
+
+    def infect(self, indices):
+        # Infection replaces vaccination, like Person(i, False, virus)
+        self.array()[_index_array(indices)] = ALIVE | INFECTED
+
+    def lay_out(self, rng, num_vaccinated, num_infected):
+        """
+        Set up a starting population in bulk: the first `num_infected`
+        people are infected, and `num_vaccinated` of the others, picked
+        uniformly at random with the NumPy generator `rng`, are vaccinated
+        (all of them when there are fewer).
+        """
+        flags = self.array()
+        if num_vaccinated > len(flags):
+            raise ValueError('Cannot vaccinate more people than the population holds')
+        num_infected = min(num_infected, len(flags))
+        flags[:num_infected] = ALIVE | INFECTED
+        others = len(flags) - num_infected
+        for block in sample_indices(rng, others, min(num_vaccinated, others)):
+            flags[num_infected + block] |= VACCINATED
+
+    def count(self, mask, value=None):
+        """
+        Count the people whose flags, masked with `mask`, equal `value`
+        (by default: have every bit of `mask` set).
+        """
+        if value is None:
+            value = mask
+        return int(np.count_nonzero((self.array() & mask) == value))
+
+
+class LazyPeople(Population):
+    def __init__(self, size, virus=None):
+        """
+        `Population` that hands out real `Person` objects, each created
+        from its flags the first time it is looked up and the same object
+        on every later lookup. A run only pays for the people it touches,
+        and until then a person costs one byte.
+
+        Once created, a `Person` holds the state; `array()` writes the
+        state of the people created so far back into the flags first.
+        """
+        super().__init__(size, virus)
+        self.people = {}
+
+    def _person(self, _id):
+        person = self.people.get(_id)
+        if person is None:
+            flags = self.flags[_id]
+            person = Person(_id, bool(flags & VACCINATED), self.virus if flags & INFECTED else None)
+            person.is_alive = bool(flags & ALIVE)
+            self.people[_id] = person
+        return person
+
+    def array(self):
+        flags = super().array()
+        for _id, person in self.people.items():
+            flags[_id] = (ALIVE * person.is_alive | VACCINATED * bool(person.is_vaccinated)
+                          | INFECTED * (person.infection is not None))
+        return flags
+
+    def reset(self, flags):
+        # Replace every person's state with `flags`, forgetting the people created
+        self.people = {}
+        super().array()[:] = flags
+
+
+class PersonView(object):
+    # Lightweight `Person` handle onto one slot of a `Population`.
+    __slots__ = ('_population', '_id')
+
+    def __init__(self, population, _id):
+        self._population = population
+        self._id = _id
+
+    def __eq__(self, other):
+        return (isinstance(other, PersonView) and self._id == other._id
+                and self._population is other._population)
+
+    def __hash__(self):
+        return hash((id(self._population), self._id))
+
+    def _set_flag(self, flag, on):
+        if on:
+            self._population.flags[self._id] |= flag
+        else:
+            self._population.flags[self._id] &= ~flag
+
+    @property
+    def is_alive(self):
+        return bool(self._population.flags[self._id] & ALIVE)
+
+    @is_alive.setter
+    def is_alive(self, value):
+        self._set_flag(ALIVE, value)
+
+    @property
+    def is_vaccinated(self):
+        return bool(self._population.flags[self._id] & VACCINATED)
+
+    @is_vaccinated.setter
+    def is_vaccinated(self, value):
+        self._set_flag(VACCINATED, value)
+
+    @property
+    def infection(self):
+        if self._population.flags[self._id] & INFECTED:
+            return self._population.virus
+        return None
+
+    @infection.setter
+    def infection(self, virus):
+        if virus is not None and self._population.virus is None:
+            self._population.virus = virus
+        self._set_flag(INFECTED, virus is not None)
+
+    def did_survive_infection(self, rng=random):
+        # Same rules as Person.did_survive_infection
+        if self.infection != None:
+            chance_of_survival = rng.random()
+            if chance_of_survival < self.infection.mortality_rate:
+                # Died from infection
+                self.is_alive = False
+                self.infection = None
+            else:
+                # Survived and became immune
+                self.is_vaccinated = True
+                self.infection = None
+        return self.is_alive
+
+
+if __name__ == "__main__":
+    virus = Virus("Dysentery", 0.7, 0.2)
+    population = Population(100, virus)
+    population.vaccinate([1, 2])
+    population.infect([3])
+
+    assert len(population) == 100
+    assert population[1].is_vaccinated is True
+    assert population[3].infection == virus
+    assert population[3].is_vaccinated is False
+    assert population[4].infection is None
+    assert population[-1]._id == 99
+    assert [person._id for person in population[1:4]] == [1, 2, 3]
+    assert population.count(VACCINATED) == 2
+
+    # Views are interchangeable handles onto the same person
+    assert population[3] == population[3]
+    assert len({population[3], population[3]}) == 1
+
+    population[3].did_survive_infection()
+    assert population[3].infection is None
+    print(f"Bytes per person: {population.nbytes / len(population)}")
@@ -0,0 +1,158 @@
+import random
+import numpy as np
+from sampling import binomial
+
+
+def _seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+class RandomStream(random.Random):
+    def __init__(self, seed=None):
+        """
+        `random.Random` seeded from a NumPy `SeedSequence`, so that a stream
+        can spawn independent, reproducible substreams (one per replicate).
+        It has the whole `random` module interface and can be passed as the
+        `rng` of a `Simulation` in place of the global `random` module.
+
+        Attributes:
+        - seed_sequence: The `SeedSequence` the stream was seeded from. A
+          `seed` that is an int, None or a `SeedSequence` is accepted.
+        """
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):
+        self.seed_sequence = _seed_sequence(a)
+        self._generator = None
+        state = self.seed_sequence.generate_state(4, np.uint64)
+        super().seed(int.from_bytes(state.tobytes(), 'little'))
+
+    def __reduce__(self):
+        # Keep the seed sequence when pickled, so the copy can still spawn
+        return (type(self), (self.seed_sequence,), self.getstate())
+
+    def spawn(self, n):
+        # `n` independent child streams of the same type
+        return [type(self)(child) for child in self.seed_sequence.spawn(n)]
+
+    def binomial(self, n, p):
+        return binomial(n, p, self.random)
+
+    @property
+    def generator(self):
+        """
+        NumPy generator for vectorized draws, seeded from the same
+        `seed_sequence` and created on first use.
+        """
+        if self._generator is None:
+            self._generator = np.random.default_rng(self.seed_sequence)
+        return self._generator
+
+
+class NumpyRandom(RandomStream):
+    # Number of values drawn from the NumPy generator at a time
+    BUFFER = 4096
+
+    def __init__(self, seed=None):
+        """
+        `RandomStream` backed by a NumPy PCG64 generator instead of the
+        Mersenne Twister. Scalar draws are served from buffers filled with
+        one vectorized call, and `generator` is the same NumPy generator, so
+        scalar and batched code can share one reproducible stream.
+        """
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):
+        self.seed_sequence = _seed_sequence(a)
+        self._generator = np.random.default_rng(self.seed_sequence)
+        self._floats = []
+        self._words = []
+        self.gauss_next = None
+
+    def random(self):
+        if not self._floats:
+            self._floats = self._generator.random(self.BUFFER).tolist()
+            self._floats.reverse()
+        return self._floats.pop()
+
+    def getrandbits(self, k):
+        if k <= 0:
+            return 0
+        bits = 0
+        for shift in range(0, k, 64):
+            if not self._words:
+                self._words = self._generator.integers(0, 1 << 64, self.BUFFER, dtype=np.uint64).tolist()
+                self._words.reverse()
+            bits |= self._words.pop() << shift
+        return bits & ((1 << k) - 1)
+
+    def binomial(self, n, p):
+        return int(self._generator.binomial(n, min(max(p, 0), 1)))
+
+    def getstate(self):
+        return (self._generator.bit_generator.state, list(self._floats), list(self._words), self.gauss_next)
+
+    def setstate(self, state):
+        bit_generator_state, floats, words, self.gauss_next = state
+        self._generator.bit_generator.state = bit_generator_state
+        self._floats = list(floats)
+        self._words = list(words)
+
+
+def make_rng(rng=None):
+    """
+    Return the random source a simulation should draw from: the global
+    `random` module for None, a `RandomStream` for an int or `SeedSequence`
+    seed, and any other object (a `random.Random`, a stream) unchanged.
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return RandomStream(rng)
+    return rng
+
+
+def seed_key(seed):
+    """
+    Return a JSON-able identity of a seed (an int or `SeedSequence`), the
+    same for every seed that gives the same streams, or None for anything
+    whose draws cannot be reproduced from a seed (None, a generator or a
+    stream that may already have been drawn from).
+    """
+    if isinstance(seed, (int, np.integer)) and not isinstance(seed, bool):
+        seed = np.random.SeedSequence(int(seed))
+    if not isinstance(seed, np.random.SeedSequence):
+        return None
+    entropy = seed.entropy
+    entropy = [int(e) for e in entropy] if isinstance(entropy, (list, tuple, np.ndarray)) else int(entropy)
+    return [entropy, [int(k) for k in seed.spawn_key]]
+
+
+def as_generator(rng=None):
+    """
+    Return a NumPy generator for vectorized draws from `rng`: a NumPy
+    generator is used as is, a stream hands out its `generator`, and
+    anything else is passed to `np.random.default_rng` as a seed.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if isinstance(rng, RandomStream):
+        return rng.generator
+    return np.random.default_rng(rng)
+
+
+if __name__ == "__main__":
+    # The same seed gives the same stream, and spawned streams differ
+    first, second = RandomStream(42), RandomStream(42)
+    assert [first.random() for _ in range(5)] == [second.random() for _ in range(5)]
+    children = RandomStream(42).spawn(2)
+    assert children[0].random() != children[1].random()
+
+    fast = NumpyRandom(42)
+    state = fast.getstate()
+    draws = [fast.randrange(10) for _ in range(5)]
+    fast.setstate(state)
+    assert draws == [fast.randrange(10) for _ in range(5)]
+    print(f"Sample from a NumPy-backed stream: {fast.sample(range(100), 5)}")
@@ -0,0 +1,97 @@
+import unittest
+import os
+import random
+import tempfile
+from datetime import datetime
+from rng import RandomStream, NumpyRandom, make_rng, as_generator
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from person import Person
+from virus import Virus
+
+
+class TestRandomStreams(unittest.TestCase):
+    def test_same_seed_same_stream(self):
+        for stream in (RandomStream, NumpyRandom):
+            first, second = stream(7), stream(7)
+            self.assertEqual([first.random() for _ in range(10)], [second.random() for _ in range(10)])
+            self.assertEqual(first.sample(range(1000), 10), second.sample(range(1000), 10))
+            self.assertEqual(first.binomial(100, 0.3), second.binomial(100, 0.3))
+
+    def test_spawned_streams(self):
+        for stream in (RandomStream, NumpyRandom):
+            children = stream(7).spawn(3)
+            again = stream(7).spawn(3)
+            draws = [child.random() for child in children]
+            self.assertEqual(draws, [child.random() for child in again])
+            self.assertEqual(len(set(draws)), 3)
+            self.assertIsInstance(children[0], stream)
+
+    def test_numpy_state_round_trip(self):
+        stream = NumpyRandom(3)
+        stream.random()
+        state = stream.getstate()
+        draws = [stream.randrange(10 ** 12) for _ in range(5)]
+        stream.setstate(state)
+        self.assertEqual(draws, [stream.randrange(10 ** 12) for _ in range(5)])
+        self.assertTrue(all(0 <= draw < 10 ** 12 for draw in draws))
+        self.assertEqual(stream.getrandbits(130).bit_length() <= 130, True)
+
+    def test_make_rng(self):
+        self.assertIs(make_rng(None), random)
+        self.assertIsInstance(make_rng(5), RandomStream)
+        stream = NumpyRandom(5)
+        self.assertIs(make_rng(stream), stream)
+        self.assertIs(as_generator(stream), stream.generator)
+
+    def test_person_uses_rng(self):
+        virus = Virus("Test", 0.5, 0.5)
+        outcomes = []
+        for _ in range(2):
+            rng = RandomStream(11)
+            outcomes.append([Person(i, False, virus).did_survive_infection(rng) for i in range(50)])
+        self.assertEqual(outcomes[0], outcomes[1])
+
+
+class TestReproducibleLogs(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.5, 0.12)
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = lambda: datetime(2020, 1, 1)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_logged(self, make_simulation, name):
+        sim = make_simulation()
+        sim.logger.file_name = os.path.join(self.directory.name, name)
+        sim.run()
+        with open(sim.logger.file_name) as file:
+            return file.read()
+
+    def test_seeded_runs_write_identical_logs(self):
+        engines = {
+            'object': lambda: Simulation(self.virus, 300, 0.1, 5, rng=RandomStream(42), log_clock=self.clock),
+            'numpy': lambda: Simulation(self.virus, 300, 0.1, 5, rng=NumpyRandom(42), log_clock=self.clock),
+            'aggregate': lambda: Simulation(self.virus, 300, 0.1, 5, rng=42, sampling='aggregate',
+                                            log_clock=self.clock),
+            'vector': lambda: VectorSimulation(self.virus, 300, 0.1, 5, rng=NumpyRandom(42), log_clock=self.clock),
+        }
+        for name, make_simulation in engines.items():
+            first = self.run_logged(make_simulation, f'{name}_first')
+            # Draws from the global random module in between must not matter
+            random.random()
+            second = self.run_logged(make_simulation, f'{name}_second')
+            self.assertEqual(first, second, name)
+            self.assertIn('Simulation Date: 01/01/2020 00:00:00', first)
+
+    def test_seeded_run_leaves_global_random(self):
+        random.seed(123)
+        expected = random.random()
+        random.seed(123)
+        Simulation(self.virus, 100, 0.1, 2, rng=1).step()
+        self.assertEqual(random.random(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import math
+import random
+
+# Ways a simulation can draw the contacts of the infected
+SAMPLING_MODES = ('contact', 'aggregate')
+
+# Smallest P(X = 0) the inversion from 0 starts from: below it q ** n is
+# too close to underflowing, and the draw walks out from the mode instead
+MIN_START_PROBABILITY = 1e-300
+
+
+def binomial(n, p, rand=random.random):
+    """
+    Draw from a Binomial(n, p) distribution using one uniform from `rand`.
+    Uses inversion of the CDF, which takes O(n * p) work, for the small `n`
+    of one person's contacts. When P(X = 0) = q ** n would underflow (large
+    `n`, e.g. the neighbors of a hub), the CDF is inverted from the mode
+    instead (see `_binomial_from_mode`). `p` outside [0, 1] is clamped.
+    """
+    if n <= 0 or p <= 0:
+        return 0
+    if p >= 1:
+        return n
+    if p > 0.5:
+        return n - binomial(n, 1 - p, rand)
+
+    q = 1 - p
+    ratio = p / q
+    prob = q ** n
+    if prob < MIN_START_PROBABILITY:
+        return _binomial_from_mode(n, p, rand())
+    u = rand()
+    k = 0
+    while u > prob and k < n:
+        u -= prob
+        k += 1
+        prob *= ratio * (n - k + 1) / k
+    return k
+
+
+def _binomial_from_mode(n, p, u):
+    """
+    Invert the CDF of Binomial(n, p) at `u`, taking the outcomes from the
+    mode outwards, alternately below and above it. The probability of the
+    mode comes from log-gamma and every other one from its neighbor's, so
+    nothing underflows and the work is O(sqrt(n * p * (1 - p))).
+    """
+    q = 1 - p
+    mode = min(n, int((n + 1) * p))
+    prob = math.exp(math.lgamma(n + 1) - math.lgamma(mode + 1) - math.lgamma(n - mode + 1)
+                    + mode * math.log(p) + (n - mode) * math.log1p(-p))
+    u -= prob
+    low, low_prob = mode, prob
+    high, high_prob = mode, prob
+    # Stop once both tails are exhausted, in case rounding leaves some of u
+    while u > 0 and ((low > 0 and low_prob) or (high < n and high_prob)):
+        if low > 0 and low_prob:
+            low_prob *= low / (n - low + 1) * q / p
+            low -= 1
+            u -= low_prob
+            if u <= 0:
+                return low
+        if high < n and high_prob:
+            high_prob *= (n - high) / (high + 1) * p / q
+            high += 1
+            u -= high_prob
+            if u <= 0:
+                return high
+    return mode
+
+
+def check_sampling(sampling):
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f'Unknown sampling mode {sampling!r}, expected one of {SAMPLING_MODES}')
+    return sampling
+
+
+if __name__ == "__main__":
+    # The sample mean and variance should match n * p and n * p * (1 - p)
+    n, p = 100, 0.3
+    draws = [binomial(n, p) for _ in range(100000)]
+    mean = sum(draws) / len(draws)
+    variance = sum((d - mean) ** 2 for d in draws) / len(draws)
+    print(f"mean {mean:.3f} vs {n * p}, variance {variance:.3f} vs {n * p * (1 - p)}")
+    assert binomial(10, 0) == 0
+    assert binomial(10, 1) == 10
+    assert binomial(0, 0.5) == 0
@@ -0,0 +1,98 @@
+import unittest
+import random
+import numpy as np
+from sampling import binomial
+from simulation import Simulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+def ks_statistic(first, second):
+    # Largest gap between the empirical CDFs of two samples
+    first, second = np.sort(first), np.sort(second)
+    values = np.union1d(first, second)
+    cdf_first = np.searchsorted(first, values, side='right') / len(first)
+    cdf_second = np.searchsorted(second, values, side='right') / len(second)
+    return np.abs(cdf_first - cdf_second).max()
+
+
+def ks_critical(n, m, c_alpha=1.95):
+    # Two-sample KS critical value, alpha = 0.001
+    return c_alpha * np.sqrt((n + m) / (n * m))
+
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+        self.replicates = 400
+
+    def test_binomial(self):
+        rng = random.Random(7)
+        draws = np.array([binomial(100, 0.3, rng.random) for _ in range(20000)])
+        self.assertAlmostEqual(draws.mean(), 30, delta=0.3)
+        self.assertAlmostEqual(draws.var(), 21, delta=1)
+        self.assertTrue(((draws >= 0) & (draws <= 100)).all())
+
+        # The upper tail goes through the symmetric draw
+        draws = np.array([binomial(100, 0.9, rng.random) for _ in range(20000)])
+        self.assertAlmostEqual(draws.mean(), 90, delta=0.2)
+
+        # Large counts, where q ** n underflows
+        draws = np.array([binomial(10000, 0.1, rng.random) for _ in range(20000)])
+        self.assertAlmostEqual(draws.mean(), 1000, delta=1)
+        self.assertAlmostEqual(draws.var(), 900, delta=40)
+        draws = np.array([binomial(100000, 0.98, rng.random) for _ in range(5000)])
+        self.assertAlmostEqual(draws.mean(), 98000, delta=1)
+
+        self.assertEqual(binomial(10, 0), 0)
+        self.assertEqual(binomial(10, 1.5), 10)
+        self.assertEqual(binomial(0, 0.5), 0)
+
+    def one_step(self, make_simulation):
+        # Outcomes of the first step of `replicates` fresh simulations
+        saved, infections = [], []
+        for i in range(self.replicates):
+            sim = make_simulation(i)
+            sim.time_step()
+            self.assertEqual(sim.total_interactions, 100 * sim.initial_infected)
+            saved.append(sim.saved_by_vaccination)
+            infections.append(sim.new_infections)
+        return np.array(saved), np.array(infections)
+
+    def assertSameDistribution(self, first, second):
+        self.assertLess(ks_statistic(first, second), ks_critical(len(first), len(second)))
+
+    def test_object_engine_matches_interaction(self):
+        def simulation(sampling):
+            def make_simulation(i):
+                random.seed(i)
+                return Simulation(self.virus, 200, 0.3, 20, sampling=sampling)
+            return make_simulation
+
+        state = random.getstate()
+        try:
+            contact = self.one_step(simulation('contact'))
+            aggregate = self.one_step(simulation('aggregate'))
+        finally:
+            random.setstate(state)
+        for expected, actual in zip(contact, aggregate):
+            self.assertSameDistribution(expected, actual)
+
+    def test_vector_engine_matches_contacts(self):
+        def simulation(sampling):
+            def make_simulation(i):
+                return VectorSimulation(self.virus, 200, 0.3, 20, seed=i, sampling=sampling)
+            return make_simulation
+
+        contact = self.one_step(simulation('contact'))
+        aggregate = self.one_step(simulation('aggregate'))
+        for expected, actual in zip(contact, aggregate):
+            self.assertSameDistribution(expected, actual)
+
+    def test_unknown_sampling(self):
+        with self.assertRaises(ValueError):
+            Simulation(self.virus, 10, 0.1, 1, sampling='exact')
+
+
+if __name__ == '__main__':
+    unittest.main()
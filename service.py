@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ensemble import ENGINES, make_simulation
+
+# Settings every job must give
+REQUIRED_SETTINGS = ('repro_rate', 'mortality_rate', 'pop_size', 'vacc_percentage')
+
+# Defaults of the optional settings of a job
+JOB_DEFAULTS = {
+    'virus_name': 'Sniffles',
+    'initial_infected': 1,
+    'engine': 'vector',
+    'seed': None,
+    'max_steps': None,
+}
+
+# Final counters reported in the 'result' event of a job
+RESULT_COUNTERS = ('num_steps', 'total_deaths', 'saved_by_vaccination', 'total_infected', 'total_interactions')
+
+
+def normalize_job(job):
+    """
+    Check a job request (a dict of REQUIRED_SETTINGS and any of
+    JOB_DEFAULTS) and fill in its defaults. Raises ValueError for an
+    unknown or missing setting, or a request that is not a dict.
+    """
+    if not isinstance(job, dict):
+        raise ValueError(f'A job must be an object of job settings, got {type(job).__name__}')
+    unknown = set(job) - set(REQUIRED_SETTINGS) - set(JOB_DEFAULTS)
+    if unknown:
+        raise ValueError(f'Unknown job settings {", ".join(sorted(unknown))}')
+    missing = [name for name in REQUIRED_SETTINGS if job.get(name) is None]
+    if missing:
+        raise ValueError(f'Job has no value for {", ".join(missing)}')
+    config = dict(JOB_DEFAULTS, **job)
+    if config['engine'] not in ENGINES:
+        raise ValueError(f'Unknown engine {config["engine"]!r}, expected one of {sorted(ENGINES)}')
+    return config
+
+
+def job_key(config):
+    # Identical seeded jobs share a key; unseeded jobs are never shared
+    if config['seed'] is None:
+        return None
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def run_job(config, emit):
+    """
+    Run one job to completion, calling `emit(event)` with a 'step' event
+    after every step and returning its 'result' event. Runs in a worker
+    thread of the service's executor.
+    """
+    sim = make_simulation(config, np.random.SeedSequence(config['seed']))
+    max_steps = config['max_steps']
+    if max_steps is None or max_steps > 0:
+        for snapshot in sim.iter_steps():
+            event = {name: int(value) for name, value in zip(snapshot._fields, snapshot)}
+            event['should_continue'] = bool(snapshot.should_continue)
+            event['type'] = 'step'
+            emit(event)
+            if max_steps is not None and snapshot.step >= max_steps:
+                break
+    result = {name: int(getattr(sim, name)) for name in RESULT_COUNTERS}
+    result['type'] = 'result'
+    return result
+
+
+class Job(object):
+    def __init__(self, config, key):
+        """
+        A submitted job and the events it has produced so far.
+
+        Attributes:
+        - config: The normalized job settings.
+        - key: Its deduplication key, None for an unseeded job.
+        - events: Every event so far: one 'step' event per step, then a
+          final 'result' (or 'error') event.
+        - done: Whether the final event has been published.
+        """
+        self.config = config
+        self.key = key
+        self.events = []
+        self.done = False
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        # Called on the event loop; wakes every subscriber
+        self.events.append(event)
+        if event['type'] != 'step':
+            self.done = True
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self):
+        """
+        Yield every event of the job, starting from its first step: a late
+        subscriber first catches up on the events already published.
+        """
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class SimulationService(object):
+    def __init__(self, concurrency=None, executor=None, cache_size=128):
+        """
+        Asyncio front end running simulation jobs on an executor pool.
+
+        - At most `concurrency` jobs (default: one per CPU core) run at
+          once; the others wait their turn without holding a worker.
+        - Clients follow a job through `stream()`, which yields its per-step
+          counters as they are produced, then its final result.
+        - Identical seeded jobs are deduplicated: a request for a job that is
+          running or finished (among the last `cache_size`) follows the
+          existing job instead of running it again.
+
+        Jobs run in a thread pool by default, so their events reach the event
+        loop without any copying between processes; the vector engine spends
+        most of a step in NumPy, which releases the GIL.
+        """
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.concurrency)
+        self.cache_size = cache_size
+        self.jobs = OrderedDict()
+        self.runs = 0
+        self._semaphore = None
+
+    def submit(self, job):
+        """
+        Start `job` (a dict of job settings) and return its `Job`, or the
+        existing `Job` of an identical seeded request. Must be called from
+        the event loop.
+        """
+        config = normalize_job(job)
+        key = job_key(config)
+        if key is not None and key in self.jobs:
+            self.jobs.move_to_end(key)
+            return self.jobs[key]
+
+        job = Job(config, key)
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        if key is not None:
+            self.jobs[key] = job
+            self._evict()
+        return job
+
+    def _evict(self):
+        # Drop the least recently requested finished jobs beyond cache_size
+        for key in list(self.jobs):
+            if len(self.jobs) <= self.cache_size:
+                break
+            if self.jobs[key].done:
+                del self.jobs[key]
+
+    async def _run(self, job):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+
+        def emit(event):
+            loop.call_soon_threadsafe(job.publish, event)
+
+        async with self._semaphore:
+            self.runs += 1
+            try:
+                result = await loop.run_in_executor(self.executor, run_job, job.config, emit)
+            except Exception as error:
+                result = {'type': 'error', 'message': str(error)}
+                # A failed job is not cached, so it can be retried
+                if job.key is not None and self.jobs.get(job.key) is job:
+                    del self.jobs[job.key]
+        # Queued after every step event the worker emitted
+        loop.call_soon(job.publish, result)
+
+    async def stream(self, job):
+        # Submit `job` and yield its events as they are produced
+        async for event in self.submit(job).subscribe():
+            yield event
+
+    async def run(self, job):
+        # Submit `job` and return its final event
+        event = None
+        async for event in self.stream(job):
+            pass
+        return event
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def handle_client(self, reader, writer):
+        """
+        Serve one TCP connection: every line the client sends is a JSON job,
+        answered with its events as JSON lines.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    events = self.stream(json.loads(line))
+                    async for event in events:
+                        writer.write(json.dumps(event).encode() + b'\n')
+                        await writer.drain()
+                except ValueError as error:
+                    writer.write(json.dumps({'type': 'error', 'message': str(error)}).encode() + b'\n')
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        # Start the JSON-lines TCP server and return the asyncio Server
+        return await asyncio.start_server(self.handle_client, host, port)
+
+
+async def request(host, port, job):
+    """
+    Client for `SimulationService.serve`: send `job` and yield its events.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps(job).encode() + b'\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('Connection closed before the job finished')
+            event = json.loads(line)
+            yield event
+            if event['type'] != 'step':
+                return
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _serve_forever(host, port, concurrency):
+    service = SimulationService(concurrency=concurrency)
+    server = await service.serve(host, port)
+    print(f"Serving simulations on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve simulation jobs over JSON lines on TCP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args.host, args.port, args.concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
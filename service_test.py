@@ -0,0 +1,71 @@
+import unittest
+from service import SimulationService, normalize_job, request
+
+JOB = {'repro_rate': 0.05, 'mortality_rate': 0.12, 'pop_size': 500, 'vacc_percentage': 0.1,
+       'initial_infected': 5, 'seed': 3}
+
+
+class TestSimulationService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = SimulationService(concurrency=2)
+
+    def tearDown(self):
+        self.service.close()
+
+    async def test_stream_steps(self):
+        events = [event async for event in self.service.stream(JOB)]
+        steps, result = events[:-1], events[-1]
+        self.assertEqual(result['type'], 'result')
+        self.assertEqual([event['step'] for event in steps], list(range(1, result['num_steps'] + 1)))
+        self.assertEqual(steps[-1]['total_deaths'], result['total_deaths'])
+        self.assertFalse(steps[-1]['should_continue'])
+
+    async def test_seeded_jobs_are_deduplicated(self):
+        first = self.service.stream(JOB)
+        await first.__anext__()
+        # Joining a running job replays its steps from the first one
+        second = [event async for event in self.service.stream(dict(JOB))]
+        self.assertEqual(second[0]['step'], 1)
+        self.assertEqual(self.service.runs, 1)
+        self.assertEqual(await self.service.run(JOB), second[-1])
+        self.assertEqual(self.service.runs, 1)
+
+        await self.service.run(dict(JOB, seed=4))
+        await self.service.run(dict(JOB, seed=None))
+        await self.service.run(dict(JOB, seed=None))
+        self.assertEqual(self.service.runs, 4)
+
+    async def test_failed_job_is_not_cached(self):
+        job = dict(JOB, vacc_percentage=2.0)
+        event = await self.service.run(job)
+        self.assertEqual(event['type'], 'error')
+        self.assertEqual(len(self.service.jobs), 0)
+
+    async def test_tcp_server(self):
+        server = await self.service.serve('127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        async with server:
+            events = [event async for event in request(host, port, JOB)]
+            self.assertEqual(events[-1], await self.service.run(JOB))
+
+            events = [event async for event in request(host, port, {'pop_size': 10})]
+            self.assertEqual(events[0]['type'], 'error')
+
+            # Valid JSON that is not an object gets an error event too
+            for job in ([1], 'x', 5):
+                events = [event async for event in request(host, port, job)]
+                self.assertEqual(events, [{'type': 'error', 'message': events[0]['message']}])
+                self.assertIn('object of job settings', events[0]['message'])
+
+    def test_normalize_job(self):
+        self.assertEqual(normalize_job(JOB)['engine'], 'vector')
+        with self.assertRaises(ValueError):
+            normalize_job(dict(JOB, virus='Sniffles'))
+        with self.assertRaises(ValueError):
+            normalize_job({'pop_size': 10})
+        with self.assertRaises(ValueError):
+            normalize_job([1])
+
+
+if __name__ == '__main__':
+    unittest.main()
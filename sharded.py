@@ -0,0 +1,306 @@
+import mmap
+import multiprocessing
+import os
+import weakref
+import numpy as np
+from population import Population, ALIVE, VACCINATED, INFECTED
+from simulation import STATE_COUNTERS, _pickle_rng, _unpickle_rng
+from vector_simulation import VectorSimulation, CONTACT_CHUNK
+from virus import Virus
+
+
+class Shard(object):
+    def __init__(self, start, stop, seed):
+        """
+        A contiguous range of people [start, stop) of a sharded population,
+        with its own random generator.
+
+        Attributes:
+        - infected: Array of the ids of the shard's infected people.
+        - num_healthy: Number of the shard's people who are alive and not
+          infected, who are the ones contacts can land on.
+        """
+        self.start = start
+        self.stop = stop
+        self.rng = np.random.default_rng(seed)
+        self.infected = None
+        self.num_healthy = 0
+
+    def index(self, state):
+        # Build the shard's infected ids and healthy count from the flags
+        flags = state[self.start:self.stop]
+        self.infected = np.flatnonzero(flags & INFECTED) + self.start
+        self.num_healthy = int(np.count_nonzero((flags & (ALIVE | INFECTED)) == ALIVE))
+        return len(self.infected), self.num_healthy
+
+    def step(self, state, num_contacts, repro_rate, mortality_rate):
+        """
+        Run the shard's part of one time step, like `VectorSimulation.time_step`:
+        - `num_contacts` of the step's contacts land on uniformly random
+          healthy people of this shard.
+        - The shard's infected people die or recover.
+        - The people infected by the contacts are marked.
+        Returns (saved_by_vaccination, new_infections, deaths, num_healthy).
+        """
+        saved = 0
+        newly_infected = []
+        if num_contacts:
+            flags = state[self.start:self.stop]
+            healthy = np.flatnonzero((flags & (ALIVE | INFECTED)) == ALIVE) + self.start
+            while num_contacts > 0:
+                batch = min(num_contacts, CONTACT_CHUNK)
+                targets = healthy[self.rng.integers(0, len(healthy), batch)]
+                protected = (state[targets] & VACCINATED).astype(bool)
+                saved += int(np.count_nonzero(protected))
+                exposed = targets[~protected]
+                newly_infected.append(exposed[self.rng.random(len(exposed)) < repro_rate])
+                num_contacts -= batch
+
+        died = self.rng.random(len(self.infected)) < mortality_rate
+        deaths = int(np.count_nonzero(died))
+        state[self.infected[died]] = 0
+        state[self.infected[~died]] = ALIVE | VACCINATED
+
+        if newly_infected:
+            newly_infected = np.unique(np.concatenate(newly_infected))
+        else:
+            newly_infected = np.zeros(0, dtype=np.int64)
+        state[newly_infected] |= INFECTED
+        self.num_healthy += len(self.infected) - deaths - len(newly_infected)
+        self.infected = newly_infected
+        return saved, len(newly_infected), deaths, self.num_healthy
+
+    def save(self, state):
+        # The shard's random generator, for a checkpoint: the rest of the
+        # shard is rebuilt from the flags in `state` by `restore`
+        return self.rng
+
+    def restore(self, state, rng):
+        # Continue from a checkpoint with the saved generator and flags
+        self.rng = rng
+        return self.index(state)
+
+
+def _shard_worker(connection, memory, pop_size, shards):
+    # Worker process loop: run a method of every shard it owns whenever
+    # asked to, with that shard's arguments
+    state = np.frombuffer(memory, dtype=np.uint8, count=pop_size)
+    connection.send([shard.index(state) for shard in shards])
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        method, args = message
+        connection.send([getattr(shard, method)(state, *shard_args) for shard, shard_args in zip(shards, args)])
+    connection.close()
+
+
+def _stop_workers(workers):
+    for process, connection in workers:
+        try:
+            connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process, connection in workers:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+        connection.close()
+
+
+class ShardedSimulation(VectorSimulation):
+    engine = 'sharded'
+
+    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1, seed=None,
+                 workers=None, num_shards=None, log_buffer_size=None, series_writer=None,
+                 log_clock=None, profiler=None):
+        """
+        Version of `VectorSimulation` that splits one population into
+        `num_shards` contiguous shards stepped by `workers` processes.
+
+        The population flags live in an anonymous shared memory mapping that
+        the worker processes inherit, so every shard reads and writes the
+        flags of its people in place. Each step the coordinator:
+        - splits the 100 contacts of every infected person across the shards
+          with a multinomial draw weighted by each shard's healthy count,
+          so every contact still lands on a uniformly random healthy person;
+        - sends each worker the contact counts of its shards in one batch;
+        - adds up the per-shard counters the workers send back.
+        The shards draw their contacts, resolve the survival of their own
+        infected and mark their newly infected people in parallel.
+
+        Counters, `run()` and the `Logger` output follow the single-process
+        semantics. A run is reproducible from `seed` and `num_shards`: the
+        number of workers only changes how fast it goes. With `workers=0`
+        the shards are stepped in this process.
+
+        Workers are forked, so this needs a platform with the 'fork' start
+        method. Call `close()` (or use the simulation as a context manager)
+        to stop them; they are also stopped when the simulation is garbage
+        collected.
+
+        Runs can be checkpointed: the snapshot holds the flags and the
+        random generator of every shard, fetched from the workers, and can
+        be resumed with any number of workers.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.num_shards = num_shards or max(1, workers)
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        coordinator_seed, *shard_seeds = seed_sequence.spawn(self.num_shards + 1)
+        super().__init__(virus, pop_size, vacc_percentage, initial_infected, seed=coordinator_seed,
+                         log_buffer_size=log_buffer_size, series_writer=series_writer,
+                         log_clock=log_clock, profiler=profiler)
+
+        bounds = np.linspace(0, pop_size, self.num_shards + 1).astype(np.int64).tolist()
+        self.shards = [Shard(bounds[i], bounds[i + 1], shard_seeds[i]) for i in range(self.num_shards)]
+        self._workers = []
+        if workers:
+            self._start_workers()
+            counts = [count for process, connection in self._workers for count in connection.recv()]
+        else:
+            counts = [shard.index(self.state) for shard in self.shards]
+        self._set_counts(counts)
+        self._finalizer = weakref.finalize(self, _stop_workers, self._workers)
+
+    def _create_population(self):
+        # Same as `VectorSimulation`, with the flags in shared memory
+        self._memory = mmap.mmap(-1, max(1, self.pop_size))
+        population = Population(self.pop_size, self.virus, flags=memoryview(self._memory)[:self.pop_size])
+        self.state = population.array()
+        population.lay_out(self.rng, int(self.pop_size * self.vacc_percentage), self.initial_infected)
+        return population
+
+    def _start_workers(self):
+        context = multiprocessing.get_context('fork')
+        # Give each worker an equal run of consecutive shards
+        owners = np.array_split(np.arange(self.num_shards), min(self.workers, self.num_shards))
+        for owned in owners:
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_shard_worker,
+                args=(child, self._memory, self.pop_size, [self.shards[i] for i in owned]),
+                daemon=True
+            )
+            process.start()
+            child.close()
+            self._workers.append((process, parent))
+        self._owners = [owned.tolist() for owned in owners]
+
+    def _call_shards(self, method, args):
+        """
+        Call `method` of every shard with the flags and that shard's tuple
+        of `args`, in the worker processes that own the shards (or here
+        without workers). Returns the results in shard order.
+        """
+        if not self._workers:
+            return [getattr(shard, method)(self.state, *shard_args) for shard, shard_args in zip(self.shards, args)]
+        for (process, connection), owned in zip(self._workers, self._owners):
+            connection.send((method, [args[i] for i in owned]))
+        return [result for process, connection in self._workers for result in connection.recv()]
+
+    def _index_population(self):
+        # Shards are indexed once they exist, see `_set_counts`
+        self.num_infected = int(np.count_nonzero(self.state & INFECTED))
+
+    def _set_counts(self, counts):
+        self.num_infected = sum(num_infected for num_infected, num_healthy in counts)
+        self.healthy_counts = np.array([num_healthy for num_infected, num_healthy in counts], dtype=np.int64)
+
+    @property
+    def infected(self):
+        return np.flatnonzero(self.state & INFECTED)
+
+    def _simulation_should_continue(self):
+        """
+        Determine whether the simulation should continue.
+        Same end conditions as `Simulation._simulation_should_continue`.
+        """
+        if self.pop_size == self.total_deaths + self.infected_and_alive:
+            return False
+
+        return self.num_infected > 0
+
+    def time_step(self):
+        """
+        Simulate one step in time across all the shards.
+        """
+        contacts = np.zeros(self.num_shards, dtype=np.int64)
+        num_healthy = int(self.healthy_counts.sum())
+        if num_healthy:
+            num_contacts = 100 * self.num_infected
+            self.total_interactions += num_contacts
+            contacts = self.rng.multinomial(num_contacts, self.healthy_counts / num_healthy)
+
+        # Every shard does its interactions and survival checks
+        with self.profiler.phase('shards'):
+            results = self._call_shards('step', [
+                (int(num_contacts), self.virus.repro_rate, self.virus.mortality_rate) for num_contacts in contacts
+            ])
+
+        saved = sum(result[0] for result in results)
+        new_infections = sum(result[1] for result in results)
+        deaths = sum(result[2] for result in results)
+        self.healthy_counts = np.array([result[3] for result in results], dtype=np.int64)
+
+        self.saved_by_vaccination += saved
+        self.infected_and_alive += new_infections - self.num_infected
+        self.total_deaths += deaths
+        self.death_interactions += deaths
+        self.new_infections = new_infections
+        self.total_infected += new_infections
+        self.num_infected = new_infections
+
+    def cache_params(self, max_steps=None):
+        # A sharded run also depends on how it is split
+        params = super().cache_params(max_steps)
+        if params is not None:
+            params['num_shards'] = self.num_shards
+        return params
+
+    def checkpoint_params(self):
+        params = super().checkpoint_params()
+        params['num_shards'] = self.num_shards
+        return params
+
+    def get_state(self):
+        """
+        Same as `VectorSimulation.get_state`, with the flags copied out of
+        the shared memory, plus the random generators of the shards
+        (pickled, as 'shard_rngs').
+        """
+        state = super().get_state()
+        state['shard_rngs'] = _pickle_rng(self._call_shards('save', [()] * self.num_shards))
+        return state
+
+    def set_state(self, state):
+        # Restore a state returned by `get_state` and re-index the shards
+        rngs = _unpickle_rng(state['shard_rngs'])
+        if len(rngs) != self.num_shards:
+            raise ValueError(f'Expected the state of a simulation with {self.num_shards} shards, got {len(rngs)}')
+        self.state[:] = state['flags']
+        self.newly_infected = set()
+        for name, value in zip(STATE_COUNTERS, state['counters'].tolist()):
+            setattr(self, name, value)
+        self.rng = _unpickle_rng(state['rng'])
+        self._set_counts(self._call_shards('restore', [(rng,) for rng in rngs]))
+
+    def close(self):
+        # Stop the worker processes
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Virus details
+    virus = Virus("Sniffles", 0.5, 0.12)
+
+    # Create and run the simulation
+    with ShardedSimulation(virus, 10 ** 7, 0.1, 10, seed=1, workers=4) as sim:
+        sim.run()
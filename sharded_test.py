@@ -0,0 +1,92 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from sampling_test import ks_statistic, ks_critical
+from sharded import ShardedSimulation
+from vector_simulation import VectorSimulation, ALIVE, INFECTED
+from virus import Virus
+from logger import Logger
+
+
+def outcome(sim):
+    return (sim.num_steps, sim.total_deaths, sim.total_infected, sim.saved_by_vaccination,
+            sim.total_interactions, sim.infected_and_alive)
+
+
+class TestShardedSimulation(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+
+    def test_workers_do_not_change_results(self):
+        results = []
+        for workers in (0, 1, 3):
+            with ShardedSimulation(self.virus, 5000, 0.2, 10, seed=4, workers=workers, num_shards=4) as sim:
+                while sim.step():
+                    pass
+                results.append((outcome(sim), sim.state.copy()))
+        for result, state in results[1:]:
+            self.assertEqual(result, results[0][0])
+            self.assertTrue(np.array_equal(state, results[0][1]))
+
+    def test_counters_match_population(self):
+        with ShardedSimulation(self.virus, 5000, 0.2, 10, seed=2, workers=2, num_shards=4) as sim:
+            for _ in range(3):
+                sim.step()
+                self.assertEqual(int(np.count_nonzero((sim.state & ALIVE) == 0)), sim.total_deaths)
+                self.assertEqual(len(sim.infected), sim.num_infected)
+                self.assertEqual(int(np.count_nonzero(sim.state & INFECTED)), sim.new_infections)
+                self.assertEqual(sim.healthy_counts.sum(),
+                                 np.count_nonzero((sim.state & (ALIVE | INFECTED)) == ALIVE))
+
+    def test_matches_single_process_distribution(self):
+        # First-step outcomes of the sharded and the single-process engine
+        sharded, single = [], []
+        for seed in range(200):
+            sim = ShardedSimulation(self.virus, 400, 0.3, 20, seed=seed, workers=0, num_shards=4)
+            sim.time_step()
+            sharded.append((sim.saved_by_vaccination, sim.new_infections, sim.total_deaths))
+            sim = VectorSimulation(self.virus, 400, 0.3, 20, seed=seed)
+            sim.time_step()
+            single.append((sim.saved_by_vaccination, sim.new_infections, sim.total_deaths))
+        sharded, single = np.array(sharded), np.array(single)
+        for column in range(3):
+            statistic = ks_statistic(sharded[:, column], single[:, column])
+            self.assertLess(statistic, ks_critical(len(sharded), len(single)))
+
+    def test_run_logs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with ShardedSimulation(self.virus, 2000, 0.1, 5, seed=1, workers=2) as sim:
+                sim.logger = Logger(os.path.join(directory, 'log.txt'))
+                sim.run()
+                with open(sim.logger.file_name) as file:
+                    log = file.read()
+        self.assertIn(f'The simulation has ended after {sim.num_steps} iterations', log)
+        self.assertIn(f'Total Deaths: {sim.total_deaths}', log)
+
+    def test_state_round_trip(self):
+        for workers in (0, 2):
+            with ShardedSimulation(self.virus, 5000, 0.2, 10, seed=5, workers=workers, num_shards=3) as sim:
+                sim.step()
+                state = sim.get_state()
+                expected = [sim.step() for _ in range(3)], outcome(sim), sim.state.copy()
+                sim.set_state(state)
+                self.assertEqual(outcome(sim)[0], 1)
+                result = [sim.step() for _ in range(3)], outcome(sim), sim.state.copy()
+                self.assertEqual(result[:2], expected[:2])
+                self.assertTrue(np.array_equal(result[2], expected[2]))
+
+        with ShardedSimulation(self.virus, 1000, 0.2, 10, seed=5, workers=0, num_shards=2) as other:
+            with self.assertRaises(ValueError):
+                other.set_state(state)
+
+    def test_close_stops_workers(self):
+        sim = ShardedSimulation(self.virus, 1000, 0.1, 5, seed=1, workers=2)
+        processes = [process for process, connection in sim._workers]
+        self.assertTrue(all(process.is_alive() for process in processes))
+        sim.close()
+        self.assertFalse(any(process.is_alive() for process in processes))
+
+
+if __name__ == '__main__':
+    unittest.main()
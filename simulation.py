@@ -1,10 +1,76 @@
+import pickle
 import random
+from collections import namedtuple
+import numpy as np
 from person import Person
+from population import Population, LazyPeople, ALIVE, VACCINATED, INFECTED
+from instrumentation import NULL_PROFILER
 from logger import Logger
+from rng import make_rng, seed_key
+from sampling import binomial, check_sampling
 from virus import Virus
 
+
+# Counters saved with the state of a simulation (see `get_state`)
+STATE_COUNTERS = (
+    'saved_by_vaccination', 'infected_and_alive', 'total_deaths', 'total_infected',
+    'new_infections', 'total_interactions', 'death_interactions', 'num_steps',
+    'next_person_id',
+)
+
+# Counters logged after every step, and kept as the series of a cached run
+STEP_SERIES = ('infected_and_alive', 'total_deaths', 'total_interactions')
+
+# Immutable view of the counters after a step, yielded by `iter_steps`
+StepSnapshot = namedtuple('StepSnapshot', (
+    'step', 'infected_and_alive', 'total_deaths', 'total_interactions', 'total_infected',
+    'new_infections', 'saved_by_vaccination', 'should_continue',
+))
+
+
+class IndexSet(object):
+    # Set of person ids with O(1) add, discard and indexing by position.
+    def __init__(self, ids=()):
+        self.ids = list(ids)
+        self.positions = dict(zip(self.ids, range(len(self.ids))))
+        if len(self.positions) != len(self.ids):
+            # Drop repeated ids, keeping their first position
+            ids, self.ids, self.positions = self.ids, [], {}
+            for _id in ids:
+                self.add(_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        return self.ids[position]
+
+    def __contains__(self, _id):
+        return _id in self.positions
+
+    def add(self, _id):
+        if _id not in self.positions:
+            self.positions[_id] = len(self.ids)
+            self.ids.append(_id)
+
+    def discard(self, _id):
+        # Move the last id into the freed slot
+        position = self.positions.pop(_id, None)
+        if position is None:
+            return
+        last = self.ids.pop()
+        if position < len(self.ids):
+            self.ids[position] = last
+            self.positions[last] = position
+
+
 class Simulation(object):
-    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1):
+    # Engine name a run is cached under (see `cache_params`)
+    engine = 'object'
+
+    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1, compact=False,
+                 log_buffer_size=None, series_writer=None, sampling='contact', rng=None,
+                 log_clock=None, graph=None, profiler=None, lazy=False):
         """
         Initialize the simulation with the virus, population size, vaccination percentage,
         and the number of initially infected people.
@@ -14,9 +80,60 @@ class Simulation(object):
         - virus: The virus object being used for the simulation.
         - vacc_percentage: Percentage of the population that is vaccinated.
         - initial_infected: Number of people initially infected with the virus.
+        - total_infected: Number of people ever infected, including the initial ones.
+        - new_infections: Number of people infected during the last step.
         - logger: Logs all events during the simulation.
+        - compact: Store the population in a packed `Population` container
+          instead of a list of `Person` objects.
+        - lazy: Without `compact`, hold the people in a `LazyPeople`
+          container that creates each `Person` the first time it is looked
+          up, instead of a list of all of them created up front. Off by
+          default, since the container is not a list (it cannot be
+          appended to or sliced); turn it on for large populations.
+        - log_buffer_size: When set, the logger keeps its file open and
+          writes in batches of this many characters (see `Logger`).
+        - series_writer: Optional `TimeSeriesWriter` that `run()` also records
+          the per-step counters to.
+        - sampling: How the contacts of each infected person are drawn.
+          'contact' runs `interaction` once per contact; 'aggregate' draws
+          the number of contacts with vaccinated people and the number of
+          transmissions as binomials, and only picks the infected targets.
+          Both have the same distribution of outcomes.
+        - rng: Random source for every draw of the simulation. By default the
+          global `random` module; an int or `SeedSequence` seeds a private
+          `RandomStream`, and any `random.Random` (e.g. a `NumpyRandom`) is
+          used as is. A seeded run is reproducible and independent of other
+          runs in the same process.
+        - log_clock: Optional clock for the logger's metadata date (see
+          `Logger`); with a fixed clock a seeded run writes identical logs.
+        - graph: Optional `ContactGraph` over the population (see network.py).
+          When set, each infected person interacts once per step with each
+          of their healthy neighbors instead of with 100 random people.
+        - profiler: Optional `Profiler` (see instrumentation.py) timing each
+          phase of every step. By default a no-op `NullProfiler`.
+        - observers: Callbacks run with the simulation after every step of
+          `iter_steps()` and `run()`, see `add_observer`.
+        - seed_key: Identity of the seed the run draws from (see
+          `rng.seed_key`), or None when the run is not reproducible.
+
+        The ids of the living people are also kept in three live indexes,
+        updated as their state changes, so a step never has to scan the
+        whole population:
+        - susceptible: `IndexSet` of people who are not vaccinated or infected.
+        - immune: `IndexSet` of people who are vaccinated or have recovered.
+        - infected: List of people who are currently infected.
         """
         self.pop_size = pop_size  
+        self.compact = compact
+        self.lazy = lazy
+        self.sampling = check_sampling(sampling)
+        self.seed_key = seed_key(rng)
+        self.rng = make_rng(rng)
+        if graph is not None and len(graph) != pop_size:
+            raise ValueError(f'The contact graph has {len(graph)} nodes for a population of {pop_size}')
+        self.graph = graph
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.observers = []
         self.saved_by_vaccination = 0
         self.next_person_id = 0  
         self.virus = virus  
@@ -24,31 +141,78 @@ class Simulation(object):
         self.vacc_percentage = vacc_percentage  
         self.infected_and_alive = 0  
         self.total_deaths = 0  
+        self.total_infected = initial_infected
+        self.new_infections = 0
         self.population = self._create_population()  
+        self._index_population()
         self.newly_infected = set()  
         self.dead_population = set() 
         self.total_interactions = 0
         self.death_interactions = 0
         self.num_steps = 0
-        self.logger = Logger(f"{self.virus.name}_simulation_pop_{self.pop_size}_vacc_pcnt_{self.vacc_percentage}")
+        self.series_writer = series_writer
+        self.logger = Logger(
+            f"{self.virus.name}_simulation_pop_{self.pop_size}_vacc_pcnt_{self.vacc_percentage}",
+            buffer_size=log_buffer_size
+        )
+        if log_clock is not None:
+            self.logger.clock = log_clock
 
     def _create_population(self):
         """
         Create the initial population for the simulation. 
-        - Some individuals are vaccinated based on `vacc_percentage`.
-        - Some individuals are infected based on `initial_infected`.
+        - The first `initial_infected` individuals are infected.
+        - `vacc_percentage` of the population, picked among the others,
+          is vaccinated.
+        The layout is sampled in bulk straight into packed flags, seeded
+        from `rng` so that the population is still reproducible, and then
+        kept packed (`compact`), handed out as people on first use (`lazy`)
+        or turned into a list of `Person` objects.
         """
         # Determine who will be vaccinated
         num_vaccinated = int(self.pop_size * self.vacc_percentage)
-        vaccinated_indices = set(random.sample(range(self.pop_size), num_vaccinated))
+
+        if self.compact:
+            population = Population(self.pop_size, self.virus)
+        else:
+            population = LazyPeople(self.pop_size, self.virus)
+        population.lay_out(np.random.default_rng(self.rng.getrandbits(64)), num_vaccinated, self.initial_infected)
+        if self.compact or self.lazy:
+            return population
 
         # Create the population with vaccinated and infected individuals
-        population = [
-            Person(i, is_vaccinated=(i in vaccinated_indices)) if i >= self.initial_infected
-            else Person(i, is_vaccinated=False, infection=self.virus)
-            for i in range(self.pop_size)
+        return [
+            Person(i, is_vaccinated=bool(flags & VACCINATED), infection=self.virus if flags & INFECTED else None)
+            for i, flags in enumerate(population.array().tolist())
         ]
-        return population
+
+    def _index_population(self):
+        """
+        Build the live susceptible/immune/infected indexes from the population.
+        """
+        if isinstance(self.population, Population):
+            # Straight from the packed flags
+            flags = self.population.array() & (ALIVE | VACCINATED | INFECTED)
+            self.susceptible = IndexSet(np.flatnonzero(flags == ALIVE).tolist())
+            self.immune = IndexSet(np.flatnonzero(flags == ALIVE | VACCINATED).tolist())
+            self.infected = np.flatnonzero((flags & (ALIVE | INFECTED)) == ALIVE | INFECTED).tolist()
+            return
+        self.susceptible = IndexSet()
+        self.immune = IndexSet()
+        self.infected = []
+        for person in self.population:
+            if not person.is_alive:
+                continue
+            if person.infection is not None:
+                self.infected.append(person._id)
+            elif person.is_vaccinated:
+                self.immune.add(person._id)
+            else:
+                self.susceptible.add(person._id)
+
+    @property
+    def num_dead(self):
+        return self.pop_size - len(self.susceptible) - len(self.immune) - len(self.infected)
 
     def _simulation_should_continue(self):
         """
@@ -56,52 +220,282 @@ class Simulation(object):
         The simulation ends if:
         - Everyone is either dead or immune (vaccinated).
         - No unvaccinated individuals are left alive in the population.
+        - Nobody is infected any more, so the virus can no longer spread
+          even if unvaccinated people are still alive.
         """
         if self.pop_size == self.total_deaths + self.infected_and_alive:
             return False
-        
-        for person in self.population:
-            if person.is_alive and not person.is_vaccinated:
-                return True
-        
-        return False
 
-    def run(self):
+        return len(self.infected) > 0
+
+    def run(self, checkpoint=None, cache=None, archive=None):
         """
         Run the simulation until it reaches an end condition.
         Log metadata, simulate each time step, and record the final outcomes.
+        With a `checkpoint` (see checkpoint.py) the state is saved
+        periodically so that an interrupted run can be resumed.
+        With a `cache` (a `ResultCache`, see cache.py) a seeded run that was
+        cached before is not simulated again: its counters are restored and
+        its log is written from the cached series, though the population is
+        left as it started. Runs with a checkpoint or a series writer are
+        never cached.
+        With an `archive` (a `RunArchive`, see archive.py) the finished
+        report is stored in it, so that the next run writing the same log
+        file does not lose it.
         """
         print(f"****Begin Simulation****\n Virus: {self.virus.name} | Initial Infected: {self.initial_infected}")
 
-        should_continue = True
+        key = None
+        if cache is not None and checkpoint is None and self.series_writer is None:
+            params = self.cache_params()
+            key = cache.key(params) if params is not None else None
+        if key is not None:
+            entry = cache.get(key)
+            if entry is not None:
+                self.replay(entry)
+                if archive is not None:
+                    archive.ingest_simulation(self)
+                return
+            series = {name: [] for name in STEP_SERIES}
 
-        # Log metadata for the simulation
-        self.logger.write_metadata(
-            self.pop_size, 
-            self.vacc_percentage, 
-            self.virus.name, 
-            self.virus.mortality_rate, 
-            self.virus.repro_rate,
-            self.initial_infected
-        )
-        self.num_steps = 0
+            def record(sim):
+                for name in STEP_SERIES:
+                    series[name].append(getattr(sim, name))
+            self.add_observer(record)
+
+        with self.logger:
+            # Log metadata for the simulation
+            with self.profiler.phase('write_metadata'):
+                self.logger.write_metadata(
+                    self.pop_size, 
+                    self.vacc_percentage, 
+                    self.virus.name, 
+                    self.virus.mortality_rate, 
+                    self.virus.repro_rate,
+                    self.initial_infected
+                )
+            self.num_steps = 0
+            if self.series_writer is not None:
+                self.series_writer.begin_run(
+                    virus_name=self.virus.name,
+                    repro_rate=self.virus.repro_rate,
+                    mortality_rate=self.virus.mortality_rate,
+                    pop_size=self.pop_size,
+                    vacc_percentage=self.vacc_percentage,
+                    initial_infected=self.initial_infected
+                )
+        self.continue_run(checkpoint=checkpoint)
+        if key is not None:
+            self.remove_observer(record)
+            cache.put(key, self.cache_entry(series))
+        if archive is not None:
+            archive.ingest_simulation(self)
+
+    def continue_run(self, should_continue=True, checkpoint=None):
+        """
+        Simulate and log the remaining steps of a run whose metadata has
+        already been logged, then record the final outcomes.
+        The log is appended to, so this also picks up a resumed run.
+        """
+        # The logger is closed (and flushed) even if a step raises
+        with self.logger:
+            # Loop through each step of the simulation
+            for snapshot in self.iter_steps(should_continue):
+                with self.profiler.phase('log'):
+                    self.logger.log_time_step(
+                        snapshot.infected_and_alive, 
+                        snapshot.total_deaths, 
+                        snapshot.total_interactions, 
+                        pop_size=self.pop_size, 
+                        step=snapshot.step,
+                        groups=self.group_breakdown()
+                    )
+                if self.series_writer is not None:
+                    with self.profiler.phase('series'):
+                        self.series_writer.record(self)
+                if checkpoint is not None:
+                    with self.profiler.phase('checkpoint'):
+                        checkpoint.after_step(self, snapshot.should_continue)
 
-        # Loop through each step of the simulation
+            if self.series_writer is not None:
+                self.series_writer.end_run()
+
+            # Log the final outcome of the simulation
+            print('Log simulation completed')
+            with self.profiler.phase('log_outcome'):
+                self.logger.log_simulation_outcome(self.num_steps, self.pop_size, self.total_deaths,
+                                                   self.saved_by_vaccination, groups=self.group_breakdown())
+
+    def group_breakdown(self):
+        """
+        Per-group rows for the step and outcome reports, or None when the
+        population is not stratified (see strata.py).
+        """
+        return None
+
+    def cache_params(self, max_steps=None):
+        """
+        Parameters that identify a run for a `ResultCache`: the virus, the
+        population, the engine and its settings, the seed and the cap on the
+        number of steps. None when the run cannot be cached because it is
+        not seeded or runs on a contact graph.
+        """
+        if self.seed_key is None or self.graph is not None:
+            return None
+        return {
+            'engine': self.engine,
+            'virus_name': self.virus.name,
+            'repro_rate': self.virus.repro_rate,
+            'mortality_rate': self.virus.mortality_rate,
+            'pop_size': self.pop_size,
+            'vacc_percentage': self.vacc_percentage,
+            'initial_infected': self.initial_infected,
+            'compact': self.compact,
+            'sampling': self.sampling,
+            'seed': self.seed_key,
+            'max_steps': max_steps,
+        }
+
+    def checkpoint_params(self):
+        """
+        Settings of the engine, besides the virus and population, that a
+        checkpoint records to build the simulation again (see checkpoint.py).
+        """
+        return {'compact': self.compact, 'lazy': self.lazy, 'sampling': self.sampling}
+
+    def cache_entry(self, series):
+        # Cache entry of a finished run: its counters and per-step series
+        return {
+            'counters': {name: int(getattr(self, name)) for name in STATE_COUNTERS},
+            'series': {name: [int(value) for value in series[name]] for name in STEP_SERIES},
+        }
+
+    def replay(self, entry):
+        """
+        Restore the counters of a cached run and write its log, as `run()`
+        would have, without simulating it.
+        """
+        with self.logger:
+            self.logger.write_metadata(
+                self.pop_size,
+                self.vacc_percentage,
+                self.virus.name,
+                self.virus.mortality_rate,
+                self.virus.repro_rate,
+                self.initial_infected
+            )
+            series = entry['series']
+            for step, (infected_and_alive, total_deaths, total_interactions) in enumerate(
+                    zip(*(series[name] for name in STEP_SERIES)), 1):
+                self.logger.log_time_step(
+                    infected_and_alive,
+                    total_deaths,
+                    total_interactions,
+                    pop_size=self.pop_size,
+                    step=step
+                )
+            for name, value in entry['counters'].items():
+                setattr(self, name, value)
+            print('Log simulation completed')
+            self.logger.log_simulation_outcome(self.num_steps, self.pop_size, self.total_deaths, self.saved_by_vaccination)
+
+    def iter_steps(self, should_continue=True):
+        """
+        Lazily advance the simulation until it reaches an end condition,
+        yielding a `StepSnapshot` of the counters after every step.
+        Nothing is logged, so a consumer can stream, downsample or stop
+        early (by breaking out of the loop) for the cost of the steps alone;
+        iterating again continues from where it stopped. `run()` is this
+        loop plus logging. The profiler's step ends, and the observers are
+        called, when the consumer asks for the next step.
+        """
         while should_continue:
-            self.time_step()
-            should_continue = self._simulation_should_continue()
-            self.num_steps += 1
-            self.logger.log_time_step(
-                self.infected_and_alive, 
-                self.total_deaths, 
-                self.total_interactions, 
-                pop_size=self.pop_size, 
-                step=self.num_steps
+            self.profiler.begin_step(self)
+            should_continue = self.step()
+            try:
+                yield self.snapshot(should_continue)
+            finally:
+                self.profiler.end_step(self)
+            for observer in self.observers:
+                observer(self)
+
+    def snapshot(self, should_continue=True):
+        return StepSnapshot(
+            self.num_steps, self.infected_and_alive, self.total_deaths, self.total_interactions,
+            self.total_infected, self.new_infections, self.saved_by_vaccination, should_continue
+        )
+
+    def add_observer(self, observer):
+        """
+        Register `observer(simulation)` to be called after every step of
+        `iter_steps()`, and so of `run()` once the step is logged. Returns
+        the observer, so that it can later be passed to `remove_observer`.
+        """
+        self.observers.append(observer)
+        return observer
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def get_state(self):
+        """
+        Return everything that changes as the simulation runs, as a dict:
+        - flags: uint8 array of ALIVE/VACCINATED/INFECTED flags per person.
+        - susceptible, immune, infected: int64 arrays of the live indexes,
+          in order, since contacts are drawn by position in them.
+        - counters: int64 array of the STATE_COUNTERS values.
+        - rng: Pickled state of the random source.
+        Only valid between steps, when `newly_infected` is empty.
+        """
+        if isinstance(self.population, Population):
+            flags = self.population.array().copy()
+        else:
+            flags = np.fromiter(
+                (ALIVE * person.is_alive | VACCINATED * bool(person.is_vaccinated)
+                 | INFECTED * (person.infection is not None) for person in self.population),
+                dtype=np.uint8, count=self.pop_size
             )
+        return {
+            'flags': flags,
+            'susceptible': np.array(self.susceptible.ids, dtype=np.int64),
+            'immune': np.array(self.immune.ids, dtype=np.int64),
+            'infected': np.fromiter(self.infected, dtype=np.int64, count=len(self.infected)),
+            'counters': np.array([getattr(self, name) for name in STATE_COUNTERS], dtype=np.int64),
+            'rng': _pickle_rng(self.rng),
+        }
 
-        # Log the final outcome of the simulation
-        print('Log simulation completed')
-        self.logger.log_simulation_outcome(self.num_steps, self.pop_size, self.total_deaths, self.saved_by_vaccination)
+    def set_state(self, state):
+        # Restore a state returned by `get_state`
+        flags = state['flags']
+        if isinstance(self.population, LazyPeople):
+            self.population.reset(flags)
+        elif self.compact:
+            self.population.array()[:] = flags
+        else:
+            for person, person_flags in zip(self.population, flags.tolist()):
+                person.is_alive = bool(person_flags & ALIVE)
+                person.is_vaccinated = bool(person_flags & VACCINATED)
+                person.infection = self.virus if person_flags & INFECTED else None
+        self.susceptible = IndexSet(state['susceptible'].tolist())
+        self.immune = IndexSet(state['immune'].tolist())
+        self.infected = state['infected'].tolist()
+        self.dead_population = {self.population[_id] for _id in np.flatnonzero((flags & ALIVE) == 0).tolist()}
+        self.newly_infected = set()
+        for name, value in zip(STATE_COUNTERS, state['counters'].tolist()):
+            setattr(self, name, value)
+        self.rng = _unpickle_rng(state['rng'])
+
+    def step(self):
+        """
+        Advance the simulation by one time step and count it.
+        Returns whether the simulation should continue afterwards.
+        """
+        with self.profiler.phase('time_step'):
+            self.time_step()
+        with self.profiler.phase('should_continue'):
+            should_continue = self._simulation_should_continue()
+        self.num_steps += 1
+        return should_continue
 
     def time_step(self):
         """
@@ -109,30 +503,43 @@ class Simulation(object):
         update the status of infected individuals, and count deaths or new infections.
         """
         newly_dead = 0
-        # List of healthy, non-infected people who are alive
-        healthy_population = [p for p in self.population if p.is_alive and p.infection is None] 
-        
-        # Handle interactions for infected individuals
-        for infected_person in (p for p in self.population if p.is_alive and p.infection):
-            interactions = 0
-            while interactions < 100 and healthy_population:
-                random_person = random.choice(healthy_population)
-                self.interaction(infected_person, random_person)
-                self.total_interactions += 1
-                interactions += 1
-
-            # Check if the infected person survives the infection
-            if infected_person.did_survive_infection():
-                self.infected_and_alive -= 1
-            else:
-                if infected_person not in self.dead_population:
-                    self.dead_population.add(infected_person)
-                    self.total_deaths += 1
+        # Healthy, non-infected people who are alive: the susceptible and
+        # immune indexes, which stay fixed until the end of the step
+        num_susceptible = len(self.susceptible)
+        num_healthy = num_susceptible + len(self.immune)
+        recovered = []
+
+        # Handle interactions for infected individuals (the survival checks
+        # are timed with them, since they happen person by person)
+        infected_ids = self.infected
+        self.infected = []
+        with self.profiler.phase('interactions'):
+            for _id in infected_ids:
+                infected_person = self.population[_id]
+                if self.graph is not None:
+                    self._network_interactions(infected_person)
+                elif self.sampling == 'aggregate':
+                    if num_healthy:
+                        self._aggregate_interactions(num_susceptible, num_healthy)
+                else:
+                    self._random_interactions(infected_person, num_susceptible, num_healthy)
+
+                # Check if the infected person survives the infection
+                if infected_person.did_survive_infection(self.rng):
                     self.infected_and_alive -= 1
-                    newly_dead += 1
+                    recovered.append(_id)
+                else:
+                    if infected_person not in self.dead_population:
+                        self.dead_population.add(infected_person)
+                        self.total_deaths += 1
+                        self.infected_and_alive -= 1
+                        newly_dead += 1
 
+        for _id in recovered:
+            self.immune.add(_id)
         self.death_interactions += newly_dead
-        self._infect_newly_infected()
+        with self.profiler.phase('infect_newly_infected'):
+            self._infect_newly_infected()
 
     def interaction(self, infected_person, random_person):
         """
@@ -144,20 +551,91 @@ class Simulation(object):
             if random_person.is_vaccinated:
                 self.saved_by_vaccination +=1
             return
-        if random.random() < self.virus.repro_rate:
+        if self.rng.random() < self.virus.repro_rate:
             if random_person._id not in self.newly_infected:
                 self.newly_infected.add(random_person)
 
+    def _random_interactions(self, infected_person, num_susceptible, num_healthy):
+        # Up to 100 interactions with uniformly random healthy people
+        interactions = 0
+        while interactions < 100 and num_healthy:
+            position = self.rng.randrange(num_healthy)
+            if position < num_susceptible:
+                random_person = self.population[self.susceptible[position]]
+            else:
+                random_person = self.population[self.immune[position - num_susceptible]]
+            self.interaction(infected_person, random_person)
+            self.total_interactions += 1
+            interactions += 1
+
+    def _network_interactions(self, infected_person):
+        """
+        Interact once with every healthy neighbor of `infected_person` in
+        `graph`. Dead and infected neighbors are skipped, just as random
+        contacts are only drawn among the healthy. In aggregate sampling the
+        number of transmissions is binomial and only the infected neighbors
+        are picked.
+        """
+        neighbors = [
+            _id for _id in self.graph.neighbors_of(infected_person._id).tolist()
+            if _id in self.susceptible or _id in self.immune
+        ]
+        self.total_interactions += len(neighbors)
+        if self.sampling == 'aggregate':
+            susceptible = [_id for _id in neighbors if _id in self.susceptible]
+            self.saved_by_vaccination += len(neighbors) - len(susceptible)
+            transmitted = binomial(len(susceptible), self.virus.repro_rate, self.rng.random)
+            for _id in self.rng.sample(susceptible, transmitted):
+                self.newly_infected.add(self.population[_id])
+            return
+        for _id in neighbors:
+            self.interaction(infected_person, self.population[_id])
+
+    def _aggregate_interactions(self, num_susceptible, num_healthy):
+        """
+        Draw the 100 interactions of one infected person in aggregate.
+        Each contact hits a vaccinated person with probability
+        immune / healthy, and each of the remaining contacts transmits with
+        probability `repro_rate`, so both counts are binomial; only the
+        people who were infected are then picked among the susceptible.
+        """
+        self.total_interactions += 100
+        protected = binomial(100, (num_healthy - num_susceptible) / num_healthy, self.rng.random)
+        self.saved_by_vaccination += protected
+        transmitted = binomial(100 - protected, self.virus.repro_rate, self.rng.random)
+        for _ in range(transmitted):
+            random_person = self.population[self.susceptible[self.rng.randrange(num_susceptible)]]
+            self.newly_infected.add(random_person)
+
     def _infect_newly_infected(self):
         """
         Infect individuals who were marked as newly infected during the time step.
         Clear the `newly_infected` list for the next step.
         """
+        self.new_infections = len(self.newly_infected)
         for person in self.newly_infected:
             person.infection = self.virus
             self.infected_and_alive += 1
+            self.total_infected += 1
+            self.susceptible.discard(person._id)
+            self.infected.append(person._id)
         self.newly_infected.clear()
 
+def _pickle_rng(rng):
+    # The global `random` module is saved by its state
+    if rng is random:
+        return np.frombuffer(pickle.dumps(('global', random.getstate())), dtype=np.uint8)
+    return np.frombuffer(pickle.dumps(('object', rng)), dtype=np.uint8)
+
+
+def _unpickle_rng(data):
+    kind, value = pickle.loads(np.asarray(data, dtype=np.uint8).tobytes())
+    if kind == 'global':
+        random.setstate(value)
+        return random
+    return value
+
+
 if __name__ == "__main__":
     # Virus details
     virus_name = "Sniffles"
@@ -43,6 +43,43 @@ class TestSimulation(unittest.TestCase):
         )
         self.assertEqual(infected_count, self.initial_infected)
 
+    def test_compact_population(self):
+        # The compact container hands out Person-like views
+        simulation = Simulation(self.virus, self.pop_size, self.vacc_percentage,
+                                self.initial_infected, compact=True)
+        self.assertEqual(len(simulation.population), self.pop_size)
+
+        infected_count = sum(
+            1 for person in simulation.population if person.infection is not None
+        )
+        self.assertEqual(infected_count, self.initial_infected)
+        self.assertIs(simulation.population[0].infection, self.virus)
+
+        person = simulation.population[self.pop_size - 1]
+        self.assertTrue(person.is_alive)
+        person.is_alive = False
+        self.assertFalse(simulation.population[self.pop_size - 1].is_alive)
+
+    def test_lazy_population(self):
+        # People are only created on first lookup, and the layout is the same
+        # with or without lazy people
+        lazy = Simulation(self.virus, 1000, 0.3, 10, rng=1, lazy=True)
+        eager = Simulation(self.virus, 1000, 0.3, 10, rng=1)
+        # The default is still a plain list of people
+        self.assertIsInstance(eager.population, list)
+        self.assertEqual(len(lazy.population.people), 0)
+        self.assertIs(lazy.population[5], lazy.population[5])
+        self.assertEqual(len(lazy.population.people), 1)
+        self.assertEqual([(person.is_vaccinated, person.infection) for person in lazy.population],
+                         [(person.is_vaccinated, person.infection) for person in eager.population])
+        self.assertEqual(sum(person.is_vaccinated for person in eager.population), 300)
+        self.assertFalse(any(person.is_vaccinated for person in eager.population[:10]))
+
+        lazy.run()
+        eager.run()
+        self.assertEqual((lazy.num_steps, lazy.total_deaths, lazy.total_infected),
+                         (eager.num_steps, eager.total_deaths, eager.total_infected))
+
     def test_interactions(self):
         # Test the interactions between infected and healthy people
         # We simulate the behavior by directly interacting healthy and infected people
@@ -95,6 +132,19 @@ class TestSimulation(unittest.TestCase):
         # Expect False since everyone is either infected or dead
         self.assertFalse(should_continue)  
 
+    def test_live_indexes_match_population(self):
+        # The live indexes follow every state change made during a step
+        simulation = Simulation(Virus("Test", 0.3, 0.2), 200, 0.2, 5)
+        while simulation.step():
+            susceptible = {p._id for p in simulation.population
+                           if p.is_alive and not p.is_vaccinated and p.infection is None}
+            immune = {p._id for p in simulation.population if p.is_alive and p.is_vaccinated}
+            infected = {p._id for p in simulation.population if p.is_alive and p.infection is not None}
+            self.assertEqual(set(simulation.susceptible.ids), susceptible)
+            self.assertEqual(set(simulation.immune.ids), immune)
+            self.assertEqual(set(simulation.infected), infected)
+            self.assertEqual(simulation.num_dead, simulation.total_deaths)
+
     def test_run_simulation(self):
         # Run the simulation
         self.simulation.num_steps = 0
@@ -109,6 +159,35 @@ class TestSimulation(unittest.TestCase):
         # At least one step should have run
         self.assertGreater(self.simulation.num_steps, 0)  
 
+    def test_iter_steps(self):
+        simulation = Simulation(Virus("Test", 0.05, 0.12), 500, 0.1, 5, rng=3)
+        steps = simulation.iter_steps()
+        first = next(steps)
+        self.assertEqual(first.step, 1)
+        self.assertEqual(first.total_deaths, simulation.total_deaths)
+        with self.assertRaises(AttributeError):
+            first.total_deaths = 0
+
+        # Stopping early leaves the simulation where it was
+        steps.close()
+        self.assertEqual(simulation.num_steps, 1)
+
+        # Iterating again continues the run, and ends with its last step
+        snapshots = list(simulation.iter_steps())
+        self.assertEqual([snapshot.step for snapshot in snapshots], list(range(2, simulation.num_steps + 1)))
+        self.assertFalse(snapshots[-1].should_continue)
+        self.assertEqual(snapshots[-1], simulation.snapshot(False))
+
+    def test_run_logs_iter_steps(self):
+        # A run logs exactly the steps iter_steps yields for the same seed
+        virus = Virus("Test", 0.05, 0.12)
+        snapshots = list(Simulation(virus, 500, 0.1, 5, rng=7).iter_steps())
+        simulation = Simulation(virus, 500, 0.1, 5, rng=7)
+        logged = []
+        simulation.logger.log_time_step = lambda *counters, **kwargs: logged.append((kwargs['step'],) + counters)
+        simulation.run()
+        self.assertEqual(logged, [snapshot[:4] for snapshot in snapshots])
+
     def test_infected_and_alive_not_negative(self):
         # Check that infected_and_alive does not go below zero
         self.simulation.infected_and_alive = 0
@@ -0,0 +1,232 @@
+import numpy as np
+from population import ALIVE, VACCINATED, INFECTED
+from vector_simulation import VectorSimulation, CONTACT_CHUNK
+from virus import Virus
+
+# Per-group counters, saved with the state and reported by the `Logger`
+GROUP_COUNTERS = ('group_total_infected', 'group_deaths', 'group_saved')
+
+
+class Group(object):
+    def __init__(self, name, share, mortality=1.0, susceptibility=1.0, contacts=100):
+        """
+        One age band or risk group of a stratified population.
+
+        Attributes:
+        - name: Name of the group in the reports.
+        - share: Fraction of the population in the group.
+        - mortality: Multiplier of the virus's `mortality_rate` for the
+          group (the product is capped at 1).
+        - susceptibility: Multiplier of the virus's `repro_rate` for a
+          contact with someone in the group (capped at 1 as well).
+        - contacts: Contacts an infected person in the group makes per step,
+          100 as in the other engines by default.
+        """
+        if share < 0 or mortality < 0 or susceptibility < 0 or contacts < 0:
+            raise ValueError(f'Group {name!r} has a negative share, rate or contact count')
+        self.name = name
+        self.share = share
+        self.mortality = mortality
+        self.susceptibility = susceptibility
+        self.contacts = int(contacts)
+
+
+class Strata(object):
+    # Most groups a population can be split into: the group index is a uint8
+    MAX_GROUPS = 256
+
+    def __init__(self, groups):
+        """
+        Split of a population into groups (see `Group`), whose shares add
+        up to 1.
+        """
+        self.groups = list(groups)
+        if not 0 < len(self.groups) <= self.MAX_GROUPS:
+            raise ValueError(f'Expected between 1 and {self.MAX_GROUPS} groups')
+        names = [group.name for group in self.groups]
+        if len(set(names)) != len(names):
+            raise ValueError('Group names must be unique')
+        if not np.isclose(sum(group.share for group in self.groups), 1.0):
+            raise ValueError('Group shares must add up to 1')
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    @property
+    def names(self):
+        return [group.name for group in self.groups]
+
+    def sizes(self, pop_size):
+        """
+        Number of people in each group: the shares of `pop_size`, rounded
+        so that they add up to it (largest remainders first).
+        """
+        exact = np.array([group.share for group in self.groups]) * pop_size
+        sizes = np.floor(exact).astype(np.int64)
+        remainders = np.argsort(sizes - exact, kind='stable')
+        sizes[remainders[:pop_size - int(sizes.sum())]] += 1
+        return sizes
+
+    def assign(self, rng, pop_size):
+        # uint8 array of the group index of every person, in random order
+        group = np.repeat(np.arange(len(self.groups), dtype=np.uint8), self.sizes(pop_size))
+        rng.shuffle(group)
+        return group
+
+    def tables(self, virus):
+        """
+        Per-group lookup tables of the rates of `virus`:
+        (mortality rates, transmission rates, contacts per step).
+        """
+        mortality = np.array([min(1.0, virus.mortality_rate * group.mortality) for group in self.groups])
+        transmission = np.array([min(1.0, virus.repro_rate * group.susceptibility) for group in self.groups])
+        contacts = np.array([group.contacts for group in self.groups], dtype=np.int64)
+        return mortality, transmission, contacts
+
+
+class StratifiedSimulation(VectorSimulation):
+    engine = 'stratified'
+
+    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1, strata=None, seed=None,
+                 log_buffer_size=None, series_writer=None, rng=None, log_clock=None, profiler=None):
+        """
+        Version of `VectorSimulation` where the population is split into
+        age bands or risk groups (see `Strata`) with their own mortality,
+        susceptibility and contact rates.
+
+        Every person carries a one-byte group index, assigned at random in
+        the groups' proportions, and the rates of the groups are looked up
+        in per-group tables, so the steps stay batched NumPy operations:
+        - An infected person makes their group's number of contacts with
+          uniformly random healthy people.
+        - A contact with an unvaccinated person transmits with the virus's
+          `repro_rate` times the susceptibility of the target's group.
+        - The infected die with the virus's `mortality_rate` times the
+          mortality of their group.
+        Without `strata` everybody is in one group with the virus's rates,
+        which is the `VectorSimulation` model.
+
+        The step and outcome reports carry a per-group breakdown (see
+        `group_breakdown`). Runs are not cached, since the cached series
+        have no breakdown.
+
+        Attributes (in addition to those of `VectorSimulation`):
+        - strata: The `Strata`.
+        - group: uint8 array of the group index of every person.
+        - mortality_rates, transmission_rates, contacts: The lookup tables.
+        - group_sizes: Number of people in every group.
+        - group_total_infected, group_deaths, group_saved: Per-group arrays
+          of the matching counters (`saved_by_vaccination` is counted in
+          the group of the vaccinated person).
+        """
+        self.strata = strata if strata is not None else Strata([Group('all', 1.0)])
+        self.mortality_rates, self.transmission_rates, self.contacts = self.strata.tables(virus)
+        super().__init__(virus, pop_size, vacc_percentage, initial_infected, seed=seed,
+                         log_buffer_size=log_buffer_size, series_writer=series_writer, rng=rng,
+                         log_clock=log_clock, profiler=profiler)
+
+    def _create_population(self):
+        population = super()._create_population()
+        self.group = self.strata.assign(self.rng, self.pop_size)
+        self.group_sizes = np.bincount(self.group, minlength=len(self.strata))
+        return population
+
+    def _index_population(self):
+        super()._index_population()
+        count = len(self.strata)
+        self.group_total_infected = np.bincount(self.group[self.infected], minlength=count)
+        self.group_deaths = np.zeros(count, dtype=np.int64)
+        self.group_saved = np.zeros(count, dtype=np.int64)
+
+    def cache_params(self, max_steps=None):
+        return None
+
+    def checkpoint_params(self):
+        params = super().checkpoint_params()
+        params['groups'] = [[group.name, group.share, group.mortality, group.susceptibility, group.contacts]
+                            for group in self.strata]
+        return params
+
+    def group_breakdown(self):
+        # (name, size, infected, total infected, deaths) of every group
+        infected = np.bincount(self.group[self.infected], minlength=len(self.strata))
+        return list(zip(self.strata.names, self.group_sizes.tolist(), infected.tolist(),
+                        self.group_total_infected.tolist(), self.group_deaths.tolist()))
+
+    def time_step(self):
+        """
+        Simulate one step in time, looking up every person's rates in the
+        tables of their group.
+        """
+        infected_population = self.infected
+        groups = self.group[infected_population]
+
+        newly_infected = []
+        with self.profiler.phase('healthy_population'):
+            healthy_population = np.flatnonzero((self.state & (ALIVE | INFECTED)) == ALIVE)
+        if len(healthy_population):
+            num_contacts = int(self.contacts[groups].sum())
+            self.total_interactions += num_contacts
+            with self.profiler.phase('interactions'):
+                while num_contacts > 0:
+                    batch = min(num_contacts, CONTACT_CHUNK)
+                    newly_infected.append(self._draw_contacts(healthy_population, batch))
+                    num_contacts -= batch
+
+        # Resolve whether the infected people survive their infection
+        with self.profiler.phase('survival'):
+            died = self.rng.random(len(infected_population)) < self.mortality_rates[groups]
+            newly_dead = int(np.count_nonzero(died))
+            self.state[infected_population[died]] = 0
+            self.state[infected_population[~died]] = ALIVE | VACCINATED
+            self.group_deaths += np.bincount(groups[died], minlength=len(self.strata))
+        self.infected_and_alive -= len(infected_population)
+        self.total_deaths += newly_dead
+        self.death_interactions += newly_dead
+
+        with self.profiler.phase('infect_newly_infected'):
+            if newly_infected:
+                self.newly_infected = np.unique(np.concatenate(newly_infected))
+            self._infect_newly_infected()
+            self.group_total_infected += np.bincount(self.group[self.infected], minlength=len(self.strata))
+
+    def _draw_contacts(self, healthy_population, num_contacts):
+        """
+        Draw `num_contacts` interactions with random healthy people, each
+        transmitting with the transmission rate of the target's group.
+        Returns the indices of the people who were infected.
+        """
+        targets = healthy_population[self.rng.integers(0, len(healthy_population), num_contacts)]
+        protected = (self.state[targets] & VACCINATED).astype(bool)
+        self.saved_by_vaccination += int(np.count_nonzero(protected))
+        self.group_saved += np.bincount(self.group[targets[protected]], minlength=len(self.strata))
+        exposed = targets[~protected]
+        return exposed[self.rng.random(len(exposed)) < self.transmission_rates[self.group[exposed]]]
+
+    def get_state(self):
+        state = super().get_state()
+        state['group'] = self.group.copy()
+        state['group_counters'] = np.array([getattr(self, name) for name in GROUP_COUNTERS])
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.group = state['group'].copy()
+        for name, values in zip(GROUP_COUNTERS, state['group_counters']):
+            setattr(self, name, values.copy())
+
+
+if __name__ == "__main__":
+    # Age bands with rising mortality, and fewer contacts for the oldest
+    strata = Strata([
+        Group('0-19', 0.25, mortality=0.1, susceptibility=0.8, contacts=120),
+        Group('20-64', 0.6),
+        Group('65+', 0.15, mortality=5.0, susceptibility=1.2, contacts=60),
+    ])
+    sim = StratifiedSimulation(Virus("Sniffles", 0.5, 0.12), 1000000, 0.1, 10, strata=strata, seed=1)
+    sim.run()
+    for name, size, infected, total_infected, deaths in sim.group_breakdown():
+        print(f"{name}: {total_infected} infected, {deaths} deaths out of {size}")
@@ -0,0 +1,89 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from sampling_test import ks_statistic, ks_critical
+from logger import Logger
+from population import ALIVE
+from strata import Group, Strata, StratifiedSimulation
+from vector_simulation import VectorSimulation
+from virus import Virus
+
+
+class TestStrata(unittest.TestCase):
+    def test_strata(self):
+        strata = Strata([Group('young', 0.3, mortality=0.5, contacts=150), Group('old', 0.7, mortality=20)])
+        self.assertEqual(strata.names, ['young', 'old'])
+        self.assertEqual(strata.sizes(11).tolist(), [3, 8])
+        self.assertEqual(np.bincount(strata.assign(np.random.default_rng(0), 1000)).tolist(), [300, 700])
+        mortality, transmission, contacts = strata.tables(Virus("Test", 0.5, 0.1))
+        self.assertEqual(mortality.tolist(), [0.05, 1.0])
+        self.assertEqual(transmission.tolist(), [0.5, 0.5])
+        self.assertEqual(contacts.tolist(), [150, 100])
+
+        with self.assertRaises(ValueError):
+            Strata([Group('a', 0.5), Group('b', 0.4)])
+        with self.assertRaises(ValueError):
+            Strata([Group('a', 0.5), Group('a', 0.5)])
+        with self.assertRaises(ValueError):
+            Group('a', 0.5, susceptibility=-1)
+
+
+class TestStratifiedSimulation(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.05, 0.12)
+        self.strata = Strata([
+            Group('children', 0.3, mortality=0.1, susceptibility=0.5, contacts=150),
+            Group('adults', 0.5),
+            Group('elderly', 0.2, mortality=4.0, contacts=50),
+        ])
+
+    def test_single_group_matches_vector_engine(self):
+        stratified, single = [], []
+        for seed in range(100):
+            for sim, outcomes in ((StratifiedSimulation(self.virus, 1000, 0.2, 10, seed=seed), stratified),
+                                  (VectorSimulation(self.virus, 1000, 0.2, 10, seed=seed), single)):
+                while sim.step():
+                    pass
+                outcomes.append((sim.total_infected, sim.total_deaths, sim.saved_by_vaccination))
+        stratified, single = np.array(stratified), np.array(single)
+        for column in range(3):
+            self.assertLess(ks_statistic(stratified[:, column], single[:, column]), ks_critical(100, 100))
+
+    def test_group_counters(self):
+        sim = StratifiedSimulation(self.virus, 20000, 0.1, 20, strata=self.strata, seed=1)
+        for snapshot in sim.iter_steps():
+            self.assertEqual(int(sim.group_deaths.sum()), snapshot.total_deaths)
+            self.assertEqual(int(sim.group_total_infected.sum()), snapshot.total_infected)
+            self.assertEqual(int(sim.group_saved.sum()), snapshot.saved_by_vaccination)
+        for index, group in enumerate(self.strata):
+            dead = np.count_nonzero((sim.state[sim.group == index] & ALIVE) == 0)
+            self.assertEqual(sim.group_deaths[index], dead)
+
+        # Every group dies at its own rate
+        rates = sim.group_deaths / sim.group_total_infected
+        self.assertTrue(np.allclose(rates, [0.012, 0.12, 0.48], atol=0.03), rates)
+
+    def test_state_round_trip(self):
+        sim = StratifiedSimulation(self.virus, 2000, 0.1, 10, strata=self.strata, seed=2)
+        sim.step()
+        state = sim.get_state()
+        expected = [sim.step() for _ in range(3)], sim.group_deaths.tolist()
+        sim.set_state(state)
+        self.assertEqual(([sim.step() for _ in range(3)], sim.group_deaths.tolist()), expected)
+
+    def test_run_logs_breakdown(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sim = StratifiedSimulation(self.virus, 1000, 0.1, 5, strata=self.strata, seed=3)
+            sim.logger = Logger(os.path.join(directory, 'log.txt'))
+            sim.run()
+            with open(sim.logger.file_name) as file:
+                log = file.read()
+        name, size, infected, total_infected, deaths = sim.group_breakdown()[2]
+        self.assertIn(f'  elderly: Infected 0, Total Deaths {deaths}\n', log)
+        self.assertIn(f'elderly: Population {size}, Total Infected {total_infected}, Total Deaths {deaths}', log)
+        self.assertIn(f'Total Deaths: {sim.total_deaths}', log)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import numpy as np
+from ensemble import run_ensemble
+from simulation import STEP_SERIES
+from sweep import GRID_PARAMETERS, load_spec, cell_seed, cell_key
+from virus import Virus
+
+# Contacts an infected person makes during their step, as in `Simulation`
+CONTACTS = 100
+
+# Longest epidemic the surrogate follows
+MAX_STEPS = 1000
+
+# Largest error, relative to the peak of the ensemble mean, at which a
+# series of the surrogate is trusted
+TOLERANCE = 0.1
+
+# Series the surrogate tracks: the step counters plus the final outcomes
+SURROGATE_SERIES = STEP_SERIES + ('total_infected', 'saved_by_vaccination')
+
+
+def mean_field_step(susceptible, immune, infected, repro_rate, mortality_rate, contacts=CONTACTS):
+    """
+    Expected outcome of one step of the stepped engines, from the number of
+    `susceptible`, `immune` (vaccinated or recovered) and `infected` people.
+    Works on floats or on broadcastable arrays.
+
+    Every infected person makes `contacts` contacts with uniformly random
+    healthy people: the share immune / healthy of them are saved by
+    vaccination, the others transmit with `repro_rate`, and the expected
+    number of distinct people reached by T transmissions among S
+    susceptible is S * (1 - exp(-T / S)). Then the infected die with
+    `mortality_rate` or become immune.
+    Returns (new infections, deaths, saved by vaccination, interactions).
+    """
+    healthy = susceptible + immune
+    active = (healthy > 0) & (infected > 0)
+    share = np.divide(susceptible, healthy, out=np.zeros_like(healthy * 1.0), where=healthy > 0)
+    interactions = np.where(active, contacts * infected, 0.0)
+    transmissions = interactions * share * repro_rate
+    ratio = np.divide(transmissions, susceptible, out=np.zeros_like(transmissions), where=susceptible > 0)
+    new = -susceptible * np.expm1(-ratio)
+    return new, infected * mortality_rate, interactions * (1 - share), interactions
+
+
+class SurrogateResult(object):
+    def __init__(self, repro_rate, mortality_rate, vacc_percentage, pop_size, initial_infected, series, steps):
+        """
+        Per-step curves of the mean-field surrogate over a grid of parameters.
+
+        Attributes:
+        - repro_rate, mortality_rate, vacc_percentage: Arrays of the
+          parameters of every cell, all of the grid's shape.
+        - pop_size, initial_infected: Shared by every cell.
+        - series: dict of name (see SURROGATE_SERIES) -> array of shape
+          (steps, *grid shape) of the expected counter after every step.
+          Like the engines' `infected_and_alive`, the first series starts
+          at 0 rather than at `initial_infected`, and cells whose epidemic
+          ended early keep their final values.
+        - steps: Array of the number of steps of every cell's epidemic.
+          The series only cover each cell's steps when they were kept (see
+          `mean_field`); `final()` works either way.
+        """
+        self.repro_rate = repro_rate
+        self.mortality_rate = mortality_rate
+        self.vacc_percentage = vacc_percentage
+        self.pop_size = pop_size
+        self.initial_infected = initial_infected
+        self.series = series
+        self.steps = steps
+
+    @property
+    def shape(self):
+        return self.repro_rate.shape
+
+    def final(self, name):
+        # Value of series `name` at the end of every cell's epidemic
+        return self.series[name][-1]
+
+    def cell(self, index):
+        # The series of one cell, cut at the end of its epidemic
+        index = index if isinstance(index, tuple) else (index,)
+        steps = int(self.steps[index])
+        return {name: values[(slice(0, steps),) + index] for name, values in self.series.items()}
+
+
+def mean_field(repro_rate, mortality_rate, vacc_percentage, pop_size, initial_infected=1,
+               max_steps=MAX_STEPS, keep_series=True):
+    """
+    Deterministic susceptible/infected/immune/dead version of the stepped
+    engines: iterate `mean_field_step` from the engines' initial layout
+    until nobody is infected (fewer than half a person) or for `max_steps`.
+    The parameters are broadcast together, so one call evaluates a whole
+    grid of cells at once; each step only works on the cells whose
+    epidemic is still going. Without `keep_series` only the final values
+    are kept, as a single step of the series.
+    Returns a `SurrogateResult`.
+    """
+    repro_rate, mortality_rate, vacc_percentage = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (repro_rate, mortality_rate, vacc_percentage)))
+    shape = repro_rate.shape
+    repro, mortality = repro_rate.ravel(), mortality_rate.ravel()
+    initial = float(min(initial_infected, pop_size))
+    infected = np.full(repro.shape, initial)
+    immune = np.minimum(np.floor(pop_size * vacc_percentage.ravel()), pop_size - infected)
+    susceptible = pop_size - infected - immune
+    totals = {name: np.zeros(repro.shape) for name in SURROGATE_SERIES}
+    totals['total_infected'] += infected
+    totals['infected_and_alive'] -= initial
+    series = {name: [] for name in SURROGATE_SERIES}
+    steps = np.zeros(repro.shape, dtype=np.int64)
+    active = np.flatnonzero(infected)
+    for _ in range(max_steps):
+        if not len(active):
+            break
+        steps[active] += 1
+        current = infected[active]
+        new, deaths, saved, interactions = mean_field_step(susceptible[active], immune[active], current,
+                                                           repro[active], mortality[active])
+        new = np.where(new < 0.5, 0.0, new)
+        immune[active] += current - deaths
+        susceptible[active] -= new
+        infected[active] = new
+        totals['total_deaths'][active] += deaths
+        totals['total_interactions'][active] += interactions
+        totals['saved_by_vaccination'][active] += saved
+        totals['total_infected'][active] += new
+        totals['infected_and_alive'][active] = new - initial
+        if keep_series:
+            for name in SURROGATE_SERIES:
+                series[name].append(totals[name].reshape(shape))
+                totals[name] = totals[name].copy()
+        active = active[new > 0]
+    if not keep_series or not series['total_deaths']:
+        series = {name: [totals[name].reshape(shape)] for name in SURROGATE_SERIES}
+    series = {name: np.array(values) for name, values in series.items()}
+    return SurrogateResult(repro_rate, mortality_rate, vacc_percentage, pop_size, initial_infected, series,
+                           steps.reshape(shape))
+
+
+def surrogate_grid(repro_rates, mortality_rates, vacc_percentages, pop_size, initial_infected=1,
+                   max_steps=MAX_STEPS, keep_series=True):
+    # Evaluate `mean_field` on every combination of the given values
+    grids = np.meshgrid(repro_rates, mortality_rates, vacc_percentages, indexing='ij')
+    return mean_field(*grids, pop_size, initial_infected, max_steps, keep_series)
+
+
+def _pad(values, length):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return np.zeros(length)
+    return np.concatenate([values, np.repeat(values[-1:], length - len(values))])
+
+
+def series_error(surrogate, ensemble_mean):
+    """
+    Largest gap between a surrogate curve and an ensemble mean curve,
+    relative to the peak of the ensemble mean. The shorter curve is
+    padded with its final value.
+    """
+    length = max(len(surrogate), len(ensemble_mean))
+    surrogate, ensemble_mean = _pad(surrogate, length), _pad(ensemble_mean, length)
+    peak = max(1.0, float(np.max(np.abs(ensemble_mean))))
+    return float(np.max(np.abs(surrogate - ensemble_mean))) / peak
+
+
+def calibrate(spec, tolerance=TOLERANCE, workers=1):
+    """
+    Compare the surrogate to ensembles of the agent engine on every cell of
+    the sweep grid `spec` (see `sweep.load_spec`), each ensemble run with
+    the spec's replicates, engine and seeds as in `sweep.run_cell`.
+
+    Returns one record per cell with, for every step series, the error of
+    the surrogate's curve against the ensemble mean (see `series_error`),
+    the relative error of the final size, and whether every error is
+    within `tolerance`.
+    """
+    spec = load_spec(spec)
+    grid = spec['grid']
+    result = surrogate_grid(grid['repro_rate'], grid['mortality_rate'], grid['vacc_percentage'],
+                            spec['pop_size'], spec['initial_infected'], spec['max_steps'])
+    records = []
+    for index in np.ndindex(result.shape):
+        params = {name: grid[name][i] for name, i in zip(GRID_PARAMETERS, index)}
+        virus = Virus(spec['virus_name'], params['repro_rate'], params['mortality_rate'])
+        ensemble = run_ensemble(
+            virus, spec['pop_size'], params['vacc_percentage'], spec['initial_infected'],
+            replicates=spec['replicates'], seed=cell_seed(spec['seed'], cell_key(*params.values())),
+            workers=workers, engine=spec['engine'], max_steps=spec['max_steps']
+        )
+        curves = result.cell(index)
+        errors = {name: series_error(curves[name], ensemble.series_mean(name)) for name in STEP_SERIES}
+        final_size = float(result.final('total_infected')[index])
+        ensemble_size = ensemble.mean('total_infected')
+        size_error = abs(final_size - ensemble_size) / max(1.0, ensemble_size)
+        records.append(dict(
+            params,
+            errors=errors,
+            final_size=final_size,
+            ensemble_final_size=ensemble_size,
+            final_size_error=size_error,
+            trusted=max(max(errors.values()), size_error) <= tolerance,
+        ))
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Screen a sweep grid with the mean-field surrogate.')
+    parser.add_argument('spec', help='JSON grid spec, as for sweep.py')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Compare every cell with an ensemble of the agent engine')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--output', help='Write the records to this JSON file')
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    if args.calibrate:
+        records = calibrate(spec, args.tolerance, args.workers)
+        print(f"{'repro':>8} {'mortality':>9} {'vacc':>6} {'size':>10} {'ensemble':>10} "
+              f"{'infected':>9} {'deaths':>7} {'trusted':>8}")
+        for record in records:
+            errors = record['errors']
+            print(f"{record['repro_rate']:>8g} {record['mortality_rate']:>9g} {record['vacc_percentage']:>6g} "
+                  f"{record['final_size']:>10.1f} {record['ensemble_final_size']:>10.1f} "
+                  f"{errors['infected_and_alive']:>9.3f} {errors['total_deaths']:>7.3f} "
+                  f"{'yes' if record['trusted'] else 'no':>8}")
+    else:
+        grid = spec['grid']
+        result = surrogate_grid(grid['repro_rate'], grid['mortality_rate'], grid['vacc_percentage'],
+                                spec['pop_size'], spec['initial_infected'], spec['max_steps'],
+                                keep_series=False)
+        records = []
+        for index in np.ndindex(result.shape):
+            records.append(dict(
+                {name: grid[name][i] for name, i in zip(GRID_PARAMETERS, index)},
+                steps=int(result.steps[index]),
+                outbreak_size=float(result.final('total_infected')[index]) / spec['pop_size'],
+                total_deaths=float(result.final('total_deaths')[index]),
+            ))
+        print(f"{'repro':>8} {'mortality':>9} {'vacc':>6} {'steps':>6} {'outbreak':>9} {'deaths':>10}")
+        for record in records:
+            print(f"{record['repro_rate']:>8g} {record['mortality_rate']:>9g} {record['vacc_percentage']:>6g} "
+                  f"{record['steps']:>6} {record['outbreak_size']:>9.3f} {record['total_deaths']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(records, file, indent=2)
+    return records
+
+
+if __name__ == "__main__":
+    main()
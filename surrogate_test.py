@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from surrogate import calibrate, mean_field, surrogate_grid, series_error
+
+
+class TestSurrogate(unittest.TestCase):
+    def test_grid_matches_single_cells(self):
+        repro_rates, mortality_rates, vacc_percentages = [0.01, 0.05, 0.3], [0.1, 0.5], [0.0, 0.4]
+        grid = surrogate_grid(repro_rates, mortality_rates, vacc_percentages, 10000, 10)
+        self.assertEqual(grid.shape, (3, 2, 2))
+        for index in np.ndindex(grid.shape):
+            cell = mean_field(repro_rates[index[0]], mortality_rates[index[1]], vacc_percentages[index[2]],
+                              10000, 10)
+            self.assertEqual(grid.steps[index], cell.steps)
+            for name, values in grid.cell(index).items():
+                self.assertTrue(np.allclose(values, cell.series[name][:int(cell.steps)]), name)
+
+    def test_final_state(self):
+        result = mean_field(0.3, 0.2, 0.25, 10000, 10)
+        # Everybody not vaccinated catches it, and the mortality rate holds
+        self.assertAlmostEqual(float(result.final('total_infected')), 7500, delta=1)
+        self.assertAlmostEqual(float(result.final('total_deaths')), 0.2 * 7500, delta=1)
+        self.assertAlmostEqual(float(result.final('infected_and_alive')), -10)
+        self.assertEqual(float(result.final('total_interactions')), 100 * float(result.final('total_infected')))
+
+        # Below the epidemic threshold the infection dies out
+        result = mean_field(0.005, 0.2, 0.0, 10000, 10)
+        self.assertLess(float(result.final('total_infected')), 30)
+
+    def test_series_error(self):
+        self.assertEqual(series_error([1, 2, 4], [1, 2, 4, 4]), 0.0)
+        self.assertEqual(series_error([0, 5], [0, 10]), 0.5)
+
+    def test_calibration(self):
+        spec = {
+            'pop_size': 2000, 'initial_infected': 10, 'replicates': 10, 'seed': 1, 'max_steps': 200,
+            'grid': {'repro_rate': [0.05, 0.3], 'mortality_rate': [0.12], 'vacc_percentage': [0.2]},
+        }
+        records = calibrate(spec)
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertTrue(record['trusted'], record)
+            self.assertLess(record['final_size_error'], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from cache import ResultCache
+from ensemble import run_ensemble
+from virus import Virus
+
+# Parameters a sweep grid can vary, in the order cells are keyed by
+GRID_PARAMETERS = ('repro_rate', 'mortality_rate', 'vacc_percentage')
+
+# Defaults for everything a grid spec does not set
+DEFAULT_SPEC = {
+    'virus_name': 'Sniffles',
+    'pop_size': 1000,
+    'initial_infected': 10,
+    'replicates': 20,
+    'engine': 'vector',
+    'max_steps': 1000,
+    'seed': None,
+}
+
+
+def load_spec(spec):
+    """
+    Normalize a grid spec given as a dict or a path to a JSON file.
+    The spec holds the fixed simulation settings plus a `grid` mapping each
+    of `repro_rate`, `mortality_rate` and `vacc_percentage` to a list of values.
+    """
+    if isinstance(spec, str):
+        with open(spec, 'r') as file:
+            spec = json.load(file)
+    spec = dict(DEFAULT_SPEC, **spec)
+    grid = spec.get('grid', {})
+    missing = [name for name in GRID_PARAMETERS if not grid.get(name)]
+    if missing:
+        raise ValueError(f'Grid spec has no values for {", ".join(missing)}')
+    unknown = set(grid) - set(GRID_PARAMETERS)
+    if unknown:
+        raise ValueError(f'Grid spec has unknown parameters {", ".join(sorted(unknown))}')
+    spec['grid'] = {name: [float(v) for v in grid[name]] for name in GRID_PARAMETERS}
+    return spec
+
+
+def cell_key(repro_rate, mortality_rate, vacc_percentage):
+    return f'{repro_rate!r}|{mortality_rate!r}|{vacc_percentage!r}'
+
+
+def cell_seed(seed, key):
+    # Every cell gets a stream derived from the sweep seed and its own key,
+    # so a cell's result does not depend on when or where it was run.
+    digest = hashlib.sha256(key.encode()).digest()
+    return [seed, int.from_bytes(digest[:8], 'little')]
+
+
+def run_cell(spec, repro_rate, mortality_rate, vacc_percentage, cache=None):
+    """
+    Run the replicates of one grid cell and return its checkpoint record.
+    Replicates found in the optional `cache` (see cache.py) are not run again.
+    """
+    key = cell_key(repro_rate, mortality_rate, vacc_percentage)
+    virus = Virus(spec['virus_name'], repro_rate, mortality_rate)
+    result = run_ensemble(
+        virus, spec['pop_size'], vacc_percentage, spec['initial_infected'],
+        replicates=spec['replicates'], seed=cell_seed(spec['seed'], key),
+        workers=1, engine=spec['engine'], max_steps=spec['max_steps'], cache=cache
+    )
+    outbreak = result.outcome('total_infected') / spec['pop_size']
+    return {
+        'key': key,
+        'repro_rate': repro_rate,
+        'mortality_rate': mortality_rate,
+        'vacc_percentage': vacc_percentage,
+        'replicates': len(result.runs),
+        'outbreak_size': float(outbreak.mean()),
+        'outbreak_size_std': float(outbreak.std()),
+        'total_deaths': result.mean('total_deaths'),
+        'saved_by_vaccination': result.mean('saved_by_vaccination'),
+        'steps': result.mean('steps'),
+    }
+
+
+class Checkpoint(object):
+    def __init__(self, path):
+        """
+        Append-only JSON-lines record of finished sweep cells.
+
+        The first line is a header holding the sweep settings (everything in
+        the spec but the grid, including the seed), so a resumed sweep can
+        check it runs the same configuration and reuse the seed of the
+        interrupted one. Every later line is a finished cell; a line cut
+        short by a crash is ignored on load.
+        """
+        self.path = path
+        self.header = None
+        self.cells = {}
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'settings' in record:
+                    self.header = record
+                else:
+                    self.cells[record['key']] = record
+
+    def start(self, settings):
+        self.header = {'settings': settings}
+        self._append(self.header)
+
+    def add(self, record):
+        self.cells[record['key']] = record
+        self._append(record)
+
+    def _append(self, record):
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class Sweep(object):
+    def __init__(self, spec, checkpoint_path, workers=None, cache=None):
+        """
+        Schedule the cells of a parameter grid over a pool of worker processes.
+
+        Attributes:
+        - spec: The normalized grid spec (see `load_spec`).
+        - checkpoint: The `Checkpoint` finished cells are recorded in. Cells
+          already in it are not run again, so a killed sweep resumes where
+          it stopped.
+        - workers: Number of worker processes (default: one per CPU core).
+        - cache: Optional `ResultCache` shared by the workers, so the
+          replicates of a cell run by an earlier sweep are not run again.
+        """
+        self.spec = load_spec(spec)
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.workers = workers
+        self.cache = cache
+
+        settings = {name: value for name, value in self.spec.items() if name != 'grid'}
+        if self.checkpoint.header is None:
+            if settings['seed'] is None:
+                settings['seed'] = int(np.random.SeedSequence().entropy % (1 << 63))
+            self.checkpoint.start(settings)
+        else:
+            recorded = self.checkpoint.header['settings']
+            if settings['seed'] is None:
+                settings['seed'] = recorded['seed']
+            changed = sorted(name for name in set(settings) | set(recorded)
+                             if settings.get(name) != recorded.get(name))
+            if changed:
+                raise ValueError(
+                    f'Checkpoint {checkpoint_path} was written with different settings '
+                    f'({", ".join(changed)}); use a new checkpoint file'
+                )
+        self.spec['seed'] = settings['seed']
+
+    def grid_cells(self):
+        grid = self.spec['grid']
+        return list(itertools.product(*(grid[name] for name in GRID_PARAMETERS)))
+
+    def pending(self, cells):
+        return [cell for cell in cells if cell_key(*cell) not in self.checkpoint.cells]
+
+    def run_cells(self, cells):
+        """
+        Run every cell in `cells` that is not checkpointed yet.
+        """
+        cells = self.pending(cells)
+        if not cells:
+            return
+        if self.workers == 1:
+            for cell in cells:
+                self.checkpoint.add(run_cell(self.spec, *cell, cache=self.cache))
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(run_cell, self.spec, *cell, cache=self.cache) for cell in cells]
+            for future in as_completed(futures):
+                self.checkpoint.add(future.result())
+
+    def refinement_cells(self, min_gap=0.005):
+        """
+        Pick new `vacc_percentage` values where the outbreak size drops most.
+        For every (repro_rate, mortality_rate) pair the finished cells are
+        sorted by vaccination level, and the midpoint of the neighbouring pair
+        with the sharpest drop in outbreak size is returned as a new cell.
+        """
+        cells = []
+        for (repro_rate, mortality_rate), records in sorted(self.groups().items()):
+            drop = sharpest_drop(records, min_gap=2 * min_gap)
+            if drop is not None:
+                _, low, high = drop
+                midpoint = round((low['vacc_percentage'] + high['vacc_percentage']) / 2, 6)
+                cells.append((repro_rate, mortality_rate, midpoint))
+        return cells
+
+    def run(self, refine=0):
+        """
+        Run the whole grid, then `refine` rounds of adaptive refinement.
+        Returns the finished cell records sorted by grid parameters.
+        """
+        self.run_cells(self.grid_cells())
+        for _ in range(refine):
+            cells = self.pending(self.refinement_cells())
+            if not cells:
+                break
+            self.run_cells(cells)
+        return self.results()
+
+    def results(self):
+        return sorted(self.checkpoint.cells.values(),
+                      key=lambda record: tuple(record[name] for name in GRID_PARAMETERS))
+
+    def groups(self):
+        """
+        Group the finished cells by (repro_rate, mortality_rate), each group
+        sorted by vaccination level.
+        """
+        groups = {}
+        for record in self.results():
+            group = (record['repro_rate'], record['mortality_rate'])
+            groups.setdefault(group, []).append(record)
+        return groups
+
+    def thresholds(self):
+        """
+        Estimate the herd-immunity threshold for every (repro_rate, mortality_rate)
+        pair as the midpoint of the sharpest drop in outbreak size, or None
+        when the outbreak size never drops as vaccination goes up.
+        """
+        thresholds = {}
+        for group, records in self.groups().items():
+            drop = sharpest_drop(records)
+            if drop is None:
+                thresholds[group] = None
+            else:
+                _, low, high = drop
+                thresholds[group] = (low['vacc_percentage'] + high['vacc_percentage']) / 2
+        return thresholds
+
+
+def sharpest_drop(records, min_gap=0.0):
+    """
+    Find the neighbouring pair of cells (sorted by vaccination level) whose
+    outbreak size drops the most as vaccination goes up.
+    Pairs closer together than `min_gap` are skipped. Returns
+    (drop, low, high), or None when no pair has a positive drop.
+    """
+    best = None
+    for low, high in zip(records, records[1:]):
+        if high['vacc_percentage'] - low['vacc_percentage'] < min_gap:
+            continue
+        drop = low['outbreak_size'] - high['outbreak_size']
+        if drop > 0 and (best is None or drop > best[0]):
+            best = (drop, low, high)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep a grid of simulation parameters.')
+    parser.add_argument('spec', help='JSON grid spec')
+    parser.add_argument('checkpoint', help='JSON-lines file finished cells are recorded in')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--refine', type=int, default=0, help='Rounds of adaptive refinement')
+    parser.add_argument('--cache', help='Directory of a result cache for the replicates')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache) if args.cache else None
+    sweep = Sweep(args.spec, args.checkpoint, workers=args.workers, cache=cache)
+    for record in sweep.run(refine=args.refine):
+        print(f"repro {record['repro_rate']} | mortality {record['mortality_rate']} | "
+              f"vacc {record['vacc_percentage']} | outbreak size {record['outbreak_size']:.3f} | "
+              f"deaths {record['total_deaths']:.1f}")
+    for (repro_rate, mortality_rate), threshold in sorted(sweep.thresholds().items()):
+        print(f"Threshold for repro {repro_rate}, mortality {mortality_rate}: {threshold}")
@@ -0,0 +1,95 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from sweep import Sweep, load_spec, cell_key, sharpest_drop
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint_file = os.path.join(self.tmpdir, 'checkpoint.jsonl')
+        self.spec = {
+            'pop_size': 300,
+            'initial_infected': 3,
+            'replicates': 2,
+            'seed': 4,
+            'grid': {
+                'repro_rate': [0.5],
+                'mortality_rate': [0.1],
+                'vacc_percentage': [0.0, 0.5, 0.99],
+            },
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_spec_requires_grid(self):
+        with self.assertRaises(ValueError):
+            load_spec({'grid': {'repro_rate': [0.5]}})
+
+    def test_run_grid(self):
+        results = Sweep(self.spec, self.checkpoint_file, workers=1).run()
+        self.assertEqual([r['vacc_percentage'] for r in results], [0.0, 0.5, 0.99])
+
+        # A nearly fully vaccinated population dies out without spreading far
+        self.assertLess(results[-1]['outbreak_size'], 0.1)
+        self.assertGreater(results[0]['outbreak_size'], results[-1]['outbreak_size'])
+
+    def test_resume_skips_finished_cells(self):
+        Sweep(self.spec, self.checkpoint_file, workers=1).run()
+        with open(self.checkpoint_file, 'r') as file:
+            lines = file.readlines()
+
+        # Simulate a sweep killed while writing its last cell
+        with open(self.checkpoint_file, 'w') as file:
+            file.writelines(lines[:-1])
+            file.write(lines[-1][:10])
+
+        resumed = Sweep(self.spec, self.checkpoint_file, workers=1)
+        self.assertEqual(len(resumed.pending(resumed.grid_cells())), 1)
+        results = resumed.run()
+        self.assertEqual(len(results), 3)
+
+        # The rerun cell reproduces the result of the interrupted sweep
+        lost = json.loads(lines[-1])
+        self.assertEqual(resumed.checkpoint.cells[lost['key']], lost)
+
+    def test_resume_with_different_settings(self):
+        Sweep(self.spec, self.checkpoint_file, workers=1).run()
+        self.spec['pop_size'] = 400
+        with self.assertRaises(ValueError):
+            Sweep(self.spec, self.checkpoint_file, workers=1)
+
+    def test_refinement_adds_midpoints(self):
+        self.spec['grid']['vacc_percentage'] = [0.0, 0.99]
+        sweep = Sweep(self.spec, self.checkpoint_file, workers=1)
+        sweep.run()
+
+        # The first round splits the only interval
+        self.assertEqual(sweep.refinement_cells(), [(0.5, 0.1, 0.495)])
+        sweep.run_cells(sweep.refinement_cells())
+        self.assertIn(cell_key(0.5, 0.1, 0.495), sweep.checkpoint.cells)
+
+        # The second round splits the half with the sharper drop
+        low, middle, high = sweep.groups()[(0.5, 0.1)]
+        if low['outbreak_size'] - middle['outbreak_size'] > middle['outbreak_size'] - high['outbreak_size']:
+            expected = 0.2475
+        else:
+            expected = 0.7425
+        self.assertEqual(sweep.refinement_cells(), [(0.5, 0.1, expected)])
+        sweep.run(refine=1)
+        self.assertIn(cell_key(0.5, 0.1, expected), sweep.checkpoint.cells)
+
+    def test_no_threshold_without_drop(self):
+        records = [
+            {'vacc_percentage': 0.1, 'outbreak_size': 0.2},
+            {'vacc_percentage': 0.2, 'outbreak_size': 0.2},
+            {'vacc_percentage': 0.3, 'outbreak_size': 0.5},
+        ]
+        self.assertIsNone(sharpest_drop(records))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import os
+import numpy as np
+
+# Per-step counters stored for every run, one column file each
+COLUMNS = (
+    'run', 'step', 'infected', 'immune', 'deaths', 'interactions',
+    'new_infections', 'saved_by_vaccination',
+)
+
+# Every column is stored as little-endian 64-bit integers
+DTYPE = np.dtype('<i8')
+
+RUNS_FILE = 'runs.jsonl'
+
+
+def _column_path(path, name):
+    return os.path.join(path, f'{name}.i8')
+
+
+class TimeSeriesWriter(object):
+    def __init__(self, path):
+        """
+        Append simulation runs to a columnar time-series store at `path`.
+
+        The store is a directory holding one raw int64 file per column in
+        COLUMNS, with one row per simulated step, and a `runs.jsonl` file
+        with the metadata of every run and the rows it owns. A run's rows are
+        only written when the run ends, and its metadata line after them, so
+        a run cut short by a crash never shows up in the store.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._rows = None
+        self._metadata = None
+
+        # Rows past the last complete run belong to a crashed writer
+        self._num_rows = 0
+        self._next_run = 0
+        for run in _read_runs(path):
+            self._num_rows = max(self._num_rows, run['offset'] + run['length'])
+            self._next_run = max(self._next_run, run['run'] + 1)
+
+    def begin_run(self, **metadata):
+        """
+        Start recording a run, described by the keyword `metadata`
+        (virus parameters, pop_size, vacc_percentage, ...).
+        Returns the id the run is stored under.
+        """
+        self._metadata = dict(metadata, run=self._next_run)
+        self._rows = []
+        self._next_run += 1
+        return self._metadata['run']
+
+    def record(self, sim):
+        # Append the counters of `sim` after its latest step
+        infected = max(0, sim.infected_and_alive)
+        self._rows.append((
+            self._metadata['run'],
+            sim.num_steps,
+            infected,
+            sim.pop_size - sim.total_deaths - infected,
+            sim.total_deaths,
+            sim.total_interactions,
+            sim.new_infections,
+            sim.saved_by_vaccination,
+        ))
+
+    def end_run(self):
+        rows = np.array(self._rows, dtype=DTYPE).reshape(-1, len(COLUMNS))
+        for i, name in enumerate(COLUMNS):
+            column_path = _column_path(self.path, name)
+            with open(column_path, 'r+b' if os.path.exists(column_path) else 'wb') as file:
+                # Overwrite any rows a crashed writer left past the last run
+                file.seek(self._num_rows * DTYPE.itemsize)
+                file.truncate()
+                rows[:, i].tofile(file)
+
+        self._metadata.update(offset=self._num_rows, length=len(rows))
+        with open(os.path.join(self.path, RUNS_FILE), 'a') as file:
+            file.write(json.dumps(self._metadata) + '\n')
+        self._num_rows += len(rows)
+        self._rows = None
+        self._metadata = None
+
+
+class TimeSeries(object):
+    def __init__(self, path, mmap=True):
+        """
+        Read a store written by `TimeSeriesWriter`.
+
+        Attributes:
+        - runs: Metadata of every complete run, in the order they were written.
+        - columns: dict of column name -> int64 array over the rows of all
+          runs. With `mmap` the arrays are memory-mapped instead of read.
+        """
+        self.path = path
+        self.runs = _read_runs(path)
+        num_rows = max((run['offset'] + run['length'] for run in self.runs), default=0)
+        self.columns = {}
+        for name in COLUMNS:
+            if num_rows == 0:
+                self.columns[name] = np.zeros(0, dtype=DTYPE)
+            elif mmap:
+                self.columns[name] = np.memmap(_column_path(path, name), dtype=DTYPE, mode='r', shape=(num_rows,))
+            else:
+                self.columns[name] = np.fromfile(_column_path(path, name), dtype=DTYPE, count=num_rows)
+
+    def __len__(self):
+        return len(self.runs)
+
+    def series(self, index):
+        # dict of column name -> the per-step values of the `index`th run
+        run = self.runs[index]
+        rows = slice(run['offset'], run['offset'] + run['length'])
+        return {name: self.columns[name][rows] for name in COLUMNS}
+
+    def padded(self, name):
+        """
+        Return column `name` as a (runs, steps) array, with runs that ended
+        early padded with their final value.
+        """
+        lengths = np.array([run['length'] for run in self.runs])
+        offsets = np.array([run['offset'] for run in self.runs])
+        steps = np.arange(lengths.max(initial=0))
+        rows = offsets[:, None] + np.minimum(steps[None, :], lengths[:, None] - 1)
+        return np.asarray(self.columns[name])[rows]
+
+
+def _read_runs(path):
+    runs_path = os.path.join(path, RUNS_FILE)
+    if not os.path.exists(runs_path):
+        return []
+    runs = []
+    with open(runs_path, 'r') as file:
+        for line in file:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                # Metadata line cut short by a crash
+                continue
+    return runs
@@ -0,0 +1,71 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from timeseries import TimeSeriesWriter, TimeSeries, COLUMNS
+from vector_simulation import VectorSimulation
+from virus import Virus
+from logger import Logger
+
+
+class TestTimeSeries(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = os.path.join(self.tmpdir, 'series')
+        self.virus = Virus("Test", 0.5, 0.12)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_simulation(self, writer, seed):
+        sim = VectorSimulation(self.virus, 1000, 0.1, 10, seed=seed, series_writer=writer)
+        sim.logger = Logger(os.path.join(self.tmpdir, f'log_{seed}.txt'))
+        sim.run()
+        return sim
+
+    def test_runs_round_trip(self):
+        writer = TimeSeriesWriter(self.store)
+        sims = [self.run_simulation(writer, seed) for seed in range(3)]
+
+        for mmap in (True, False):
+            series = TimeSeries(self.store, mmap=mmap)
+            self.assertEqual(len(series), 3)
+            for i, sim in enumerate(sims):
+                run = series.series(i)
+                self.assertEqual(series.runs[i]['pop_size'], 1000)
+                self.assertEqual(run['step'].tolist(), list(range(1, sim.num_steps + 1)))
+                self.assertEqual(run['deaths'][-1], sim.total_deaths)
+                self.assertEqual(run['interactions'][-1], sim.total_interactions)
+                self.assertEqual(run['saved_by_vaccination'][-1], sim.saved_by_vaccination)
+                self.assertTrue((run['run'] == i).all())
+
+    def test_padded(self):
+        writer = TimeSeriesWriter(self.store)
+        sims = [self.run_simulation(writer, seed) for seed in range(2)]
+        deaths = TimeSeries(self.store).padded('deaths')
+        self.assertEqual(deaths.shape, (2, max(sim.num_steps for sim in sims)))
+        self.assertEqual(deaths[:, -1].tolist(), [sim.total_deaths for sim in sims])
+
+    def test_unfinished_run_is_dropped(self):
+        writer = TimeSeriesWriter(self.store)
+        self.run_simulation(writer, 0)
+
+        # A writer that crashes mid-run leaves rows without metadata
+        crashed = TimeSeriesWriter(self.store)
+        crashed.begin_run(pop_size=1000)
+        crashed._rows.append(tuple(range(len(COLUMNS))))
+        with open(os.path.join(self.store, 'step.i8'), 'ab') as file:
+            np.arange(5, dtype='<i8').tofile(file)
+
+        self.assertEqual(len(TimeSeries(self.store)), 1)
+        appended = TimeSeriesWriter(self.store)
+        self.run_simulation(appended, 1)
+        series = TimeSeries(self.store, mmap=False)
+        self.assertEqual(len(series), 2)
+        self.assertEqual(series.series(1)['step'][0], 1)
+        self.assertEqual(series.runs[1]['run'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import numpy as np
+from simulation import Simulation, STATE_COUNTERS, _pickle_rng, _unpickle_rng
+from population import Population, ALIVE, VACCINATED, INFECTED
+from rng import as_generator, seed_key
+from virus import Virus
+
+# Upper bound on the number of contacts drawn in one batch, so a step with
+# millions of infected people never allocates one array slot per interaction.
+CONTACT_CHUNK = 1 << 22
+
+
+class VectorSimulation(Simulation):
+    engine = 'vector'
+
+    def __init__(self, virus, pop_size, vacc_percentage, initial_infected=1, seed=None,
+                 log_buffer_size=None, series_writer=None, sampling='contact', rng=None,
+                 log_clock=None, graph=None, profiler=None):
+        """
+        Array-backed version of `Simulation` for very large populations.
+
+        The population is a compact `Population` whose flag bytes are worked
+        on directly as a NumPy uint8 array, and every step's interactions,
+        infections and survival checks are drawn as batched NumPy operations.
+        Counters, `run()` and the `Logger` output are the same as `Simulation`.
+
+        Attributes (in addition to those of `Simulation`):
+        - rng: NumPy random generator used for every draw, seeded with `seed`.
+          A `rng` argument takes its place: a NumPy generator, or a stream
+          from rng.py whose `generator` is then shared with the caller.
+        - state: NumPy view of `population.flags`.
+        - infected: Array of the ids of the currently infected people.
+        """
+        self.rng = as_generator(seed if rng is None else rng)
+        super().__init__(virus, pop_size, vacc_percentage, initial_infected,
+                         log_buffer_size=log_buffer_size, series_writer=series_writer,
+                         sampling=sampling, rng=self.rng, log_clock=log_clock, graph=graph,
+                         profiler=profiler)
+        self.seed_key = seed_key(seed if rng is None else rng)
+
+    def _create_population(self):
+        """
+        Create the population and the `state` array view of its flags.
+        The layout is the one of `Simulation._create_population`: the first
+        `initial_infected` people start out infected, and vaccinated people
+        are sampled among the others.
+        """
+        population = Population(self.pop_size, self.virus)
+        self.state = population.array()
+        population.lay_out(self.rng, int(self.pop_size * self.vacc_percentage), self.initial_infected)
+        return population
+
+    def _index_population(self):
+        self.infected = np.flatnonzero(self.state & INFECTED)
+
+    @property
+    def num_dead(self):
+        return self.pop_size - int(np.count_nonzero(self.state & ALIVE))
+
+    def get_state(self):
+        # Same layout as `Simulation.get_state`, without the healthy indexes
+        return {
+            'flags': self.state.copy(),
+            'infected': np.asarray(self.infected, dtype=np.int64),
+            'counters': np.array([getattr(self, name) for name in STATE_COUNTERS], dtype=np.int64),
+            'rng': _pickle_rng(self.rng),
+        }
+
+    def set_state(self, state):
+        self.state[:] = state['flags']
+        self.infected = state['infected'].copy()
+        self.newly_infected = set()
+        for name, value in zip(STATE_COUNTERS, state['counters'].tolist()):
+            setattr(self, name, value)
+        self.rng = _unpickle_rng(state['rng'])
+
+    def time_step(self):
+        """
+        Simulate one step in time.
+        Every infected person makes 100 contacts drawn uniformly from the
+        people who were alive and uninfected at the start of the step, then
+        the infected either die or become immune and the newly infected are
+        marked at the end of the step. With a contact `graph` the contacts
+        are the healthy neighbors of the infected instead.
+        """
+        infected_population = self.infected
+
+        newly_infected = []
+        if self.graph is not None:
+            with self.profiler.phase('interactions'):
+                newly_infected = self._draw_network_contacts(infected_population)
+        else:
+            with self.profiler.phase('healthy_population'):
+                healthy_population = np.flatnonzero((self.state & (ALIVE | INFECTED)) == ALIVE)
+            if len(healthy_population):
+                num_contacts = 100 * len(infected_population)
+                self.total_interactions += num_contacts
+                with self.profiler.phase('interactions'):
+                    if self.sampling == 'aggregate':
+                        newly_infected.append(self._draw_aggregate_contacts(healthy_population, num_contacts))
+                    else:
+                        while num_contacts > 0:
+                            batch = min(num_contacts, CONTACT_CHUNK)
+                            newly_infected.append(self._draw_contacts(healthy_population, batch))
+                            num_contacts -= batch
+
+        # Resolve whether the infected people survive their infection
+        with self.profiler.phase('survival'):
+            died = self.rng.random(len(infected_population)) < self.virus.mortality_rate
+            newly_dead = int(np.count_nonzero(died))
+            self.state[infected_population[died]] = 0
+            self.state[infected_population[~died]] = ALIVE | VACCINATED
+        self.infected_and_alive -= len(infected_population)
+        self.total_deaths += newly_dead
+        self.death_interactions += newly_dead
+
+        with self.profiler.phase('infect_newly_infected'):
+            if newly_infected:
+                self.newly_infected = np.unique(np.concatenate(newly_infected))
+            self._infect_newly_infected()
+
+    def _draw_contacts(self, healthy_population, num_contacts):
+        """
+        Draw `num_contacts` interactions with random healthy people.
+        Contacts with vaccinated people are counted in `saved_by_vaccination`;
+        the others transmit the virus with probability `repro_rate`.
+        Returns the indices of the people who were infected.
+        """
+        targets = healthy_population[self.rng.integers(0, len(healthy_population), num_contacts)]
+        protected = (self.state[targets] & VACCINATED).astype(bool)
+        self.saved_by_vaccination += int(np.count_nonzero(protected))
+        exposed = targets[~protected]
+        return exposed[self.rng.random(len(exposed)) < self.virus.repro_rate]
+
+    def _draw_network_contacts(self, infected_population):
+        """
+        Draw one interaction between every infected person and each of their
+        healthy neighbors in `graph`, gathering the neighbors of at most
+        about CONTACT_CHUNK edges at a time.
+        Returns the list of index arrays of the people who were infected.
+        """
+        newly_infected = []
+        ends = np.cumsum(self.graph.degree(infected_population))
+        start = 0
+        while start < len(infected_population):
+            limit = (ends[start - 1] if start else 0) + CONTACT_CHUNK
+            stop = max(start + 1, int(np.searchsorted(ends, limit, side='right')))
+            targets = self.graph.gather(infected_population[start:stop])
+            targets = targets[(self.state[targets] & (ALIVE | INFECTED)) == ALIVE]
+            self.total_interactions += len(targets)
+            protected = (self.state[targets] & VACCINATED).astype(bool)
+            self.saved_by_vaccination += int(np.count_nonzero(protected))
+            exposed = targets[~protected]
+            if self.sampling == 'aggregate':
+                repro_rate = min(max(self.virus.repro_rate, 0), 1)
+                transmitted = self.rng.binomial(len(exposed), repro_rate)
+                newly_infected.append(self.rng.choice(exposed, transmitted, replace=False))
+            else:
+                newly_infected.append(exposed[self.rng.random(len(exposed)) < self.virus.repro_rate])
+            start = stop
+        return newly_infected
+
+    def _draw_aggregate_contacts(self, healthy_population, num_contacts):
+        """
+        Draw the outcome of `num_contacts` interactions in aggregate: the
+        number of contacts with vaccinated people and the number of the
+        remaining contacts that transmit are binomial, so only the infected
+        people are picked instead of every contact's target.
+        Returns the indices of the people who were infected.
+        """
+        susceptible = healthy_population[(self.state[healthy_population] & VACCINATED) == 0]
+        protected = int(self.rng.binomial(num_contacts, 1 - len(susceptible) / len(healthy_population)))
+        self.saved_by_vaccination += protected
+        repro_rate = min(max(self.virus.repro_rate, 0), 1)
+        transmitted = self.rng.binomial(num_contacts - protected, repro_rate)
+        if transmitted == 0:
+            return susceptible[:0]
+        return susceptible[self.rng.integers(0, len(susceptible), transmitted)]
+
+    def _infect_newly_infected(self):
+        """
+        Infect the people marked as newly infected during the time step.
+        Clear `newly_infected` for the next step.
+        """
+        self.new_infections = len(self.newly_infected)
+        newly_infected = np.fromiter(self.newly_infected, dtype=np.int64, count=len(self.newly_infected))
+        self.state[newly_infected] |= INFECTED
+        self.infected_and_alive += len(newly_infected)
+        self.total_infected += len(newly_infected)
+        self.infected = newly_infected
+        self.newly_infected = set()
+
+
+if __name__ == "__main__":
+    # Virus details
+    virus_name = "Sniffles"
+    repro_num = 0.5
+    mortality_rate = 0.12
+    virus = Virus(virus_name, repro_num, mortality_rate)
+
+    # Simulation parameters
+    pop_size = 1000000
+    vacc_percentage = 0.1
+    initial_infected = 10
+
+    # Create and run the simulation
+    sim = VectorSimulation(pop_size=pop_size, vacc_percentage=vacc_percentage, initial_infected=initial_infected, virus=virus)
+    sim.run()
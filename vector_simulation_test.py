@@ -0,0 +1,99 @@
+import unittest
+import os
+import numpy as np
+from sampling_test import ks_statistic, ks_critical
+from simulation import Simulation
+from vector_simulation import VectorSimulation, ALIVE, VACCINATED, INFECTED
+from virus import Virus
+from logger import Logger
+
+
+class TestVectorSimulation(unittest.TestCase):
+    def setUp(self):
+        self.virus = Virus("Test", 0.5, 0.12)
+        self.pop_size = 1000
+        self.vacc_percentage = 0.1
+        self.initial_infected = 10
+        self.test_file = 'test_vector_log.txt'
+
+        self.simulation = VectorSimulation(
+            virus=self.virus,
+            pop_size=self.pop_size,
+            vacc_percentage=self.vacc_percentage,
+            initial_infected=self.initial_infected,
+            seed=7
+        )
+        self.simulation.logger = Logger(self.test_file)
+
+    def tearDown(self):
+        if os.path.exists(self.test_file):
+            os.remove(self.test_file)
+
+    def test_population_creation(self):
+        population = self.simulation.state
+        self.assertEqual(len(population), self.pop_size)
+
+        # The initially infected people are alive and infected
+        infected = (population & INFECTED).astype(bool)
+        self.assertEqual(infected.sum(), self.initial_infected)
+        self.assertTrue(infected[:self.initial_infected].all())
+        self.assertTrue((population & ALIVE).all())
+
+        vaccinated = (population & VACCINATED).astype(bool)
+        self.assertLessEqual(vaccinated.sum(), int(self.pop_size * self.vacc_percentage))
+
+        # Person views read the same flags
+        self.assertEqual(self.simulation.population[0].infection, self.virus)
+        self.assertEqual(self.simulation.population.count(VACCINATED), vaccinated.sum())
+
+    def test_time_step_counters(self):
+        self.simulation.time_step()
+
+        # Every initially infected person makes 100 contacts
+        self.assertEqual(self.simulation.total_interactions, 100 * self.initial_infected)
+        self.assertLessEqual(self.simulation.saved_by_vaccination, self.simulation.total_interactions)
+
+        # The initial infected are resolved and the new infections are marked
+        population = self.simulation.state
+        dead = self.pop_size - (population & ALIVE).astype(bool).sum()
+        self.assertEqual(dead, self.simulation.total_deaths)
+        newly_infected = (population & INFECTED).astype(bool).sum()
+        self.assertEqual(self.simulation.infected_and_alive, newly_infected - self.initial_infected)
+        self.assertFalse((population[:self.initial_infected] & INFECTED).any())
+
+    def test_seed_is_reproducible(self):
+        other = VectorSimulation(self.virus, self.pop_size, self.vacc_percentage, self.initial_infected, seed=7)
+        self.simulation.time_step()
+        other.time_step()
+        self.assertTrue((self.simulation.state == other.state).all())
+        self.assertEqual(self.simulation.saved_by_vaccination, other.saved_by_vaccination)
+
+    def test_run_simulation(self):
+        self.simulation.run()
+        self.assertGreater(self.simulation.num_steps, 0)
+        self.assertFalse(self.simulation._simulation_should_continue())
+
+        with open(self.test_file, 'r') as file:
+            content = file.read()
+
+        self.assertIn('STEP NUMBER 1', content)
+        self.assertIn(f'The simulation has ended after {self.simulation.num_steps} iterations', content)
+        self.assertIn(f'Total Deaths: {self.simulation.total_deaths}', content)
+        self.assertIn(f'Interactions Saved by Vaccination: {self.simulation.saved_by_vaccination}', content)
+
+    def test_matches_object_engine(self):
+        virus = Virus("Test", 0.05, 0.12)
+        vector, objects = [], []
+        for seed in range(100):
+            for sim, outcomes in ((VectorSimulation(virus, 500, 0.2, 5, seed=seed), vector),
+                                  (Simulation(virus, 500, 0.2, 5, rng=seed), objects)):
+                while sim.step():
+                    pass
+                outcomes.append((sim.total_infected, sim.total_deaths, sim.saved_by_vaccination))
+        vector, objects = np.array(vector), np.array(objects)
+        for column in range(3):
+            self.assertLess(ks_statistic(vector[:, column], objects[:, column]), ks_critical(100, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,80 @@ class Virus(object):
         pass
 
 
+class StrainRegistry(object):
+    # Largest number of strains: a person's immunity code, one bit per
+    # strain plus one for vaccination, then fits in a uint16 (a uint8 for
+    # up to 7 strains), and the susceptibility table has at most 512 rows
+    MAX_STRAINS = 8
+
+    def __init__(self, strains, cross_immunity=None):
+        """
+        Ordered set of co-circulating `Virus` strains, each known by its index.
+
+        Attributes:
+        - strains: List of the `Virus` strains, with distinct names.
+        - cross_immunity: Matrix (list of lists) where cross_immunity[i][j]
+          is the protection, from 0 to 1, that recovering from strain i
+          gives against strain j. By default recovering from a strain
+          protects fully against it and not at all against the others.
+
+        A registry can stand in for a `Virus` in the logs: its `name` joins
+        the strain names, and `repro_rate` and `mortality_rate` are tuples of
+        the per-strain rates.
+        """
+        self.strains = list(strains)
+        if not self.strains:
+            raise ValueError('A strain registry needs at least one strain')
+        if len(self.strains) > self.MAX_STRAINS:
+            raise ValueError(f'At most {self.MAX_STRAINS} strains are supported, got {len(self.strains)}')
+        names = [strain.name for strain in self.strains]
+        if len(set(names)) != len(names):
+            raise ValueError(f'Strain names must be distinct, got {names}')
+
+        count = len(self.strains)
+        if cross_immunity is None:
+            cross_immunity = [[1.0 if i == j else 0.0 for j in range(count)] for i in range(count)]
+        cross_immunity = [[float(value) for value in row] for row in cross_immunity]
+        if len(cross_immunity) != count or any(len(row) != count for row in cross_immunity):
+            raise ValueError(f'cross_immunity must be a {count} x {count} matrix')
+        if any(not 0 <= value <= 1 for row in cross_immunity for value in row):
+            raise ValueError('cross_immunity values must be between 0 and 1')
+        self.cross_immunity = cross_immunity
+
+    def __len__(self):
+        return len(self.strains)
+
+    def __iter__(self):
+        return iter(self.strains)
+
+    def __getitem__(self, index):
+        return self.strains[index]
+
+    def index(self, name):
+        for index, strain in enumerate(self.strains):
+            if strain.name == name:
+                return index
+        raise KeyError(name)
+
+    def set_cross_immunity(self, source, target, protection):
+        # Protection against strain `target` after recovering from `source` (names)
+        if not 0 <= protection <= 1:
+            raise ValueError('cross_immunity values must be between 0 and 1')
+        self.cross_immunity[self.index(source)][self.index(target)] = float(protection)
+
+    @property
+    def name(self):
+        return '+'.join(strain.name for strain in self.strains)
+
+    @property
+    def repro_rate(self):
+        return tuple(strain.repro_rate for strain in self.strains)
+
+    @property
+    def mortality_rate(self):
+        return tuple(strain.mortality_rate for strain in self.strains)
+
+
 # Test this class
 if __name__ == "__main__":
     # Test your virus class by making an instance and confirming 